@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""Builds zipped Python actions with a cached dependency layer
+  Replaces hello/build-package.sh.  The virtualenv built from requirements.txt
+  inside the runtime image is zipped once into a layer that is cached under a
+  key hashed from requirements.txt and the image tag.  Building an action then
+  copies that layer zip (nothing is recompressed) and appends __main__.py and
+  any extra files, and is skipped altogether when neither the layer nor the
+  files changed since the last build of the same output.  Entries get a fixed
+  date, so the same files build the same bytes (and code digest) on any
+  checkout.
+  Examples:
+     $ ./action_packager.py hello/hello_zip.py hello/requirements.txt
+     $ python3
+     >>> import action_packager
+     >>> action_packager.build_action('hello/hello_zip.py',
+     ...                              'hello/requirements.txt')
+     'hello/hello_zip.zip'
+     >>> whisk.action_create('hello/hello_zip.py', 'hello',
+     ...                     requirements='hello/requirements.txt')
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from action_slimmer import partial_file, slim_action, zip_write
+
+CACHE_DIR = os.getenv('OPENWHISK_PACKAGE_CACHE') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'openwhisk-python', 'layers')
+
+
+def runtime_image(runtime='python3'):
+    # TODO: Support more languages beyond Python or NodeJS
+    return 'bspar/openwhisk-runtime-python:{}-latest'.format(runtime)
+
+
+def docker_builder(requirements, build_dir, image):
+    """Creates build_dir/virtualenv by pip installing requirements inside the
+       runtime image, exactly as build-package.sh did."""
+    shutil.copyfile(requirements, os.path.join(build_dir, 'requirements.txt'))
+    subprocess.check_call([
+        'docker', 'run', '--rm', '-v', '{}:/tmp'.format(build_dir), image,
+        'bash', '-c', 'cd tmp && virtualenv virtualenv && '
+        'source virtualenv/bin/activate && pip install -r requirements.txt'])
+
+
+def layer_key(requirements, image):
+    sha = hashlib.sha256()
+    if requirements:
+        with open(requirements, 'rb') as in_file:
+            sha.update(in_file.read())
+    sha.update(b'\0' + image.encode('utf-8'))
+    return sha.hexdigest()[:32]
+
+
+def file_digest(filename):
+    with open(filename, 'rb') as in_file:
+        return hashlib.sha256(in_file.read()).hexdigest()
+
+
+def zip_tree(zip_file, root, arcname):
+    """Adds the directory root to zip_file as arcname/..., following symlinks
+       like `zip -r` does and skipping those that dangle (e.g. bin/python
+       pointing into the build container)."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if os.path.exists(path):
+                zip_write(zip_file, path, os.path.join(
+                    arcname, os.path.relpath(path, root)))
+
+
+def build_layer(requirements, image, cache_dir=CACHE_DIR,
+                builder=docker_builder):
+    """Returns the path of the cached layer zip for requirements and image,
+       calling builder(requirements, build_dir, image) to create
+       build_dir/virtualenv only if the layer is not cached yet."""
+    layer = os.path.join(cache_dir, layer_key(requirements, image) + '.zip')
+    if os.path.exists(layer):
+        return layer
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    build_dir = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        partial = os.path.join(build_dir, 'layer.zip')
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            if requirements:
+                builder(requirements, build_dir, image)
+                zip_tree(zip_file, os.path.join(build_dir, 'virtualenv'),
+                         'virtualenv')
+        os.rename(partial, layer)  # atomic, so a half built layer is never used
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return layer
+
+
+def build_action(main_file, requirements=None, runtime='python3',
+                 extra_files=(), output=None, cache_dir=CACHE_DIR,
+                 builder=docker_builder, slim=False, precompile=False):
+    """Zips main_file (as __main__.py) and extra_files (at their paths
+       relative to main_file) on top of the cached dependency layer and
+       returns the path of the zip (by default next to main_file, with a .zip
+       extension).  The zip comment records the layer key and file digests so
+       an up to date output is not rebuilt.  slim=True (or a list of module
+       names to keep) strips what main doesn't import with
+       action_slimmer.slim_action(), optionally precompiling bytecode."""
+    image = runtime_image(runtime)
+    output = output or os.path.splitext(main_file)[0] + '.zip'
+    files = [(main_file, '__main__.py')]
+    root = os.path.dirname(os.path.abspath(main_file))
+    files += [(filename, os.path.relpath(os.path.abspath(filename), root))
+              for filename in extra_files]
+    manifest = {'layer': layer_key(requirements, image),
+                'files': dict((arcname, file_digest(filename))
+                              for filename, arcname in files)}
+    if slim:
+        manifest['slim'] = sorted(slim) if slim is not True else True
+        manifest['precompile'] = bool(precompile)
+    if read_manifest(output) == manifest:
+        return output
+    layer = build_layer(requirements, image, cache_dir, builder)
+    partial = partial_file(output)
+    try:
+        shutil.copyfile(layer, partial)
+        with zipfile.ZipFile(partial, 'a', zipfile.ZIP_DEFLATED) as zip_file:
+            for filename, arcname in sorted(files, key=lambda f: f[1]):
+                zip_write(zip_file, filename, arcname)
+            zip_file.comment = json.dumps(manifest,
+                                          sort_keys=True).encode('utf-8')
+        if slim:
+            keep = () if slim is True else slim
+            slim_action(partial, keep=keep, precompile=precompile)
+        os.rename(partial, output)
+    except BaseException:
+        os.remove(partial)
+        raise
+    return output
+
+
+def read_manifest(filename):
+    try:
+        with zipfile.ZipFile(filename) as zip_file:
+            return json.loads(zip_file.comment.decode('utf-8'))
+    except (IOError, OSError, ValueError, zipfile.BadZipfile):
+        return None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: {} main.py [requirements.txt] [extra files...]'.format(
+              sys.argv[0]))
+        exit(-1)
+    start = time.time()
+    requirements = sys.argv[2] if len(sys.argv) > 2 else 'requirements.txt'
+    zip_name = build_action(sys.argv[1], requirements if os.path.exists(
+                            requirements) else None, extra_files=sys.argv[3:])
+    print('[+] Created {} in {:.2f}s'.format(zip_name, time.time() - start))
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+"""Slims zipped Python actions down to what their main actually needs
+  A zip built by action_packager.py (or hello/build-package.sh) carries the
+  whole virtualenv: caches, *.dist-info, tests, pip and setuptools, and with
+  `zip -r` a second copy of site-packages through the lib64 symlink.  All of
+  it is uploaded and unzipped by the invoker on every cold start.
+  slim_action() rewrites such a zip in steps and reports, for each one, the
+  zip size, the number of files and the measured time to unzip them:
+     prune       caches, metadata, tests, bin/ (but activate_this.py),
+                 include/, share/ and pip/setuptools/wheel unless imported
+     dedupe      lib64/... entries that duplicate lib/...
+     unused      top level site-packages modules that main doesn't import,
+                 directly or through other site-packages modules
+     precompile  (optional) unchecked-hash .pyc files next to the sources,
+                 so the runtime doesn't compile on the first import
+  The import time of main's imports is reported too when the zip targets the
+  Python version running this script.  Imports made dynamically (importlib,
+  __import__, plugins) can't be seen, so name those in keep=.
+  Examples:
+     $ ./action_slimmer.py hello/hello_zip.zip --precompile
+     $ python3
+     >>> import action_slimmer
+     >>> for step in action_slimmer.slim_action('hello/hello_zip.zip'):
+     ...     print(step)
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import ast
+import collections
+import compileall
+import os
+import py_compile
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+# One row of the slim_action() report; import_seconds may be None
+SlimStep = collections.namedtuple(
+    'SlimStep', 'step size files unzip_seconds import_seconds')
+
+SITE_PACKAGES = re.compile(
+    r'^virtualenv/lib(?:64)?/python([0-9.]+)/site-packages/')
+BUILD_TOOLS = ('pip', 'setuptools', 'wheel', 'pkg_resources',
+               '_distutils_hack', 'easy_install', 'distutils-precedence')
+IMPORTS = re.compile(r'^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))',
+                     re.MULTILINE)
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)  # the earliest date a zip entry can hold
+
+
+def top_level(name):
+    """'virtualenv/lib/python3.6/site-packages/minio/api.py' -> 'minio',
+       '.../site-packages/six.py' -> 'six'.  Directories that can't be
+       packages, like Pillow.libs/ (shared libraries that extension modules
+       load), are None: no import names them."""
+    match = SITE_PACKAGES.match(name)
+    if not match:
+        return None
+    path = name[match.end():].split('/')
+    if len(path) > 1:
+        return path[0] if path[0].isidentifier() else None
+    return path[0].split('.')[0]
+
+
+def imported_names(source):
+    """Top level names of the absolute imports in python source."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):  # e.g. Python 2 only code: best effort
+        text = source.decode('utf-8', 'replace')
+        return set((a or b).split('.')[0] for a, b in IMPORTS.findall(text))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def reachable_modules(zip_file, keep=()):
+    """Top level site-packages names imported by the action's own code
+       (the .py files outside virtualenv/), transitively.  Extension modules
+       (.so, .pyd) count as modules too, though their imports can't be
+       read."""
+    sources = collections.defaultdict(list)  # top level name: .py entries
+    roots = []
+    for name in zip_file.namelist():
+        if name.endswith(('.so', '.pyd')):
+            module = top_level(name)
+            if module:
+                sources.setdefault(module, [])  # no sources to read
+        elif name.endswith('.py'):
+            module = top_level(name)
+            if module:
+                sources[module].append(name)
+            elif not name.startswith('virtualenv/'):
+                roots.append(name)
+    todo = set(keep)
+    for name in roots:
+        todo |= imported_names(zip_file.read(name))
+    reached = set()
+    while todo:
+        module = todo.pop()
+        if module in reached or module not in sources:
+            continue
+        reached.add(module)
+        for name in sources[module]:
+            todo |= imported_names(zip_file.read(name)) - reached
+    return reached
+
+
+def is_junk(name, reached):
+    parts = name.split('/')
+    if parts[0] != 'virtualenv':
+        return False
+    if parts[1] == 'bin':
+        return parts[-1] != 'activate_this.py'
+    if parts[1] in ('include', 'share'):
+        return True
+    if '__pycache__' in parts or name.endswith(('.pyc', '.pyo')):
+        return True
+    if any(part.endswith(('.dist-info', '.egg-info')) for part in parts):
+        return True
+    module = top_level(name)
+    if module in BUILD_TOOLS and module not in reached:
+        return True
+    # tests/ and test/ directories inside a package, not top level modules
+    match = SITE_PACKAGES.match(name)
+    inner = name[match.end():].split('/')[1:-1] if match else []
+    return 'tests' in inner or 'test' in inner
+
+
+def is_duplicate(info, by_name):
+    """lib64/... entries that `zip -r` stored again through the symlink."""
+    if not info.filename.startswith('virtualenv/lib64/'):
+        return False
+    twin = by_name.get('virtualenv/lib/' + info.filename[17:])
+    return twin is not None and (twin.CRC, twin.file_size) == (info.CRC,
+                                                               info.file_size)
+
+
+def zip_size(infos):
+    """Size of a zip holding these (already compressed) entries."""
+    return 22 + sum(76 + 2 * len(info.filename.encode('utf-8')) +
+                    info.compress_size for info in infos)
+
+
+def extract(zip_file, infos, directory):
+    """Unzips infos into directory and returns the seconds it took."""
+    start = time.perf_counter()
+    for info in infos:
+        zip_file.extract(info, directory)
+    return time.perf_counter() - start
+
+
+def import_seconds(directory, modules):
+    """Seconds for a fresh interpreter to import modules from the unzipped
+       action, without writing bytecode (like a fresh container), or None
+       if they can't be imported here."""
+    sites = [os.path.join(directory, 'virtualenv', 'lib', 'python{}.{}'.format(
+             *sys.version_info[:2]), 'site-packages'), directory]
+    script = ('import sys, time; sys.path[:0] = {!r}; t = time.perf_counter()'
+              '\nfor m in {!r}: __import__(m)\nprint(time.perf_counter() - t)'
+              .format(sites, sorted(modules)))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    try:
+        output = subprocess.check_output([sys.executable, '-S', '-c', script],
+                                         env=env, stderr=subprocess.DEVNULL)
+        return float(output)
+    except (subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def zip_write(zip_file, path, arcname):
+    """Adds the file at path as arcname with a fixed date and permissions,
+       so the same files always zip to the same bytes (and code digest),
+       whenever and wherever they were checked out."""
+    info = zipfile.ZipInfo(arcname, ZIP_DATE)
+    mode = 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+    info.external_attr = (stat.S_IFREG | mode) << 16
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with open(path, 'rb') as in_file, zip_file.open(info, 'w') as out_file:
+        shutil.copyfileobj(in_file, out_file, 1 << 20)
+
+
+def partial_file(output):
+    """A new empty file next to output to write it in, then rename over
+       it: concurrent builds of the same output each get their own."""
+    handle, partial = tempfile.mkstemp(
+        '.partial', os.path.basename(output) + '.',
+        os.path.dirname(os.path.abspath(output)))
+    os.close(handle)
+    return partial
+
+
+def write_tree(directory, output, comment=b''):
+    partial = partial_file(output)
+    try:
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    zip_write(zip_file, path,
+                              os.path.relpath(path, directory))
+            zip_file.comment = comment
+        os.rename(partial, output)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+
+def slim_action(filename, output=None, keep=(), precompile=False):
+    """Writes the slimmed zip to output (default: over filename) and returns
+       a list of SlimStep, the first being the original zip."""
+    output = output or filename
+    work = tempfile.mkdtemp()
+    try:
+        with zipfile.ZipFile(filename) as zip_file:
+            infos = [info for info in zip_file.infolist()
+                     if not info.filename.endswith('/')]
+            by_name = dict((info.filename, info) for info in infos)
+            reached = reachable_modules(zip_file, keep)
+            version = set(m.group(1) for m in map(SITE_PACKAGES.match, by_name)
+                          if m) or set(['{}.{}'.format(*sys.version_info[:2])])
+            local = version == set(['{}.{}'.format(*sys.version_info[:2])])
+            steps = [('original', lambda info: True),
+                     ('prune', lambda info: not is_junk(info.filename,
+                                                        reached)),
+                     ('dedupe', lambda info: not is_duplicate(info, by_name)),
+                     ('unused', lambda info: top_level(info.filename) in
+                      reached | set([None]) or info.filename.endswith('.pth'))]
+            report = []
+            for step, wanted in steps:
+                infos = [info for info in infos if wanted(info)]
+                directory = os.path.join(work, step)
+                seconds = extract(zip_file, infos, directory)
+                report.append(SlimStep(step, zip_size(infos), len(infos),
+                                       seconds, import_seconds(directory,
+                                       reached) if local else None))
+            comment = zip_file.comment
+        if precompile:
+            if not local:
+                raise ValueError('{} targets Python {} but bytecode must be '
+                                 'compiled by that version; run this in the '
+                                 'runtime image'.format(filename, version))
+            compileall.compile_dir(directory, quiet=1, invalidation_mode=(
+                py_compile.PycInvalidationMode.UNCHECKED_HASH))
+        write_tree(directory, output, comment)
+        if precompile:
+            with zipfile.ZipFile(output) as zip_file:
+                infos = zip_file.infolist()
+                directory = os.path.join(work, 'precompile')
+                seconds = extract(zip_file, infos, directory)
+            report.append(SlimStep('precompile', os.path.getsize(output),
+                                   len(infos), seconds,
+                                   import_seconds(directory, reached)))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return report
+
+
+def format_report(report):
+    lines = ['{:>10} {:>12} {:>7} {:>9} {:>9}'.format(
+             'step', 'bytes', 'files', 'unzip s', 'import s')]
+    for step in report:
+        lines.append('{:>10} {:>12,} {:>7} {:>9.3f} {:>9}'.format(
+            step.step, step.size, step.files, step.unzip_seconds,
+            '-' if step.import_seconds is None else
+            '{:.3f}'.format(step.import_seconds)))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--precompile']
+    if not args:
+        print('usage: {} action.zip [output.zip] [--precompile]'.format(
+              sys.argv[0]))
+        exit(-1)
+    print(format_report(slim_action(args[0], args[1] if len(args) > 1 else
+                                    None, precompile='--precompile' in
+                                    sys.argv)))
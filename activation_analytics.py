@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""Incremental per action statistics over a sliding window of activations
+  activation_counts walks every activation the server holds each time it is
+  read.  ActivationAnalytics instead keeps a cursor on the newest `start`
+  seen and, on refresh(), lists only the activations since then (less a
+  settle time, for activations that started earlier but were recorded late;
+  the ids in that overlap are deduplicated).  Each activation is stored as
+  one row of compact NumPy columns: action, start, duration, statusCode,
+  waitTime and initTime.  Rows older than `window` seconds before the
+  cursor are dropped, so memory follows the retained window.  Counts, error
+  rates, cold start ratios and duration percentiles are computed per action
+  and time range with a few vectorized passes.  Requires numpy, which is
+  imported by the first ActivationAnalytics rather than with the module.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> analytics = whisk.activation_analytics(window=3600)
+     >>> analytics.refresh()      # the first call loads the whole window
+     >>> analytics.stats(last=300)['hello']
+     {'count': 120, 'errors': 2, 'error_rate': 0.0167, 'cold': 3, ...}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import threading
+import time
+
+numpy = None  # imported by the first ActivationAnalytics: see load_numpy()
+
+# name: dtype of the columns; wait and init are -1 when not annotated
+COLUMNS = (('action', 'int32'), ('start', 'int64'), ('duration', 'int32'),
+           ('status', 'int8'), ('wait', 'int32'), ('init', 'int32'))
+
+
+def load_numpy():
+    """Imports numpy on first use, so that `import openwhisk` (and every
+       CLI command) doesn't pay for it."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('ActivationAnalytics requires numpy')
+    return numpy
+
+
+def annotation_value(activation, key, default=-1):
+    for pair in activation.get('annotations') or []:
+        if pair.get('key') == key:
+            return pair.get('value', default)
+    return default
+
+
+def status_code(activation):
+    """0 success, 1 application error, 2 developer error, 3 whisk error.
+       Listings carry it at the top level, full records in the response."""
+    code = activation.get('statusCode')
+    if code is None:
+        code = (activation.get('response') or {}).get('statusCode', 0)
+    return code
+
+
+class ActivationAnalytics(object):
+    """Statistics over the activations of `whisk` (optionally only those of
+       action `name`) started in the last `window` seconds."""
+
+    def __init__(self, whisk, window=3600.0, name=None, settle=60.0,
+                 page_size=200):
+        load_numpy()
+        self.whisk = whisk
+        self.window = window
+        self.name = name
+        self.settle = settle
+        self.page_size = page_size
+        self.cursor = None  # newest start (ms) seen so far
+        self.names = []     # action code: name
+        self._codes = {}    # name: action code
+        self._recent = {}   # activationId: start, within settle of cursor
+        self._size = 0
+        self._columns = dict((column, numpy.empty(0, dtype))
+                             for column, dtype in COLUMNS)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def column(self, name):
+        """A read-only view of the retained values of one column."""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def refresh(self):
+        """Lists the activations since the cursor; returns how many were new.
+           The first call loads the whole window."""
+        if self.cursor is None:
+            since = int((time.time() - self.window) * 1000)
+        else:
+            since = self.cursor - int(self.settle * 1000)
+        return self.ingest(list(self.whisk.iter_activations(
+            name=self.name, since=since, page_size=self.page_size)))
+
+    def ingest(self, activations):
+        """Adds activation records (or listing summaries) not seen yet."""
+        rows = []
+        with self.lock:
+            for activation in activations:
+                activation_id = activation.get('activationId')
+                start = activation.get('start')
+                if start is None or activation_id in self._recent:
+                    continue
+                self._recent[activation_id] = start
+                name = activation.get('name') or ''
+                code = self._codes.get(name)
+                if code is None:
+                    code = self._codes[name] = len(self.names)
+                    self.names.append(name)
+                rows.append((code, start, activation.get('duration') or 0,
+                             status_code(activation),
+                             annotation_value(activation, 'waitTime'),
+                             annotation_value(activation, 'initTime')))
+            if rows:
+                self._append(rows)
+                newest = max(row[1] for row in rows)
+                self.cursor = max(self.cursor or newest, newest)
+            if self.cursor is not None:
+                self._prune()
+        return len(rows)
+
+    def _append(self, rows):
+        needed = self._size + len(rows)
+        capacity = len(self._columns['start'])
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity, 256)
+            for column, dtype in COLUMNS:
+                grown = numpy.empty(capacity, dtype)
+                grown[:self._size] = self._columns[column][:self._size]
+                self._columns[column] = grown
+        for (column, dtype), values in zip(COLUMNS, zip(*rows)):
+            self._columns[column][self._size:needed] = values
+        self._size = needed
+
+    def _prune(self):
+        """Drops rows older than the window and ids older than settle; the
+           arrays shrink back once they are less than a quarter full."""
+        oldest = self.cursor - int(self.window * 1000)
+        keep = self._columns['start'][:self._size] >= oldest
+        if not keep.all():
+            kept = int(keep.sum())
+            capacity = len(self._columns['start'])
+            if kept < capacity // 4:
+                capacity = max(256, 2 * kept)
+            for column, dtype in COLUMNS:
+                values = self._columns[column][:self._size][keep]
+                if capacity != len(self._columns[column]):
+                    self._columns[column] = numpy.empty(capacity, dtype)
+                self._columns[column][:kept] = values
+            self._size = kept
+        settled = self.cursor - int(self.settle * 1000)
+        if len(self._recent) > 2 * self.page_size:
+            self._recent = dict((activation_id, start) for activation_id, start
+                                in self._recent.items() if start >= settled)
+
+    def counts(self, **kwargs):
+        """{action: count}, the incremental activation_counts."""
+        return dict((name, stats['count'])
+                    for name, stats in self.stats(**kwargs).items())
+
+    def stats(self, last=None, since=None, upto=None, action=None,
+              percentiles=(50, 95, 99)):
+        """{action: stats} for the activations started in the `last` seconds
+           before the cursor, or between since and upto (ms), of one or all
+           actions.  Durations, waitTime and initTime are in ms."""
+        with self.lock:
+            size = self._size
+            columns = dict((column, values[:size].copy()) for column, values
+                           in self._columns.items())
+            names = list(self.names)
+            if last is not None and self.cursor is not None:
+                since = self.cursor - int(last * 1000)
+        mask = numpy.ones(size, bool)
+        if since is not None:
+            mask &= columns['start'] >= since
+        if upto is not None:
+            mask &= columns['start'] <= upto
+        if action is not None:
+            if action not in names:
+                return {}
+            mask &= columns['action'] == names.index(action)
+        rows = numpy.flatnonzero(mask)
+        codes = columns['action'][rows]
+        counts = numpy.bincount(codes, minlength=len(names))
+        errors = numpy.bincount(codes, columns['status'][rows] != 0,
+                                len(names))
+        cold = numpy.bincount(codes, columns['init'][rows] >= 0, len(names))
+        order = rows[numpy.argsort(codes, kind='stable')]  # grouped by action
+        groups = numpy.split(order, numpy.cumsum(counts)[:-1])
+        result = {}
+        for code, group in enumerate(groups):
+            if not len(group):
+                continue
+            count = int(counts[code])
+            stats = {'count': count, 'errors': int(errors[code]),
+                     'error_rate': float(errors[code]) / count,
+                     'cold': int(cold[code]),
+                     'cold_ratio': float(cold[code]) / count}
+            durations = columns['duration'][group]
+            for pct, value in zip(percentiles, numpy.percentile(
+                    durations, percentiles)):
+                stats['p{}'.format(pct)] = float(value)
+            waits = columns['wait'][group]
+            waits = waits[waits >= 0]
+            stats['wait_mean'] = float(waits.mean()) if len(waits) else None
+            inits = columns['init'][group]
+            inits = inits[inits >= 0]
+            stats['init_mean'] = float(inits.mean()) if len(inits) else None
+            result[names[code]] = stats
+        return result
+
+    def nbytes(self):
+        return sum(values.nbytes for values in self._columns.values())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""Futures for activations that have been accepted but not yet finished
+  OpenWhisk answers a non-blocking invoke (or a blocking invoke that outlives
+  the server's wait) with HTTP 202 and just an activationId.  OpenWhisk wraps
+  such an id in an ActivationFuture and registers it with the client's one
+  ActivationPoller, which finds finished activations with a single listing
+  request per round rather than one GET per pending id, and then GETs the
+  full records of just those that finished.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> futures = [whisk.action_invoke('hello', payload={'name': str(n)})
+     ...            for n in range(100)]
+     >>> for future in openwhisk.as_completed(futures, timeout=60):
+     ...     print(future.activation_id, future.result())
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, as_completed  # noqa: F401
+
+
+class ActivationFuture(Future):
+    """A concurrent.futures.Future for one activation, so result(timeout),
+       done(), cancel() and concurrent.futures.as_completed() all work.
+       result() is the activation record, or just its response.result if the
+       invoke asked for result=True (as a blocking invoke would return),
+       passed through load() if given."""
+
+    def __init__(self, activation_id, result_only=False, load=None):
+        Future.__init__(self)
+        self.activation_id = activation_id
+        self.result_only = result_only
+        self.load = load
+        self.invoked_at = time.time()
+        self.resolved_at = None
+        self.activation = None  # the full record, once resolved
+
+    def __repr__(self):
+        return '<ActivationFuture {} {}>'.format(
+            self.activation_id, 'done' if self.done() else 'pending')
+
+    def _resolve(self, activation):
+        """Sets the result unless the future was cancelled: once running,
+           a concurrent cancel() can no longer succeed."""
+        if not self.set_running_or_notify_cancel():
+            return
+        self.resolved_at = time.time()
+        self.activation = activation
+        if self.result_only:
+            activation = activation.get('response', {}).get('result')
+        if self.load is not None:
+            try:
+                activation = self.load(activation)
+            except Exception as e:
+                self.set_exception(e)
+                return
+        self.set_result(activation)
+
+
+class ActivationPoller(object):
+    """Resolves ActivationFutures from the activations list of `whisk`.
+       Each round pages through the summaries at `activations?since=...`
+       back to the oldest pending invoke and fetches the full records of the
+       pending ids found there.  When max_pages are not enough to get that
+       far, ids pending for fetch_after seconds are also fetched by id, each
+       at most once per fetch_after seconds.  The wait between rounds starts
+       at min_interval, grows by `backoff` after every round that resolves
+       nothing, up to max_interval, and drops back once something finishes.
+       clock_skew (seconds) widens `since` to allow for client/server clock
+       drift.  The polling thread only runs while there are pending
+       futures."""
+
+    def __init__(self, whisk, min_interval=0.05, max_interval=2.0,
+                 backoff=1.5, page_size=200, max_pages=10, clock_skew=60.0,
+                 fetch_after=10.0):
+        self.whisk = whisk
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.clock_skew = clock_skew
+        self.fetch_after = fetch_after
+        self.requests = 0  # number of requests issued so far
+        self._interval = min_interval
+        self._pending = {}
+        self._fetched_at = {}  # activation id: when it was last fetched by id
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, future):
+        with self._lock:
+            self._pending[future.activation_id] = future
+            self._interval = self.min_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='ActivationPoller')
+                self._thread.daemon = True
+                self._thread.start()
+        return future
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                for activation_id, future in list(self._pending.items()):
+                    if future.cancelled():
+                        del self._pending[activation_id]
+                for activation_id in list(self._fetched_at):
+                    if activation_id not in self._pending:
+                        del self._fetched_at[activation_id]
+                if not self._pending:
+                    self._thread = None
+                    return
+                since = min(f.invoked_at for f in self._pending.values())
+                wanted = dict((activation_id, future.invoked_at)
+                              for activation_id, future
+                              in self._pending.items())
+            try:
+                found = self._lookup(since - self.clock_skew, wanted)
+            except Exception:  # e.g. connection errors: just try again later
+                found = {}
+            with self._lock:
+                resolved = [(self._pending.pop(activation_id), activation)
+                            for activation_id, activation in found.items()
+                            if activation_id in self._pending]
+            for future, activation in resolved:  # load() may fetch: unlocked
+                future._resolve(activation)
+            with self._lock:
+                if found:
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self._interval * self.backoff,
+                                         self.max_interval)
+                interval = self._interval
+            time.sleep(interval)
+
+    def _lookup(self, since, wanted):
+        """Returns {activation_id: activation} for the finished ids in wanted
+           ({activation_id: invoked at}).  Ids still missing after max_pages
+           full pages may lie beyond them under load, so those pending for
+           fetch_after seconds are fetched by id, but not again within
+           fetch_after seconds: most are simply still running."""
+        found = collections.OrderedDict()
+        since = int(since * 1000)
+        for page in range(self.max_pages):
+            url = self.whisk.gen.url_activation(since=since,
+                                                limit=self.page_size,
+                                                skip=page * self.page_size)
+            self.requests += 1
+            activations = self.whisk._get(url).json()
+            for activation in activations:
+                if activation.get('activationId') in wanted:
+                    found[activation['activationId']] = None
+            if len(found) == len(wanted) or len(activations) < self.page_size:
+                break
+        else:
+            now = time.time()
+            for activation_id, invoked_at in wanted.items():
+                last = max(invoked_at, self._fetched_at.get(activation_id, 0))
+                if activation_id not in found and \
+                        now - last >= self.fetch_after:
+                    self._fetched_at[activation_id] = now
+                    found[activation_id] = None
+        if not found:
+            return {}
+        self.requests += len(found)
+        return self.whisk.activations_fetch(list(found))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""On-disk store of finished activations
+  A finished activation never changes, yet activation_info() and
+  activation_results() fetch it again on every call.  ActivationStore keeps
+  the records in SQLite, zlib-compressed (their results and logs are most of
+  their size and compress well), and drops the least recently read ones once
+  the compressed records exceed max_bytes.  OpenWhisk reads through it when
+  created with activation_store=, and activations_fetch() serves the ids it
+  holds locally and fetches only the rest, in parallel.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth, activation_store=True)
+     >>> records = whisk.activations_fetch(whisk.activation_ids,
+     ...                                   concurrency=16)
+     >>> whisk.store.stats()
+     {'activations': 5120, 'bytes': 3301554, 'hits': 0, 'misses': 5120, ...}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+STORE_PATH = os.getenv('OPENWHISK_ACTIVATION_STORE') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'openwhisk-python', 'activations.db')
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS activations (
+    id TEXT PRIMARY KEY,
+    record BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL)'''
+
+
+class ActivationStore(object):
+    """Activation records by activationId in the SQLite file path (':memory:'
+       works too).  When the compressed records pass max_bytes the least
+       recently read are deleted down to shrink_to of it.  One connection is
+       shared by all threads, behind a lock."""
+
+    def __init__(self, path=STORE_PATH, max_bytes=256 << 20, level=6,
+                 shrink_to=0.9):
+        if path != ':memory:' and not os.path.isdir(os.path.dirname(
+                os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.level = level
+        self.shrink_to = shrink_to
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            if path != ':memory:':
+                self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(SCHEMA)
+            self.db.execute('CREATE INDEX IF NOT EXISTS activations_accessed '
+                            'ON activations (accessed)')
+            self._bytes = self.db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM activations').fetchone()[0]
+
+    def get(self, activation_id):
+        return self.get_many([activation_id]).get(activation_id)
+
+    def get_many(self, activation_ids):
+        """Returns {activation_id: record} for the ids held here."""
+        ids = list(dict.fromkeys(activation_ids))
+        found = {}
+        with self.lock, self.db:
+            for start in range(0, len(ids), 500):  # SQLite's variable limit
+                chunk = ids[start:start + 500]
+                rows = self.db.execute(
+                    'SELECT id, record FROM activations WHERE id IN ({})'
+                    .format(','.join('?' * len(chunk))), chunk).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.db.executemany(
+                    'UPDATE activations SET accessed = ? WHERE id = ?',
+                    [(now, activation_id) for activation_id in found])
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        return dict((activation_id, json.loads(zlib.decompress(blob)))
+                    for activation_id, blob in found.items())
+
+    def put(self, activation):
+        self.put_many([activation])
+
+    def put_many(self, activations):
+        """Stores finished activation records; others are ignored."""
+        now = time.time()
+        rows = [(activation['activationId'],
+                 zlib.compress(json.dumps(activation, separators=(',', ':'))
+                               .encode('utf-8'), self.level), now)
+                for activation in activations
+                if activation.get('activationId') and 'response' in activation]
+        if not rows:
+            return
+        with self.lock, self.db:
+            for activation_id, blob, accessed in rows:
+                old = self.db.execute('SELECT size FROM activations WHERE '
+                                      'id = ?', (activation_id,)).fetchone()
+                self.db.execute('INSERT OR REPLACE INTO activations VALUES '
+                                '(?, ?, ?, ?)', (activation_id, blob,
+                                                 len(blob), accessed))
+                self._bytes += len(blob) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._shrink()
+
+    def _shrink(self):
+        target = self.max_bytes * self.shrink_to
+        doomed = []
+        for activation_id, size in self.db.execute(
+                'SELECT id, size FROM activations ORDER BY accessed'):
+            if self._bytes <= target:
+                break
+            doomed.append((activation_id,))
+            self._bytes -= size
+        self.db.executemany('DELETE FROM activations WHERE id = ?', doomed)
+        self.evictions += len(doomed)
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute(
+                'SELECT COUNT(*) FROM activations').fetchone()[0]
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM activations')
+            self._bytes = 0
+
+    def stats(self):
+        count = len(self)
+        with self.lock:
+            return {'activations': count, 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
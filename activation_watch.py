@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+"""Streams new activations as they are recorded, polling at an adaptive rate
+  Re-reading activation_ids shows the newest page again and again, with no
+  way to tell what is new.  An ActivationWatcher keeps a cursor on the
+  newest `start` seen and each poll lists only the activations since then,
+  so a poll costs one small listing request whatever the history holds.
+  Activations are only listed once they finish, so one that started before
+  the cursor but was still running then is missed by those polls: every
+  `rescan` seconds (default: settle), a poll lists the `settle` seconds
+  before the cursor too, where it shows up.  settle defaults to the time
+  limit of the watched action (the longest of all actions without a name)
+  plus a second, and grows if a longer activation is seen.  The ids of that
+  overlap are remembered, so nothing is yielded twice, even when a poll
+  spans several pages.  The interval between polls shrinks by `growth`
+  while polls find activations, down to `min_interval` (at once when a poll
+  fills a page), and grows by `growth` while they find none, up to
+  `max_interval`.  With details=True the full record of each new activation
+  (result and logs) is fetched, concurrently, before it is yielded.  A
+  watcher started without `since` (ms) begins at the newest activation the
+  server holds, so client clock skew does not matter.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> for activation in whisk.watch_activations('hello', details=True):
+     ...     print(activation['activationId'], activation['response'])
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import time
+
+DEFAULT_TIME_LIMIT = 60000  # ms: OpenWhisk's default action timeout
+RECORD_DELAY = 1.0  # seconds from an activation's end to its listing
+
+
+class ActivationWatcher(object):
+    """An iterator over the activations of `whisk` (of action `name` only,
+       if given) recorded after it started, or started since `since` ms,
+       oldest first.  It stops after idle_timeout seconds without a new
+       activation, if set, and otherwise runs until the loop is left."""
+
+    def __init__(self, whisk, name=None, since=None, details=False,
+                 min_interval=0.1, max_interval=10.0, growth=1.5,
+                 settle=None, rescan=None, page_size=200, concurrency=8,
+                 idle_timeout=None):
+        self.whisk = whisk
+        self.name = name
+        self.details = details
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+        self.page_size = page_size
+        self.settle = settle
+        if settle is None:
+            self.settle = self._time_limit() / 1000.0 + RECORD_DELAY
+        self.rescan = self.settle if rescan is None else rescan
+        self.concurrency = concurrency
+        self.idle_timeout = idle_timeout
+        self.cursor = since  # the newest start seen, in ms
+        self.interval = min_interval
+        self.rate = 0.0  # new activations per second, decaying average
+        self.polls = self.requests = self.fetched = self.yielded = 0
+        self.listed = self.rescans = 0
+        self._seen = {}  # activation id: start, for those in the overlap
+        self._pending = collections.deque()
+        self._last_poll = None
+        self._last_new = self._rescanned = time.monotonic()
+        if since is None:
+            self._start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            if self._last_poll is not None:
+                now = time.monotonic()
+                if (self.idle_timeout is not None and
+                        now - self._last_new >= self.idle_timeout):
+                    raise StopIteration
+                time.sleep(max(0.0, self._last_poll + self.interval - now))
+            self._pending.extend(self.poll())
+        self.yielded += 1
+        return self._pending.popleft()
+
+    def _list(self, since):
+        activations = list(self.whisk.iter_activations(
+            name=self.name, since=since, page_size=self.page_size))
+        self.requests += 1 + len(activations) // self.page_size
+        self.listed += len(activations)
+        return activations
+
+    def _time_limit(self):
+        """The longest time limit (ms) of the watched action(s)."""
+        gen = self.whisk.gen
+        if self.name is not None:
+            response = self.whisk._get(gen.url_action(self.name, code=False))
+            actions = [response.json()] if response.ok else []
+        else:
+            actions, skip = [], 0
+            while True:
+                page = self.whisk._get(gen.url_action(
+                    skip=skip, limit=self.page_size)).json()
+                actions.extend(page)
+                if len(page) < self.page_size:
+                    break
+                skip += self.page_size
+        limits = [(action.get('limits') or {}).get('timeout')
+                  for action in actions]
+        return max([limit for limit in limits if limit] or
+                   [DEFAULT_TIME_LIMIT])
+
+    def _start(self):
+        """Puts the cursor on the newest activation and marks those in its
+           overlap as seen."""
+        query = {'limit': 1} if self.name is None else {'limit': 1,
+                                                        'name': self.name}
+        newest = self.whisk._get(self.whisk.gen.url_activation(**query))
+        newest.raise_for_status()
+        self.requests += 1
+        newest = newest.json()
+        self.cursor = newest[0]['start'] if newest else 0
+        self._fresh(self._list(self._floor()))  # what started before
+
+    def _floor(self):
+        return max(0, self.cursor - int(self.settle * 1000))
+
+    def _since(self):
+        """The cursor, or once every rescan seconds the cursor less the
+           settle time, for activations recorded after later ones."""
+        now = time.monotonic()
+        if now - self._rescanned < self.rescan:
+            return self.cursor
+        self._rescanned = now
+        self.rescans += 1
+        return self._floor()
+
+    def _fresh(self, activations):
+        """The activations not seen before, oldest first."""
+        fresh = []
+        for activation in reversed(activations):  # listings are newest first
+            activation_id = activation.get('activationId')
+            if activation_id in self._seen or 'start' not in activation:
+                continue
+            self._seen[activation_id] = activation['start']
+            fresh.append(activation)
+            duration = (activation.get('duration') or 0) / 1000.0
+            self.settle = max(self.settle, duration + RECORD_DELAY)
+        self.cursor = max([a['start'] for a in fresh] + [self.cursor])
+        floor = self._floor()
+        for activation_id, start in list(self._seen.items()):
+            if start < floor:
+                del self._seen[activation_id]  # never listed again
+        fresh.sort(key=lambda activation: activation['start'])
+        return fresh
+
+    def poll(self):
+        """Lists the activations since the cursor (or, every rescan seconds,
+           the settle window before it) once and returns the new ones (full
+           records with details=True), oldest first."""
+        fresh = self._fresh(self._list(self._since()))
+        now = time.monotonic()
+        if self._last_poll is not None:
+            rate = len(fresh) / max(now - self._last_poll, 1e-3)
+            self.rate = 0.7 * self.rate + 0.3 * rate
+        self._last_poll = now
+        self.polls += 1
+        if len(fresh) >= self.page_size:
+            self.interval = self.min_interval  # falling behind
+        elif fresh:
+            self.interval = max(self.min_interval,
+                                self.interval / self.growth)
+        else:
+            self.interval = min(self.max_interval,
+                                self.interval * self.growth)
+        if fresh:
+            self._last_new = now
+            if self.details:
+                records = self.whisk.activations_fetch(
+                    [a['activationId'] for a in fresh], self.concurrency)
+                self.fetched += len(fresh)
+                fresh = [records.get(a['activationId'], a) for a in fresh]
+        return fresh
+
+    def stats(self):
+        return {'polls': self.polls, 'requests': self.requests,
+                'listed': self.listed, 'rescans': self.rescans,
+                'fetched': self.fetched, 'yielded': self.yielded,
+                'interval': self.interval, 'rate': self.rate,
+                'cursor': self.cursor}
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""asyncio flavour of the OpenWhisk API interface defined in openwhisk.py
+  AsyncOpenWhisk mirrors the methods of openwhisk.OpenWhisk but every call is a
+  coroutine, so a single event loop can keep thousands of invocations in flight
+  over one pooled set of keep-alive connections.  Requires aiohttp.
+  Examples:
+     $ python3
+     >>> import asyncio, async_openwhisk
+     >>> async def main():
+     ...     async with async_openwhisk.AsyncOpenWhisk(wsk_auth) as whisk:
+     ...         print(await whisk.action_names())
+     ...         calls = [whisk.action_invoke('hello', blocking=True,
+     ...                                      result=True, payload={'n': n})
+     ...                  for n in range(1000)]
+     ...         print(await asyncio.gather(*calls))
+     >>> asyncio.run(main())
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import asyncio
+import base64
+import collections
+import json
+
+from action_packager import runtime_image
+from retry_controller import (OK, THROTTLED, TIMEOUT, UNAVAILABLE,
+                              RetryController)
+from url_generator import UrlGenerator
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncOpenWhisk(object):
+    """Coroutine based twin of openwhisk.OpenWhisk.
+       The aiohttp session (and its connection pool) is created lazily on the
+       first request so the object can be built outside of a running loop."""
+
+    def __init__(self, wsk_auth, apihost='localhost', verify=True,
+                 pool_size=1000, pool_size_per_host=0, keepalive_timeout=30,
+                 max_retries=4):
+        """pool_size caps the number of open connections (0 means no limit),
+           pool_size_per_host caps them per apihost (0 means no limit) and
+           keepalive_timeout is how long idle connections are kept around.
+           Throttled and unavailable requests are retried up to max_retries
+           times as openwhisk.OpenWhisk does (see classify); error statuses
+           left after that raise aiohttp.ClientResponseError."""
+        if aiohttp is None:
+            raise ImportError('AsyncOpenWhisk requires aiohttp: '
+                              '`pip install aiohttp`')
+        try:
+            user, password = wsk_auth.split(':')
+        except (AttributeError, ValueError):
+            print('Invocation error: auth must be provided and must contain '
+                  'a colon (":").  See: `wsk property get`\n')
+            raise
+        self.session = None
+        self._headers = {'Authorization': 'Basic ' + base64.b64encode(
+            '{}:{}'.format(user, password).encode('utf-8')).decode('ascii')}
+        self._verify = verify
+        self._pool_size = pool_size
+        self._pool_size_per_host = pool_size_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self.gen = UrlGenerator(apihost, compiled=True)
+        self.retry = RetryController(max_retries)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                limit_per_host=self._pool_size_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                ssl=None if self._verify else False)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 headers=self._headers)
+        return self.session
+
+    # Dynamic URLs that change as self.package changes
+    @property
+    def package(self):
+        """Append '/packages/{package}' to URLs only if self.package is set."""
+        return self.gen.package
+
+    @package.setter
+    def package(self, package_name):
+        self.gen.package = package_name
+
+    # Actions =================================================================
+    async def actions(self):
+        """Returns a list of all actions in url_current_package."""
+        return await self.actions_list()
+
+    async def action_names(self):
+        """Returns a sorted list of the names of all actions."""
+        return sorted(action.get('name', 'Can\'t get action name')
+                      for action in await self.actions())
+
+    async def action_create(self, filename, action_name, runtime='python3',
+                            *args, **kwargs):
+        """Uploads contents of the specified file to the specified action."""
+        with open(filename, 'rb') as in_file:
+            code = in_file.read()
+        if filename.lower().split('.')[-1] == 'zip':
+            code = base64.b64encode(code)
+        code = code.decode('utf-8')
+        payload = {'exec': {'kind': 'blackbox', 'code': code,
+                            'image': runtime_image(runtime)}}
+        url = self.gen.url_action(action_name, *args, **kwargs)
+        return await self._put(url, payload)
+
+    async def sequence_create(self, sequence_name, action_names,
+                              *args, **kwargs):
+        payload = {'exec': {'kind': 'sequence', 'components': action_names}}
+        url = self.gen.url_action(sequence_name, *args, **kwargs)
+        return await self._put(url, payload)
+
+    async def action_delete(self, action_name, *args, **kwargs):
+        """Deletes the specified action."""
+        url = self.gen.url_action(action_name, *args, **kwargs)
+        return await self._delete(url)
+
+    async def action_invoke(self, action_name, *args, **kwargs):
+        """Invokes the specified action."""
+        payload = kwargs.pop('payload') if 'payload' in kwargs else {}
+        url = self.gen.url_action(action_name, *args, **kwargs)
+        return await self._post(url, payload)
+
+    async def action_get(self, action_name, *args, **kwargs):
+        return await self.actions_list(action_name, *args, **kwargs)
+
+    async def actions_list(self, *args, **kwargs):
+        """Lists the actions defined in openwhisk."""
+        return await self._get(self.gen.url_action(*args, **kwargs))
+
+    # Activations =============================================================
+    async def activations(self):
+        """Returns a sorted list of the names of all activation."""
+        return sorted(set(activation.get('name') for activation
+                          in await self.activations_list()))
+
+    async def activation_counts(self):
+        """Returns dict of how many times current actions have been invoked."""
+        return collections.Counter(activation.get('name') for activation
+                                   in await self.activations_list())
+
+    async def activation_ids(self):
+        """Returns a sorted list of the ids of all activation."""
+        return sorted(activation['activationId'] for activation
+                      in await self.activations_list())
+
+    async def activation_info(self, activation_id):
+        """Returns info on the activation."""
+        return await self._get(self.gen.url_activation(activation_id))
+
+    async def activation_results(self, activation_id):
+        """Returns the result of the activation."""
+        url = self.gen.url_activation(activation_id, 'result')
+        return await self._get(url)
+
+    async def activations_list(self, *args, **kwargs):
+        """Lists the activations defined in openwhisk."""
+        return await self._get(self.gen.url_activation(*args, **kwargs))
+
+    # Packages, Rules, Triggers ===============================================
+    async def packages(self):
+        """Returns a sorted list of the names of all packages."""
+        return sorted(package.get('name') for package
+                      in await self.packages_list())
+
+    async def packages_list(self, *args, **kwargs):
+        """Lists the packages defined in openwhisk."""
+        return await self._get(self.gen.url_package(*args, **kwargs))
+
+    async def rules_list(self, *args, **kwargs):
+        """Lists the rules defined in openwhisk."""
+        return await self._get(self.gen.url_rule(*args, **kwargs))
+
+    async def triggers_list(self, *args, **kwargs):
+        """Lists the triggers defined in openwhisk."""
+        return await self._get(self.gen.url_trigger(*args, **kwargs))
+
+    # Requests ================================================================
+    async def _request(self, method, url, payload=None):
+        """Returns the JSON body, retrying transient failures (see classify)
+           with self.retry's backoff.  Once retries run out the last error is
+           raised, and so is an error status (aiohttp.ClientResponseError)
+           unless it is an action's own failure: a 502 with a JSON object."""
+        attempt = 0
+        while True:
+            response = body = error = None
+            try:
+                async with self._session().request(method, url,
+                                                   json=payload) as response:
+                    body = await response.read()
+                body = json.loads(body.decode('utf-8')) if body else None
+            except ValueError:
+                body = None  # a gateway's HTML error page
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            outcome, retry = classify(method, response and response.status,
+                                      body, error)
+            with self.retry.lock:
+                self.retry.counts['requests'] += 1
+                self.retry.counts[outcome] += 1
+                if retry and attempt >= self.retry.max_retries:
+                    self.retry.counts['gave_up'] += 1
+                elif retry:
+                    self.retry.counts['retries'] += 1
+            if not retry or attempt >= self.retry.max_retries:
+                if error is not None:
+                    raise error
+                if response.status >= 400 and not (
+                        response.status == 502 and isinstance(body, dict)):
+                    response.raise_for_status()
+                return body
+            attempt += 1
+            await asyncio.sleep(self.retry.delay(attempt, response))
+
+    async def _delete(self, url, payload=None):
+        return await self._request('DELETE', url, payload)
+
+    async def _get(self, url, payload=None):
+        return await self._request('GET', url, payload)
+
+    async def _post(self, url, payload=None):
+        return await self._request('POST', url, payload)
+
+    async def _put(self, url, payload=None):
+        return await self._request('PUT', url, payload)
+
+    # Misc utils ==============================================================
+    async def invoke_echo(self, message):
+        """Issues a very basic echo request"""
+        echo = '/echo?blocking=true&result=true'
+        return await self._post(self.gen.url_whisk_utils + echo,
+                                payload={'message': message})
+
+    async def system_utils_invoke(self, action_name, **kwargs):
+        """Invokes any action in whisk.system/utils"""
+        url = self.gen.url_whisk_utils + '/' + action_name
+        return await self._post(url + '?blocking=true&result=true&', kwargs)
+
+
+def classify(method, status=None, body=None, error=None):
+    """retry_controller.classify for aiohttp: (outcome, retry) for a status
+       and its parsed body, or for the exception raised instead.  A POST is
+       only retried when the connection could not be made."""
+    if error is not None:
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return UNAVAILABLE, True
+        if isinstance(error, asyncio.TimeoutError):
+            return TIMEOUT, method != 'POST'
+        return UNAVAILABLE, method != 'POST'
+    if status == 429:
+        return THROTTLED, True
+    if status == 503:
+        return UNAVAILABLE, True
+    if status == 502:
+        return (OK, False) if isinstance(body, dict) else (UNAVAILABLE, True)
+    return OK, False
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Throughput of AsyncOpenWhisk versus the synchronous OpenWhisk client
+  Both clients issue blocking invocations against a local stand-in server that
+  answers every POST after a fixed delay, which approximates the round trip to
+  a real controller.  Pass an apihost and auth to measure a live deployment.
+  Examples:
+     $ ./bench_async_client.py                         # local stand-in
+     $ ./bench_async_client.py 2000 200                # calls, concurrency
+     $ ./bench_async_client.py 2000 200 openwhisk.example.com user:key
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from async_openwhisk import AsyncOpenWhisk
+from openwhisk import OpenWhisk
+
+DELAY = 0.01  # seconds the stand-in server spends on each invocation
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    wbufsize = -1  # one write per response, avoids Nagle stalls
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(DELAY)
+        body = json.dumps({'greeting': 'Hello stranger!'}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def bench_sync(apihost, wsk_auth, calls):
+    whisk = OpenWhisk(wsk_auth, apihost=apihost, verify=False)
+    start = time.perf_counter()
+    for n in range(calls):
+        whisk.action_invoke('hello', blocking=True, result=True,
+                            payload={'n': n})
+    return time.perf_counter() - start
+
+
+async def bench_async(apihost, wsk_auth, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def invoke(whisk, n):
+        async with semaphore:
+            return await whisk.action_invoke('hello', blocking=True,
+                                             result=True, payload={'n': n})
+
+    async with AsyncOpenWhisk(wsk_auth, apihost=apihost, verify=False,
+                              pool_size=concurrency) as whisk:
+        start = time.perf_counter()
+        await asyncio.gather(*(invoke(whisk, n) for n in range(calls)))
+        return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    if len(sys.argv) > 4:
+        apihost, wsk_auth = sys.argv[3], sys.argv[4]
+    else:
+        server, apihost = start_stand_in()
+        wsk_auth = 'user:password'
+    # the sync client is sequential so give it a smaller sample
+    sync_calls = min(calls, 200)
+    sync_secs = bench_sync(apihost, wsk_auth, sync_calls)
+    async_secs = asyncio.run(bench_async(apihost, wsk_auth, calls,
+                                         concurrency))
+    sync_rate = sync_calls / sync_secs
+    async_rate = calls / async_secs
+    print('{:>24}: {:>5} calls in {:7.3f}s = {:8.1f} calls/s'.format(
+          'OpenWhisk', sync_calls, sync_secs, sync_rate))
+    print('{:>24}: {:>5} calls in {:7.3f}s = {:8.1f} calls/s'.format(
+          'AsyncOpenWhisk (c={})'.format(concurrency), calls, async_secs,
+          async_rate))
+    print('{:>24}: {:.1f}x'.format('speedup', async_rate / sync_rate))
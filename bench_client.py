@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""Client-side benchmark suite with tracked baselines
+  Measures the per call overhead of url_finish() and UrlGenerator.url_*(),
+  JSON encoding/decoding of payloads and activation records, action_invoke()
+  latency percentiles and action_invoke_many() throughput at 1, 8, 64 and 512
+  concurrent calls.  The invocation benchmarks run against whisk_emulator.py
+  started in a separate process, so server work doesn't share our GIL, with
+  a warm worker for every concurrent call, so nothing queues server side.
+  Results are compared with bench_baseline.json; with --check a regression
+  beyond the tolerance makes the script exit with status 1.
+  Examples:
+     $ ./bench_client.py                   # run and compare with baseline
+     $ ./bench_client.py --check           # ... and fail on regressions
+     $ ./bench_client.py --update          # record a new baseline
+     $ ./bench_client.py --only url json   # just some groups
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import timeit
+
+from openwhisk import OpenWhisk
+from url_generator import UrlGenerator, url_finish
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'bench_baseline.json')
+GROUPS = ('url', 'json', 'latency', 'throughput')
+
+
+def per_call_us(func, number=20000, repeat=5):
+    """Best of repeat runs, in microseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * len(values))))]
+
+
+def bench_url():
+    gen = UrlGenerator('openwhisk.example.com')
+    package_gen = UrlGenerator('openwhisk.example.com')
+    package_gen.package = 'my_package'
+    fast = UrlGenerator('openwhisk.example.com', compiled=True)
+    return {
+        'url_finish()': per_call_us(lambda: url_finish()),
+        'url_finish(name)': per_call_us(lambda: url_finish('n A m E')),
+        'url_finish(name, **query)': per_call_us(
+            lambda: url_finish('n A m E', blocking=True, result=True)),
+        'url_action(name)': per_call_us(lambda: gen.url_action('hello')),
+        'url_action(name, blocking, result)': per_call_us(
+            lambda: gen.url_action('hello', blocking=True, result=True)),
+        'url_action in package': per_call_us(
+            lambda: package_gen.url_action('hello', blocking=True)),
+        'url_activation(id, result)': per_call_us(
+            lambda: gen.url_activation('0123456789abcdef', 'result')),
+        'url_activation(**filters)': per_call_us(
+            lambda: gen.url_activation(name='hello', since=1500000000000,
+                                       docs=True, skip=200, limit=200)),
+        'compiled url_action(name)': per_call_us(
+            lambda: fast.url_action('hello')),
+        'compiled url_action(name, blocking, result)': per_call_us(
+            lambda: fast.url_action('hello', blocking=True, result=True)),
+        'compiled url_activation(id, result)': per_call_us(
+            lambda: fast.url_activation('0123456789abcdef', 'result')),
+    }
+
+
+def bench_json():
+    payload = {'name': 'Wendel', 'items': list(range(100)),
+               'nested': {'text': 'x' * 1000, 'flag': True, 'ratio': 0.5}}
+    record = {'activationId': '0123456789abcdef0123456789abcdef',
+              'namespace': 'guest', 'name': 'hello', 'version': '0.0.1',
+              'start': 1500000000000, 'end': 1500000000012, 'duration': 12,
+              'response': {'status': 'success', 'statusCode': 0,
+                           'success': True, 'result': payload},
+              'logs': ['2017-01-01T00:00:00Z stdout: Hello Wendel!'] * 5,
+              'annotations': [{'key': 'path', 'value': 'guest/hello'},
+                              {'key': 'waitTime', 'value': 3},
+                              {'key': 'initTime', 'value': 250}]}
+    records = [record] * 200
+    page = json.dumps(records)
+    return {
+        'encode payload': per_call_us(lambda: json.dumps(payload), 5000),
+        'decode activation': per_call_us(
+            lambda: json.loads(json.dumps(record)), 2000),
+        'decode 200 activations': per_call_us(lambda: json.loads(page), 20),
+    }
+
+
+class Emulator(object):
+    """whisk_emulator.py in a subprocess on a free port."""
+
+    def __init__(self, *args):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.apihost = 'http://127.0.0.1:{}'.format(port)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'whisk_emulator.py'),
+             '--port', str(port)] + list(args), stdout=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), 0.1).close()
+                return
+            except (IOError, OSError):
+                time.sleep(0.05)
+        raise RuntimeError('the emulator did not start')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+
+def bench_latency(whisk, calls=300):
+    whisk.action_invoke('hello', blocking=True, result=True)  # warm up
+    times = []
+    for n in range(calls):
+        start = time.perf_counter()
+        whisk.action_invoke('hello', blocking=True, result=True,
+                            payload={'name': str(n)})
+        times.append((time.perf_counter() - start) * 1000)
+    return dict(('invoke p{} (ms)'.format(pct), percentile(times, pct))
+                for pct in (50, 95, 99))
+
+
+def bench_throughput(whisk, levels=(1, 8, 64, 512), repeat=3):
+    """Best of repeat runs per level, after a run that warms a container for
+       every concurrent call."""
+    results = {}
+    for concurrency in levels:
+        calls = max(400, 4 * concurrency)
+        payloads = [{'name': str(n)} for n in range(calls)]
+        list(whisk.action_invoke_many('hello', payloads[:concurrency],
+                                      concurrency=concurrency,
+                                      blocking=True, result=True))
+        best = 0.0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            errors = sum(1 for result in whisk.action_invoke_many(
+                         'hello', payloads, concurrency=concurrency,
+                         blocking=True, result=True) if result.error)
+            secs = time.perf_counter() - start
+            if errors:
+                print('  {} of {} calls failed at concurrency {}'.format(
+                      errors, calls, concurrency))
+            best = max(best, (calls - errors) / secs)
+        results['throughput c={} (calls/s)'.format(concurrency)] = best
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints results against baseline; returns the names that regressed."""
+    regressed = []
+    for name, value in sorted(results.items()):
+        higher_is_better = name.startswith('throughput')
+        unit = 'calls/s' if higher_is_better else (
+            'ms' if '(ms)' in name else 'us')
+        line = '{:<44} {:>12.3f} {:<7}'.format(name, value, unit)
+        if name in baseline:
+            old = baseline[name]
+            change = (value - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            line += ' baseline {:>12.3f} {:>+7.1%}'.format(old, change)
+            if worse > tolerance:
+                regressed.append(name)
+                line += '  REGRESSION'
+        print(line)
+    return regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS)
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 on regressions')
+    parser.add_argument('--update', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative slowdown, default 0.5 (50%%)')
+    parser.add_argument('--baseline', default=BASELINE)
+    args = parser.parse_args()
+
+    results = {}
+    if 'url' in args.only:
+        results.update(bench_url())
+    if 'json' in args.only:
+        results.update(bench_json())
+    if 'latency' in args.only or 'throughput' in args.only:
+        with Emulator('--concurrency-limit', '1024', '--max-containers',
+                      '512') as emulator:
+            whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+            whisk.action_create(os.path.join(HERE, 'hello', 'hello.py'),
+                                'hello')
+            if 'latency' in args.only:
+                results.update(bench_latency(whisk))
+            if 'throughput' in args.only:
+                results.update(bench_throughput(whisk))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as in_file:
+            baseline = json.load(in_file)
+    regressed = compare(results, baseline, args.tolerance)
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, 'w') as out_file:
+            json.dump(baseline, out_file, indent=2, sort_keys=True)
+            out_file.write('\n')
+        print('baseline written to {}'.format(args.baseline))
+    if regressed and args.check:
+        print('{} regression(s): {}'.format(len(regressed),
+                                            ', '.join(regressed)))
+        exit(1)
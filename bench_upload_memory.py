@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""Peak client memory of action_create() for a large zip, buffered vs streamed
+  Uploads a random archive to a local stand-in server that discards the body
+  and reports the peak of Python allocations (tracemalloc) for each path.  The
+  memory map used by the streamed path is backed by the page cache and is not
+  counted, just as the file itself is not.
+  Examples:
+     $ ./bench_upload_memory.py        # 40MB archive
+     $ ./bench_upload_memory.py 100    # 100MB archive
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openwhisk import OpenWhisk
+
+
+class DiscardHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(whisk, archive, stream):
+    tracemalloc.start()
+    start = time.perf_counter()
+    whisk.action_create(archive, 'big', stream=stream)
+    secs = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, secs
+
+
+if __name__ == '__main__':
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DiscardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    whisk = OpenWhisk('user:password', verify=False, apihost='http://'
+                      '127.0.0.1:{}'.format(server.server_address[1]))
+    archive = os.path.join(tempfile.mkdtemp(), 'big.zip')
+    with open(archive, 'wb') as out_file:
+        for _ in range(megabytes):
+            out_file.write(os.urandom(1 << 20))
+    try:
+        print('{} MB archive'.format(megabytes))
+        for label, stream in (('buffered', False), ('streamed', True)):
+            peak, secs = measure(whisk, archive, stream)
+            print('{:>9}: peak {:8.1f} MB ({:4.1f}x archive) in {:.2f}s'
+                  .format(label, peak / 1e6, peak / (megabytes << 20), secs))
+    finally:
+        os.remove(archive)
+        server.shutdown()
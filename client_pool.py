@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+"""One client API over several OpenWhisk endpoints, balanced by health and load
+  An OpenWhisk client talks to one apihost.  ClientPool holds one client per
+  (apihost, auth) endpoint and sends each call (action_invoke, actions_list,
+  any OpenWhisk method or property) to one of them: the endpoint with the
+  fewest calls outstanding, or, with policy='latency', the cheaper of two
+  endpoints picked at random, weighing each one's decaying average request
+  latency by its outstanding calls, so a slow host gets little traffic and
+  does not set the tail.  Every request an endpoint's client makes is seen
+  through its instrumentation hooks; an endpoint whose recent requests fail
+  (connection errors, timeouts, 5xx other than the 502 of an action that
+  failed) at error_threshold or more is taken out
+  of rotation and probed in the background, with backoff, until it answers.
+  Examples:
+     $ python3
+     >>> import client_pool
+     >>> pool = client_pool.ClientPool([('https://us.example', us_auth),
+     ...                                ('https://eu.example', eu_auth)],
+     ...                               policy='latency')
+     >>> pool.action_invoke('hello', blocking=True)
+     >>> pool.broadcast('action_create', 'hello/hello.py', 'hello')
+     >>> pool.stats()
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import math
+import random
+import threading
+import time
+import types
+
+from instrumentation import RequestEvent
+from openwhisk import OpenWhisk
+from retry_controller import OK, classify
+
+POLICIES = ('least_outstanding', 'latency')
+
+
+class Endpoint(object):
+    """One OpenWhisk client of a ClientPool and what the pool knows of it.
+       latency is an average of request seconds whose weight decays over
+       `decay` seconds, so an endpoint left alone is tried again."""
+
+    def __init__(self, client, window=20, min_requests=5, error_threshold=0.5,
+                 decay=10.0):
+        self.client = client
+        self.apihost = client.gen.url_base.split('/api/v1/')[0]
+        self.window = collections.deque(maxlen=window)  # True: an error
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.decay = decay
+        self.healthy = True
+        self.outstanding = 0
+        self.calls = self.requests = self.errors = self.ejections = 0
+        self.latency = None
+        self.sampled_at = None
+        self.probe_at = None    # time.monotonic() of the next probe
+        self.probe_delay = None
+        self.probing = False
+        self.lock = threading.Lock()
+        client.instrumentation.add_hook(self.observe)
+
+    def observe(self, event):
+        """Instrumentation hook: one request of this endpoint's client."""
+        if not isinstance(event, RequestEvent):
+            return
+        if event.status == 502 and event.response is not None:
+            # an action that ran and failed is no fault of the endpoint
+            error = classify(event.verb, event.response)[0] != OK
+        else:
+            error = event.error is not None or (event.status or 0) >= 500
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+            self.window.append(error)
+            now = time.monotonic()
+            if self.latency is None:
+                self.latency = event.seconds
+            else:
+                weight = math.exp(-(now - self.sampled_at) / self.decay)
+                self.latency = (weight * self.latency +
+                                (1 - weight) * event.seconds)
+            self.sampled_at = now
+            if (self.healthy and len(self.window) >= self.min_requests and
+                    sum(self.window) >= self.error_threshold *
+                    len(self.window)):
+                self.healthy = False
+                self.ejections += 1
+                self.probe_delay = None
+                self._schedule_probe(now)
+
+    def _schedule_probe(self, now, base=1.0, cap=60.0):
+        self.probe_delay = min(cap, 2 * self.probe_delay if self.probe_delay
+                               else base)
+        self.probe_at = now + self.probe_delay
+
+    def cost(self, now):
+        """Expected wait behind this endpoint: latency times the calls
+           outstanding (plus this one); unknown latency costs nothing."""
+        if self.latency is None:
+            return 0.0
+        latency = self.latency * math.exp(-(now - self.sampled_at) /
+                                          self.decay)
+        return latency * (self.outstanding + 1)
+
+    def probe(self, timeout=5.0):
+        """Lists one action, without retries; an answer below 500 puts the
+           endpoint back in rotation, anything else backs the next probe
+           off."""
+        url = self.client.gen.url_action(limit=1)
+        try:
+            response = self.client.session.get(url, timeout=timeout)
+            ok = response.status_code < 500
+        except Exception:
+            ok = False
+        with self.lock:
+            self.probing = False
+            if ok:
+                self.healthy = True
+                self.window.clear()
+                self.probe_at = self.probe_delay = None
+            else:
+                self._schedule_probe(time.monotonic())
+        return ok
+
+    def stats(self):
+        with self.lock:
+            return {'apihost': self.apihost, 'healthy': self.healthy,
+                    'outstanding': self.outstanding, 'calls': self.calls,
+                    'requests': self.requests, 'errors': self.errors,
+                    'error_rate': (float(sum(self.window)) / len(self.window)
+                                   if self.window else 0.0),
+                    'ejections': self.ejections,
+                    'latency_ms': (None if self.latency is None
+                                   else self.latency * 1000)}
+
+
+class ClientPool(object):
+    """Spreads OpenWhisk calls over `endpoints`: (apihost, auth) pairs or
+       OpenWhisk clients.  client_kwargs are passed to the clients it
+       creates.  Calls go to healthy endpoints, or to all of them if none
+       is; a call that fails raises as it would on a single client.
+       Activations live in the region that ran them, so follow-up calls
+       (activation_info, ...) on pools spanning regions belong on
+       endpoint.client."""
+
+    def __init__(self, endpoints, policy='least_outstanding', window=20,
+                 min_requests=5, error_threshold=0.5, decay=10.0,
+                 probe_timeout=5.0, **client_kwargs):
+        if policy not in POLICIES:
+            raise ValueError('policy must be one of {}'.format(POLICIES))
+        self.policy = policy
+        self.probe_timeout = probe_timeout
+        self.endpoints = []
+        for endpoint in endpoints:
+            if not isinstance(endpoint, OpenWhisk):
+                apihost, auth = endpoint
+                endpoint = OpenWhisk(auth, apihost=apihost, **client_kwargs)
+            self.endpoints.append(Endpoint(endpoint, window, min_requests,
+                                           error_threshold, decay))
+        if not self.endpoints:
+            raise ValueError('a ClientPool needs at least one endpoint')
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        """OpenWhisk methods are called on the endpoint picked at call time,
+           properties are read from the endpoint picked now."""
+        if name.startswith('_') or not hasattr(OpenWhisk, name):
+            raise AttributeError(name)
+        if callable(getattr(OpenWhisk, name)):
+            def call(*args, **kwargs):
+                return self.call(name, *args, **kwargs)
+            call.__name__ = name
+            return call
+        endpoint = self.pick()
+        try:
+            return getattr(endpoint.client, name)
+        finally:
+            self._release(endpoint)
+
+    @property
+    def package(self):
+        return self.endpoints[0].client.package
+
+    @package.setter
+    def package(self, package_name):
+        for endpoint in self.endpoints:
+            endpoint.client.package = package_name
+
+    def pick(self):
+        """Chooses an endpoint and counts a call outstanding on it; the
+           caller must _release() it."""
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if (not endpoint.healthy and not endpoint.probing and
+                    now >= (endpoint.probe_at or now)):
+                endpoint.probing = True
+                threading.Thread(target=endpoint.probe, daemon=True,
+                                 args=(self.probe_timeout,)).start()
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.healthy]
+            candidates = candidates or self.endpoints
+            if self.policy == 'latency' and len(candidates) > 2:
+                candidates = random.sample(candidates, 2)
+            if self.policy == 'latency':
+                endpoint = min(candidates, key=lambda e: e.cost(now))
+            else:
+                fewest = min(e.outstanding for e in candidates)
+                endpoint = random.choice([e for e in candidates
+                                          if e.outstanding == fewest])
+            endpoint.outstanding += 1
+            endpoint.calls += 1
+        return endpoint
+
+    def _release(self, endpoint):
+        with self.lock:
+            endpoint.outstanding -= 1
+
+    def call(self, name, *args, **kwargs):
+        """Calls OpenWhisk method `name` on one endpoint.  A generator
+           (iter_activations, ...) keeps its endpoint until it is done."""
+        endpoint = self.pick()
+        try:
+            result = getattr(endpoint.client, name)(*args, **kwargs)
+        except Exception:
+            self._release(endpoint)
+            raise
+        if isinstance(result, types.GeneratorType):
+            return self._release_after(result, endpoint)
+        self._release(endpoint)
+        return result
+
+    def _release_after(self, generator, endpoint):
+        try:
+            for item in generator:
+                yield item
+        finally:
+            self._release(endpoint)
+
+    def action_invoke_many(self, action_name, payloads, concurrency=8,
+                           ordered=True, *args, **kwargs):
+        """OpenWhisk.action_invoke_many() with each invocation sent to the
+           endpoint picked for it, so a batch is spread like single calls."""
+        result_only = str(kwargs.get('result')).lower() == 'true'
+        for endpoint in self.endpoints:
+            endpoint.client.sessions.grow(concurrency)
+
+        def invoke(index, payload):
+            endpoint = self.pick()
+            try:
+                client = endpoint.client
+                url = client.gen.url_action(action_name, *args, **kwargs)
+                return client._invoke_one(url, result_only, index, payload)
+            finally:
+                self._release(endpoint)
+        return OpenWhisk._run_many(invoke, payloads, concurrency, ordered)
+
+    def broadcast(self, name, *args, **kwargs):
+        """Calls method `name` on every endpoint (to deploy an action to all
+           regions, say); returns {apihost: result}."""
+        return dict((endpoint.apihost,
+                     getattr(endpoint.client, name)(*args, **kwargs))
+                    for endpoint in self.endpoints)
+
+    def probe(self):
+        """Probes every unhealthy endpoint now; returns how many are
+           healthy."""
+        for endpoint in self.endpoints:
+            if not endpoint.healthy:
+                endpoint.probe(self.probe_timeout)
+        return sum(endpoint.healthy for endpoint in self.endpoints)
+
+    def stats(self):
+        return [endpoint.stats() for endpoint in self.endpoints]
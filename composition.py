@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+"""Client-side compositions of actions as a DAG, run with parallel branches
+  OpenWhisk's `sequence` kind runs its actions strictly one after another.
+  A Composition describes a DAG instead: each node invokes an action with the
+  result of the node it runs after as its payload (the input payload for
+  nodes that run after nothing), and a node after several others (a fan-in)
+  gets {node name: result} or whatever its join() makes of that dict.
+  Composition.run() invokes every node as soon as the nodes it depends on
+  are done, so independent branches run concurrently, enforces per node
+  timeouts, and reports when each node ran and which chain of nodes (the
+  critical path) made up the end to end latency.
+  Examples:
+     $ python3
+     >>> import composition, openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> flow = composition.Composition()
+     >>> flow.add('fetch')
+     >>> flow.add('resize', after=['fetch'], timeout=30)
+     >>> flow.add('classify', after=['fetch'])
+     >>> flow.add('store', after=['resize', 'classify'])
+     >>> run = flow.run(whisk, {'url': 'http://...'})
+     >>> run.output, run.elapsed, [step.node for step in run.critical_path]
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import time
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+
+# One node of a Composition
+Node = collections.namedtuple('Node', 'name action after timeout join')
+
+# When a node ran, in seconds since the composition started
+Step = collections.namedtuple('Step', 'node start end')
+
+# What Composition.run() returns.  output is the result of the only sink
+# node, or {sink name: result} if there are several.  serial is the sum of
+# the node times: about what running them as a sequence would take.
+CompositionRun = collections.namedtuple(
+    'CompositionRun', 'output results steps critical_path elapsed serial')
+
+
+class CompositionError(Exception):
+    """A node failed or timed out; node names it and cause is the error."""
+
+    def __init__(self, node, cause):
+        Exception.__init__(self, 'node {!r} failed: {!r}'.format(node, cause))
+        self.node = node
+        self.cause = cause
+
+
+class ActionError(Exception):
+    """An invocation answered with {'error': ...}: the action failed, or
+       OpenWhisk refused to run it."""
+
+
+def invoke(whisk, action, payload, timeout=None):
+    """Blocking whisk.action_invoke() returning the action's result, so the
+       client's instrumentation and payload offload apply; an ActivationFuture
+       (still running after the server's wait) is waited on.  Raises
+       ActionError for a result holding an error."""
+    result = whisk.action_invoke(action, blocking=True, result=True,
+                                 payload=payload)
+    if isinstance(result, Future):
+        result = result.result(timeout)
+    if isinstance(result, dict) and 'error' in result:
+        raise ActionError(result['error'])
+    return result
+
+
+class Composition(object):
+    """A DAG of action invocations.  Nodes are added after the nodes they
+       depend on, which keeps the graph acyclic."""
+
+    def __init__(self):
+        self.nodes = collections.OrderedDict()
+
+    def add(self, name, action=None, after=(), timeout=None, join=None):
+        """Adds node `name` invoking `action` (default: name) once all the
+           nodes in `after` are done.  timeout (seconds) bounds the node's
+           invocation; join(results) turns the {node: result} of a fan-in
+           into the payload."""
+        if name in self.nodes:
+            raise ValueError('node {!r} already exists'.format(name))
+        if isinstance(after, str):
+            after = [after]
+        for dependency in after:
+            if dependency not in self.nodes:
+                raise ValueError('node {!r} runs after unknown node {!r}'
+                                 .format(name, dependency))
+        self.nodes[name] = Node(name, action or name, tuple(after), timeout,
+                                join)
+        return name
+
+    def sinks(self):
+        needed = set(d for node in self.nodes.values() for d in node.after)
+        return [name for name in self.nodes if name not in needed]
+
+    def _payload(self, node, payload, results):
+        if not node.after:
+            return payload
+        if len(node.after) == 1 and node.join is None:
+            return results[node.after[0]]
+        joined = collections.OrderedDict((d, results[d]) for d in node.after)
+        return node.join(joined) if node.join else joined
+
+    def run(self, whisk, payload=None, max_workers=16, invoke=invoke):
+        """Runs the composition on `whisk` and returns a CompositionRun.
+           Raises CompositionError for the first node that fails or runs
+           out of time; nodes already running are left to finish."""
+        if not self.nodes:
+            raise ValueError('the composition has no nodes')
+        waiting = dict((name, set(node.after))
+                       for name, node in self.nodes.items())
+        results, steps = {}, {}
+        running = {}    # executor future: node name
+        deadlines = {}  # node name: time.monotonic() it must be done by
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        started = time.monotonic()
+
+        def start(name):
+            node = self.nodes[name]
+            del waiting[name]
+            steps[name] = time.monotonic() - started
+            if node.timeout is not None:
+                deadlines[name] = time.monotonic() + node.timeout
+            running[pool.submit(invoke, whisk, node.action, self._payload(
+                node, payload, results), node.timeout)] = name
+
+        try:
+            for name in [name for name, after in waiting.items() if not after]:
+                start(name)
+            while running:
+                timeout = None
+                if deadlines:
+                    timeout = max(0, min(deadlines.values()) - time.monotonic())
+                done, _ = wait(running, timeout, FIRST_COMPLETED)
+                if not done:
+                    late = min(deadlines, key=deadlines.get)
+                    raise CompositionError(late, TimeoutError(
+                        'no result after {}s'.format(
+                            self.nodes[late].timeout)))
+                for future in done:
+                    name = running.pop(future)
+                    deadlines.pop(name, None)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        raise CompositionError(name, e)
+                    steps[name] = Step(name, steps[name],
+                                       time.monotonic() - started)
+                    for other, after in list(waiting.items()):
+                        after.discard(name)
+                        if not after:
+                            start(other)
+        finally:
+            pool.shutdown(wait=False)
+        elapsed = time.monotonic() - started
+        sinks = self.sinks()
+        output = results[sinks[0]] if len(sinks) == 1 else dict(
+            (name, results[name]) for name in sinks)
+        ordered = [steps[name] for name in self.nodes]
+        return CompositionRun(output, results, ordered,
+                              self.critical_path(steps), elapsed,
+                              sum(step.end - step.start for step in ordered))
+
+    def critical_path(self, steps):
+        """The chain of Steps that ended last: from the last node to finish,
+           back through the dependency that finished last before it."""
+        name = max(steps, key=lambda name: steps[name].end)
+        path = [steps[name]]
+        while self.nodes[name].after:
+            name = max(self.nodes[name].after, key=lambda d: steps[d].end)
+            path.append(steps[name])
+        return path[::-1]
+
+
+def format_run(run):
+    """A text report of a CompositionRun: one line per node, with the
+       critical path marked."""
+    critical = set(step.node for step in run.critical_path)
+    width = max([4] + [len(step.node) for step in run.steps])
+    lines = ['{:<{}} {:>8} {:>8} {:>8}'.format('node', width, 'start',
+                                                'end', 'secs')]
+    for step in run.steps:
+        lines.append('{:<{}} {:>8.3f} {:>8.3f} {:>8.3f}{}'.format(
+            step.node, width, step.start, step.end, step.end - step.start,
+            '  *' if step.node in critical else ''))
+    lines.append('elapsed {:.3f}s, {:.3f}s as a sequence, * critical path'
+                 .format(run.elapsed, run.serial))
+    return '\n'.join(lines)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""Connection pool configuration shared by the sessions of an OpenWhisk client
+  A plain requests.Session keeps at most 10 connections per host, never closes
+  idle ones and waits forever on a silent server.  PoolAdapter makes the pool
+  sizes, blocking, socket timeout and keep-alive idle time configurable, and
+  SessionPool hands out sessions mounted on one such adapter: a single shared
+  session, or one per thread (requests doesn't promise that a Session may be
+  used by several threads at once) that all reuse the same warm connections.
+  Examples:
+     $ python3
+     >>> import connection_pool
+     >>> sessions = connection_pool.SessionPool(('user', 'key'),
+     ...                                        thread_local=True,
+     ...                                        pool_maxsize=64, timeout=30)
+     >>> sessions.session.get(url)  # this thread's session, shared pool
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import threading
+import time
+
+import requests
+
+
+class IdleExpiringPool(object):
+    """Mixin for urllib3 connection pools: a pooled connection that sat idle
+       for more than keepalive_timeout seconds is closed (and so reconnected)
+       rather than reused, as servers and load balancers drop those."""
+
+    keepalive_timeout = None
+
+    def _get_conn(self, timeout=None):
+        conn = super(IdleExpiringPool, self)._get_conn(timeout)
+        idle_since = getattr(conn, 'idle_since', None)
+        if (idle_since is not None and
+                time.monotonic() - idle_since > self.keepalive_timeout):
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+        super(IdleExpiringPool, self)._put_conn(conn)
+
+
+class PoolAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose requests default to a socket timeout (seconds, or a
+       (connect, read) tuple) and whose idle connections expire after
+       keepalive_timeout seconds.  pool_connections is the number of hosts
+       with a pool, pool_maxsize the connections kept per host and
+       pool_block=True makes callers wait for one rather than open more."""
+
+    __attrs__ = requests.adapters.HTTPAdapter.__attrs__ + [
+        'timeout', 'keepalive_timeout']
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 timeout=None, keepalive_timeout=None, max_retries=0):
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        super(PoolAdapter, self).__init__(pool_connections, pool_maxsize,
+                                          max_retries, pool_block)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PoolAdapter, self).init_poolmanager(*args, **kwargs)
+        if self.keepalive_timeout is not None:
+            self.poolmanager.pool_classes_by_scheme = dict(
+                (scheme, type('IdleExpiring' + cls.__name__,
+                              (IdleExpiringPool, cls),
+                              {'keepalive_timeout': self.keepalive_timeout}))
+                for scheme, cls in
+                self.poolmanager.pool_classes_by_scheme.items())
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(PoolAdapter, self).send(request, **kwargs)
+
+
+class SessionPool(object):
+    """requests sessions with our auth and verify, all mounted on one
+       PoolAdapter (built from adapter_kw).  .session is the shared session,
+       or with thread_local=True the calling thread's own session."""
+
+    def __init__(self, auth=None, verify=True, thread_local=False,
+                 **adapter_kw):
+        self.auth = auth
+        self.verify = verify
+        self.adapter_kw = adapter_kw
+        self.adapter = PoolAdapter(**adapter_kw)
+        self._local = threading.local() if thread_local else None
+        self._shared = None if thread_local else self._new_session()
+
+    @property
+    def thread_local(self):
+        return self._local is not None
+
+    def _new_session(self):
+        session = requests.Session()
+        session.verify = self.verify  # verify SSL certs (bool)
+        session.auth = self.auth      # uses our auth token for all calls
+        self._mount(session)
+        return session
+
+    def _mount(self, session):
+        for prefix in ('https://', 'http://'):
+            session.mount(prefix, self.adapter)
+
+    @property
+    def session(self):
+        if self._local is None:
+            return self._shared
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        elif session.get_adapter('http://') is not self.adapter:
+            self._mount(session)  # grow() replaced the adapter
+        return session
+
+    def grow(self, size):
+        """Make sure `size` connections per host can be kept open so
+           concurrent callers don't throw away connections.  Connections of
+           the previous, smaller pool finish their requests and are dropped."""
+        if self.adapter._pool_maxsize < size:
+            self.adapter_kw = dict(self.adapter_kw, pool_maxsize=size)
+            self.adapter = PoolAdapter(**self.adapter_kw)
+            if self._shared is not None:
+                self._mount(self._shared)
+
+    def close(self):
+        self.adapter.close()
+        if self._shared is not None:
+            self._shared.close()
@@ -13,16 +13,8 @@ if [ ! -f "requirements.txt" ]; then
     exit -1
 fi;
 
-docker run --rm -v "$PWD:/tmp" bspar/openwhisk-runtime-python:python3-latest bash \
-  -c "cd tmp && virtualenv virtualenv && source virtualenv/bin/activate && pip install -r requirements.txt"
-
-cp $1 __main__.py
-filename=$(basename -- "$1")
-name="${filename%.*}"
-zip -r "$name.zip" virtualenv __main__.py
-
-rm __main__.py
-rm -rf virtualenv
+# The virtualenv layer is built once per requirements.txt and runtime image
+# and cached by action_packager.py; see its docstring.
+python3 "$(dirname "$0")/../action_packager.py" "$1" requirements.txt || exit -1
 
 echo "[+] All done"
-echo "[+] Created $name.zip"
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+"""Request and activation instrumentation for the OpenWhisk client
+  Every request made by OpenWhisk is timed into a fixed-bucket latency
+  histogram per entity (actions, activations, ...) and HTTP verb, and counted
+  per status code.  Activation records that come back to the client (blocking
+  invokes without result=True, resolved ActivationFutures) link the client
+  round trip to the server-side waitTime, initTime and duration, so time
+  spent queueing, cold starting, running and in transit can be told apart:
+     overhead = round trip - waitTime - duration    (network and controller)
+  Hooks are called with a RequestEvent or ActivationEvent after each call.
+  Histograms export as JSON or in the Prometheus text format.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> whisk.instrumentation.add_hook(print)
+     >>> whisk.action_invoke('hello', blocking=True)
+     >>> print(whisk.instrumentation.to_prometheus())
+     >>> whisk.instrumentation.to_json()
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import bisect
+import collections
+import functools
+import json
+import threading
+
+# Upper bounds (seconds) of the histogram buckets, roughly 2.5x apart
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0, 25.0, 60.0)
+
+HELP = {
+    'request_seconds': 'Client round trip of OpenWhisk API requests',
+    'activation_round_trip_seconds': 'Client round trip of activations',
+    'activation_wait_seconds': 'Server-side waitTime of activations',
+    'activation_init_seconds': 'Server-side initTime of cold activations',
+    'activation_duration_seconds': 'Server-side duration of activations',
+    'activation_overhead_seconds': 'Round trip not spent waiting or running',
+}
+
+# Passed to the hooks after each request, and for each linked activation
+# (response is the requests.Response, if there was one)
+RequestEvent = collections.namedtuple(
+    'RequestEvent', 'verb entity url status seconds error response',
+    defaults=(None,))
+ActivationEvent = collections.namedtuple(
+    'ActivationEvent', 'action activation_id round_trip wait init duration')
+
+
+@functools.lru_cache(1024)
+def entity_of(url):
+    """'https://host/api/v1/namespaces/_/packages/p/actions/a?x=1' ->
+       'actions'.  Paths inside a package count as their own entity."""
+    path = url.split('?', 1)[0].split('/namespaces/', 1)[-1]
+    parts = path.split('/')[1:]
+    if len(parts) > 2 and parts[0] == 'packages':
+        parts = parts[2:]
+    return parts[0] if parts and parts[0] else 'namespaces'
+
+
+def annotation_ms(activation, key):
+    for pair in activation.get('annotations') or []:
+        if pair.get('key') == key:
+            return pair.get('value')
+    return None
+
+
+class Histogram(object):
+    """Counts of observations per bucket (the last is +Inf), their sum and
+       number.  Not locked: Instrumentation serializes the updates."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate: the upper bound of the bucket holding the q quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.buckets + (float('inf'),),
+                                self.cumulative()):
+            if total >= rank:
+                return bound
+
+    def cumulative(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+    def to_dict(self):
+        return {'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'],
+                                    self.cumulative())),
+                'sum': self.sum, 'count': self.count,
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99)}
+
+
+class Instrumentation(object):
+    """Histograms keyed by (metric, labels), response counts keyed by
+       (entity, verb, status) and the hooks to call with each event."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.responses = collections.Counter()
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.responses = collections.Counter()
+
+    def _observe(self, metric, labels, value):
+        key = (metric, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def request(self, verb, url, seconds, response=None, error=None):
+        """Records one API call (including its retries)."""
+        entity = entity_of(url)
+        status = response.status_code if response is not None else None
+        with self.lock:
+            self._observe('request_seconds', (('entity', entity),
+                                              ('verb', verb)), seconds)
+            self.responses[(entity, verb, status or type(error).__name__)] += 1
+        if self.hooks:
+            event = RequestEvent(verb, entity, url, status, seconds, error,
+                                 response)
+            for hook in self.hooks:
+                hook(event)
+
+    def activation(self, activation, round_trip):
+        """Links the client round trip (seconds) of an activation record to
+           its server-side timings; records without them are ignored."""
+        duration = activation.get('duration')
+        if duration is None:
+            return
+        action = activation.get('name') or ''
+        wait = annotation_ms(activation, 'waitTime')
+        init = annotation_ms(activation, 'initTime')
+        labels = (('action', action),)
+        with self.lock:
+            self._observe('activation_round_trip_seconds', labels, round_trip)
+            self._observe('activation_duration_seconds', labels,
+                          duration / 1000.0)
+            if wait is not None:
+                self._observe('activation_wait_seconds', labels, wait / 1000.0)
+            if init is not None:
+                self._observe('activation_init_seconds', labels, init / 1000.0)
+            self._observe('activation_overhead_seconds', labels, max(
+                0.0, round_trip - ((wait or 0) + duration) / 1000.0))
+        if self.hooks:
+            event = ActivationEvent(action, activation.get('activationId'),
+                                    round_trip, wait, init, duration)
+            for hook in self.hooks:
+                hook(event)
+
+    def to_dict(self):
+        with self.lock:
+            histograms = collections.defaultdict(list)
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                histograms[metric].append(dict(labels, **histogram.to_dict()))
+            responses = [{'entity': entity, 'verb': verb, 'status': status,
+                          'count': count} for (entity, verb, status), count
+                         in sorted(self.responses.items(), key=str)]
+        return {'histograms': dict(histograms), 'responses': responses}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix='openwhisk_client'):
+        """The text exposition format, version 0.0.4."""
+        lines = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+            responses = sorted(self.responses.items(), key=str)
+        last = None
+        for (metric, labels), histogram in items:
+            name = '{}_{}'.format(prefix, metric)
+            if metric != last:
+                lines += ['# HELP {} {}'.format(name, HELP.get(metric, metric)),
+                          '# TYPE {} histogram'.format(name)]
+                last = metric
+            label_text = ','.join('{}="{}"'.format(key, escape(value))
+                                  for key, value in labels)
+            for bound, total in zip(histogram.buckets + ('+Inf',),
+                                    histogram.cumulative()):
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    name, label_text, bound, total))
+            lines.append('{}_sum{{{}}} {!r}'.format(name, label_text,
+                                                     histogram.sum))
+            lines.append('{}_count{{{}}} {}'.format(name, label_text,
+                                                    histogram.count))
+        if responses:
+            name = prefix + '_responses_total'
+            lines += ['# HELP {} API responses by status code'.format(name),
+                      '# TYPE {} counter'.format(name)]
+            for (entity, verb, status), count in responses:
+                lines.append('{}{{entity="{}",verb="{}",status="{}"}} {}'.format(
+                    name, escape(entity), verb, status, count))
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+def log_event(event):
+    """A hook printing one line per event, in place of the old DEBUG output"""
+    if isinstance(event, RequestEvent):
+        print('{} {} -> {} in {:.1f}ms'.format(
+            event.verb.upper(), event.url, event.status or repr(event.error),
+            event.seconds * 1000))
+    else:
+        print('activation {} of {}: {:.1f}ms round trip, wait={} init={} '
+              'duration={} (ms)'.format(event.activation_id, event.action,
+                                        event.round_trip * 1000, event.wait,
+                                        event.init, event.duration))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""TTL + LRU cache for the entity listings fetched by openwhisk.OpenWhisk
+  Entries are keyed by (kind, url), so different packages and query strings
+  are cached separately, and all entries of one kind can be dropped when a
+  write changes that kind of entity: the listing of the namespace holds
+  packaged actions too, so a write in any package is seen in it.
+  Examples:
+     $ python3
+     >>> import listing_cache
+     >>> cache = listing_cache.ListingCache(ttl=30, maxsize=256)
+     >>> cache.put(('actions', url), response)
+     >>> cache.get(('actions', url)) is response
+     True
+     >>> cache.invalidate('actions')
+     >>> cache.stats()
+     {'hits': 1, 'misses': 0, 'evictions': 0, 'size': 0}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import threading
+import time
+
+
+class ListingCache(object):
+    """Holds up to maxsize entries for ttl seconds each, evicting the least
+       recently used entry when full.  Safe to share between threads."""
+
+    def __init__(self, ttl=30.0, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()  # key: (expires, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached value for key or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, kind=None):
+        """Drops the entries of one kind (all kinds if None)."""
+        with self._lock:
+            for key in list(self._entries):
+                if kind is None or key[0] == kind:
+                    del self._entries[key]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries)}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+"""Deploys a manifest of packages, actions, sequences, triggers and rules
+  A manifest (a dict, or a .json or, with PyYAML, .yaml file) describes the
+  entities of a deployment:
+      {"name": "shop",
+       "packages": {"imaging": {"parameters": {"quality": 80}}},
+       "actions": {"imaging/resize": {"file": "resize.py", "limits": {...}},
+                   "hello": "hello/hello.py"},
+       "sequences": {"pipeline": ["imaging/resize", "hello"]},
+       "triggers": {"uploaded": {}},
+       "rules": {"on_upload": {"trigger": "uploaded", "action": "pipeline"}}}
+  Files are relative to the manifest.  deploy() lists what the namespace
+  holds, one paged listing per kind, and compares it with the manifest:
+  every entity it deploys is annotated with the deployment name and a digest
+  of its body (and code), so only new and changed entities are written, and
+  entities of the deployment no longer in the manifest are deleted.
+  Changes are applied by dependency level (packages and triggers, then the
+  actions in them, then sequences, then rules), each level concurrently.
+  Examples:
+     $ python3
+     >>> import manifest_deploy, openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> result = manifest_deploy.deploy(whisk, 'manifest.json')
+     >>> print(manifest_deploy.format_changes(result.changes))
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from action_packager import runtime_image
+from openwhisk import OpenWhisk, annotation, code_digest
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+KINDS = ('packages', 'triggers', 'actions', 'rules')
+
+# Annotations deploy() adds to every entity it writes
+MANIFEST_ANNOTATION = 'manifest'
+MANIFEST_DIGEST_ANNOTATION = 'manifestDigest'
+
+# One entity of a Manifest.  file and runtime are set for actions with code
+# and after holds the (kind, name) keys of the entities it needs.
+Entity = collections.namedtuple('Entity',
+                                'kind name body file runtime digest after')
+
+# op is 'create', 'update' or 'delete'
+Change = collections.namedtuple('Change', 'op kind name')
+
+# What deploy() returns.  unchanged counts the entities left as they were.
+DeployResult = collections.namedtuple('DeployResult',
+                                      'changes unchanged elapsed')
+
+
+class DeployError(Exception):
+    """A change failed; change names it and cause is the error."""
+
+    def __init__(self, change, cause):
+        Exception.__init__(self, '{} {} {!r} failed: {!r}'.format(
+            change.op, change.kind, change.name, cause))
+        self.change = change
+        self.cause = cause
+
+
+def key_values(mapping):
+    """{'a': 1} -> [{'key': 'a', 'value': 1}]; lists are kept as they are."""
+    if isinstance(mapping, list):
+        return mapping
+    return [{'key': key, 'value': value}
+            for key, value in sorted((mapping or {}).items())]
+
+
+def qualified(name):
+    """'/_/name' for a name in the default namespace; fully qualified
+       names ('/namespace/...') are kept as they are."""
+    return name if name.startswith('/') else '/_/' + name
+
+
+def local_name(name):
+    """The manifest name a reference stands for: 'pkg/a' for 'pkg/a' or
+       '/_/pkg/a'.  Names in other namespaces are never in the manifest."""
+    return name[len('/_/'):] if name.startswith('/_/') else name
+
+
+def full_name(entity):
+    """The name of a listed entity including its package: 'pkg/action'."""
+    return '/'.join(entity.get('namespace', '').split('/')[1:] +
+                    [entity['name']])
+
+
+def load_manifest(source):
+    """(manifest dict, directory its files are relative to)"""
+    if isinstance(source, dict):
+        return source, os.getcwd()
+    with open(source) as in_file:
+        if source.lower().endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError('YAML manifests require PyYAML')
+            doc = yaml.safe_load(in_file)
+        else:
+            doc = json.load(in_file)
+    return doc, os.path.dirname(os.path.abspath(source))
+
+
+class Manifest(object):
+    """The entities a manifest describes, keyed by (kind, name)."""
+
+    def __init__(self, source, name=None, base_dir=None):
+        doc, directory = load_manifest(source)
+        self.base_dir = base_dir or directory
+        self.name = name or doc.get('name') or 'default'
+        self.entities = collections.OrderedDict()
+        for package, spec in (doc.get('packages') or {}).items():
+            self._add('packages', package, self._common(spec or {}))
+        for trigger, spec in (doc.get('triggers') or {}).items():
+            self._add('triggers', trigger, self._common(spec or {}))
+        for action, spec in (doc.get('actions') or {}).items():
+            self._add_action(action, spec)
+        for sequence, spec in (doc.get('sequences') or {}).items():
+            if isinstance(spec, list):
+                spec = {'actions': spec}
+            body = self._common(spec, limits=True)
+            body['exec'] = {'kind': 'sequence', 'components': [
+                qualified(action) for action in spec['actions']]}
+            after = [('actions', local_name(action))
+                     for action in spec['actions']]
+            if '/' in sequence:
+                after.append(('packages', sequence.split('/')[0]))
+            self._add('actions', sequence, body, after)
+        for rule, spec in (doc.get('rules') or {}).items():
+            body = self._common(spec)
+            body.update(trigger=qualified(spec['trigger']),
+                        action=qualified(spec['action']))
+            self._add('rules', rule, body,
+                      [('triggers', local_name(spec['trigger'])),
+                       ('actions', local_name(spec['action']))])
+        self.levels = self._levels()
+
+    @staticmethod
+    def _common(spec, limits=False):
+        body = {'parameters': key_values(spec.get('parameters')),
+                'annotations': key_values(spec.get('annotations'))}
+        if 'publish' in spec:
+            body['publish'] = spec['publish']
+        if limits and spec.get('limits'):
+            body['limits'] = spec['limits']
+        return body
+
+    def _add_action(self, name, spec):
+        if isinstance(spec, str):
+            spec = {'file': spec}
+        runtime = spec.get('runtime', 'python3')
+        options = dict((key, spec[key]) for key in ('requirements',
+                                                    'extra_files', 'slim',
+                                                    'precompile')
+                       if key in spec)
+        filename = OpenWhisk._package_action(
+            os.path.join(self.base_dir, spec['file']), runtime, options)
+        after = [('packages', name.split('/')[0])] if '/' in name else []
+        self._add('actions', name, self._common(spec, limits=True), after,
+                  filename, runtime, code_digest(filename,
+                                                 runtime_image(runtime)))
+
+    def _add(self, kind, name, body, after=(), filename=None, runtime=None,
+             code=None):
+        key = (kind, name)
+        if key in self.entities:
+            raise ValueError('{} {!r} is described twice'.format(kind, name))
+        digest = hashlib.sha256(json.dumps(
+            [kind, body, code], sort_keys=True).encode('utf-8')).hexdigest()
+        body = dict(body, annotations=body['annotations'] + [
+            {'key': MANIFEST_ANNOTATION, 'value': self.name},
+            {'key': MANIFEST_DIGEST_ANNOTATION, 'value': digest}])
+        self.entities[key] = Entity(kind, name, body, filename, runtime,
+                                    digest, tuple(after))
+
+    def _levels(self):
+        """{(kind, name): level}; entities the manifest needs but doesn't
+           describe are expected to exist already."""
+        levels = {}
+
+        def level(key, seen=()):
+            if key not in levels:
+                if key in seen:
+                    raise ValueError('{} {!r} depends on itself'.format(*key))
+                levels[key] = 1 + max([level(dependency, seen + (key,))
+                                       for dependency in self.entities[key]
+                                       .after if dependency in self.entities]
+                                      or [-1])
+            return levels[key]
+        for key in self.entities:
+            level(key)
+        return levels
+
+
+def entity_url(whisk, kind, name, **query):
+    """The URL of an entity by its full name, whatever whisk.package is."""
+    url = '{}/{}/{}'.format(whisk.gen.url_base, kind, quote(name))
+    if query:
+        url += '?' + '&'.join('{}={}'.format(key, str(value).lower())
+                              for key, value in sorted(query.items()))
+    return url
+
+
+def remote_state(whisk, page_size=200):
+    """{(kind, name): listing entry} of everything in the namespace, with
+       the kinds listed concurrently."""
+    def list_kind(kind):
+        entries, skip = [], 0
+        while True:
+            response = whisk._get('{}/{}?limit={}&skip={}'.format(
+                whisk.gen.url_base, kind, page_size, skip))
+            response.raise_for_status()
+            page = response.json()
+            entries.extend(page)
+            if len(page) < page_size:
+                return [((kind, full_name(entry)), entry) for entry in entries]
+            skip += page_size
+
+    with ThreadPoolExecutor(max_workers=len(KINDS)) as pool:
+        return dict(pair for pairs in pool.map(list_kind, KINDS)
+                    for pair in pairs)
+
+
+def plan(manifest, remote, prune=True):
+    """The Changes that make remote (see remote_state()) match manifest,
+       and how many entities already do."""
+    changes, unchanged = [], 0
+    for key, entity in manifest.entities.items():
+        current = remote.get(key)
+        if current is None:
+            changes.append(Change('create', *key))
+        elif annotation(current, MANIFEST_DIGEST_ANNOTATION) != entity.digest:
+            changes.append(Change('update', *key))
+        else:
+            unchanged += 1
+    if prune:
+        changes.extend(Change('delete', *key) for key, current
+                       in sorted(remote.items())
+                       if key not in manifest.entities and
+                       annotation(current, MANIFEST_ANNOTATION) ==
+                       manifest.name)
+    return changes, unchanged
+
+
+def apply(whisk, manifest, changes, remote, concurrency=16):
+    """Applies changes: deletions first, rules before the actions and
+       sequences before the plain actions they use, then creations and
+       updates by manifest level.  Each step runs concurrently; the first
+       failure of a step raises a DeployError once the step is done."""
+    def delete_order(change):
+        if change.kind == 'rules':
+            return 0
+        if change.kind == 'actions':
+            exec_ = remote[(change.kind, change.name)].get('exec') or {}
+            return 1 if exec_.get('kind') == 'sequence' else 2
+        return 3
+
+    def write(change):
+        entity = manifest.entities[(change.kind, change.name)]
+        url = entity_url(whisk, change.kind, change.name, overwrite=True)
+        if entity.file is not None:
+            response = whisk._upload_action(url, entity.file,
+                                            runtime_image(entity.runtime),
+                                            stream=True, extra=entity.body)
+        else:
+            response = whisk._put(url, entity.body)
+        response.raise_for_status()
+
+    def delete(change):
+        response = whisk._delete(entity_url(whisk, change.kind, change.name))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    steps = collections.defaultdict(list)
+    for change in changes:
+        if change.op == 'delete':
+            steps[(0, delete_order(change))].append(change)
+        else:
+            steps[(1, manifest.levels[(change.kind, change.name)])].append(
+                change)
+    whisk.sessions.grow(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for step in sorted(steps):
+            work = delete if step[0] == 0 else write
+            futures = [(change, pool.submit(work, change))
+                       for change in steps[step]]
+            for change, future in futures:
+                error = future.exception()
+                if error is not None:
+                    raise DeployError(change, error)
+    for kind in set(change.kind for change in changes):
+        whisk._invalidate(kind)
+
+
+def deploy(whisk, manifest, prune=True, dry_run=False, concurrency=16):
+    """Brings the namespace of whisk in line with manifest (a Manifest or
+       what Manifest() takes) and returns a DeployResult.  dry_run only
+       plans the changes."""
+    start = time.monotonic()
+    if not isinstance(manifest, Manifest):
+        manifest = Manifest(manifest)
+    remote = remote_state(whisk)
+    changes, unchanged = plan(manifest, remote, prune)
+    if not dry_run:
+        apply(whisk, manifest, changes, remote, concurrency)
+    return DeployResult(changes, unchanged, time.monotonic() - start)
+
+
+def format_changes(changes):
+    """One 'op kind name' line per change."""
+    return '\n'.join('{:<6} {:<8} {}'.format(change.op, change.kind[:-1],
+                                             change.name)
+                     for change in changes) or 'no changes'
@@ -29,30 +29,125 @@
  */
 """
 
+import sys
+
+if __name__ == '__main__' and not (len(sys.argv) == 2 and ':' in sys.argv[1]):
+    # `python -m openwhisk <subcommand>` is the CLI, which imports only what
+    # the subcommand needs; `./openwhisk.py <auth>` runs the self test below
+    from openwhisk_cli import main
+    sys.exit(main())
 
 import collections
+import hashlib
+import itertools
+import json
 import os
-import sys
+import time
 import pprint
 import requests
 import base64
-
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from action_packager import build_action, runtime_image
+from activation_analytics import ActivationAnalytics
+from activation_future import ActivationFuture, ActivationPoller, as_completed
+from activation_store import ActivationStore
+from activation_watch import ActivationWatcher
+from connection_pool import SessionPool
+from instrumentation import Instrumentation, log_event
+from listing_cache import ListingCache
+from retry_controller import RetryController, classify
+from streaming_upload import Base64JsonBody
+from trigger_emitter import TriggerEmitter
 from url_generator import UrlGenerator
 
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-DEBUG = False
+DEBUG = False  # log every request and activation (see log_event)
+
+
+def debug_hook(event):
+    """log_event(event) while the module-level DEBUG is set"""
+    if DEBUG:
+        log_event(event)
+
+
+# Annotation where action_create() records code_digest() of what it uploaded
+DIGEST_ANNOTATION = 'codeDigest'
+
+# One entry of OpenWhisk.action_invoke_many(): exactly one of result or error
+InvokeResult = collections.namedtuple('InvokeResult',
+                                      'index payload result error')
+
+
+def code_digest(filename, image, code=None):
+    """sha256 of the file contents (read in chunks unless they are passed in
+       as code) and the runtime image."""
+    sha = hashlib.sha256()
+    if code is not None:
+        sha.update(code)
+    else:
+        with open(filename, 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(1 << 20), b''):
+                sha.update(chunk)
+    sha.update(b'\0' + image.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def entity_body(source):
+    """The JSON body of an entity: source itself if it is a dict, {} for
+       None, else the contents of the JSON file it names."""
+    if source is None:
+        return {}
+    if isinstance(source, dict):
+        return source
+    with open(source) as in_file:
+        return json.load(in_file)
+
+
+def annotation(entity, key, default=None):
+    """Returns the value of an annotation of an action (or other entity)."""
+    for pair in entity.get('annotations') or []:
+        if pair.get('key') == key:
+            return pair.get('value')
+    return default
 
 
 class OpenWhisk(object):
     """https://console.ng.bluemix.net/docs/openwhisk/openwhisk_reference.html
        https://console.ng.bluemix.net/apidocs/98-ibm-bluemix-openwhisk"""
 
-    def __init__(self, wsk_auth, apihost='localhost', verify=True):
+    def __init__(self, wsk_auth, apihost='localhost', verify=True,
+                 cache_ttl=None, cache_size=256, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, timeout=None,
+                 keepalive_timeout=None, thread_local=False, max_retries=4,
+                 max_in_flight=1000, instrumentation=None,
+                 activation_store=None, offload=None):
         """See: https://console.ng.bluemix.net/openwhisk/learn/cli  Your ~100
-           char auth can be found at that URL or by doing `wsk property get`"""
-        self.session = None
+           char auth can be found at that URL or by doing `wsk property get`
+           If cache_ttl (seconds) is set, action, package, rule and trigger
+           listings are cached in self.cache for that long (at most
+           cache_size of them) and dropped when this client changes them.
+           pool_maxsize connections are kept open per host (for at most
+           keepalive_timeout idle seconds), pool_block=True waits for one of
+           them rather than opening more, and timeout (seconds, or a
+           (connect, read) tuple) bounds each socket operation.  The client
+           may be shared by threads; thread_local=True gives each thread its
+           own requests.Session on the shared connection pool.
+           Requests answered 429, 502 or 503 or that time out are retried up
+           to max_retries times by self.retry, which also keeps at most
+           max_in_flight invocations running and lowers that limit while
+           OpenWhisk throttles us (see retry_controller.py).  Requests and
+           activations are timed into self.instrumentation, which may be an
+           instrumentation.Instrumentation shared with other clients.
+           activation_store (True for the default path, a path or an
+           activation_store.ActivationStore) keeps finished activations on
+           disk for activation_info(), activation_results() and
+           activations_fetch().  offload, a payload_offload.Offloader, moves
+           the large fields of invocation payloads to its object store and
+           fetches those of the results action_invoke returns."""
+        self.sessions = None
         # print(get_wsk_auth())
         # If wsk_auth token was not provided, then look it up in os.environ...
         wsk_auth = wsk_auth
@@ -63,13 +158,34 @@ class OpenWhisk(object):
                   'variable $OPENWHISK_APIHOST must be defined and must '
                   'contain a colon (":").  See: `wsk property get`\n')
             raise
-        self.session = requests.Session()  # speeds up repeated requests
-        self.session.verify = verify              # verify SSL certs (bool)
-        self.session.auth = wsk_auth       # uses our auth token for all calls
-        self.gen = UrlGenerator(apihost)
+        # speeds up repeated requests
+        self.sessions = SessionPool(wsk_auth, verify, thread_local,
+                                    pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block, timeout=timeout,
+                                    keepalive_timeout=keepalive_timeout)
+        self.retry = RetryController(max_retries, max_limit=max_in_flight)
+        self.instrumentation = instrumentation or Instrumentation()
+        if debug_hook not in self.instrumentation.hooks:
+            self.instrumentation.add_hook(debug_hook)
+        self.gen = UrlGenerator(apihost, compiled=True)
+        self._poller = None
+        self.cache = ListingCache(cache_ttl, cache_size) if cache_ttl else None
+        self.offload = offload
+        self.store = activation_store
+        if activation_store is True:
+            self.store = ActivationStore()
+        elif isinstance(activation_store, str):
+            self.store = ActivationStore(activation_store)
 
     def __del__(self):
-        self.session.close()
+        if self.sessions is not None:
+            self.sessions.close()
+
+    @property
+    def session(self):
+        """The requests.Session for the calling thread."""
+        return self.sessions.session
 
     # Dynamic URLs that change as self.package changes
     @property
@@ -94,36 +210,162 @@ class OpenWhisk(object):
         return sorted(action.get('name', 'Can\'t get action name') for action in self.actions)
 
     def action_create(self, filename, action_name, runtime='python3', *args, **kwargs):
-        """Uploads contents of the specified file to the specified action."""
-        # Read the file into a string
-        with open(filename, 'rb') as in_file:
-            code = in_file.read()
-        if filename.lower().split('.')[-1] == 'zip':
-            code = base64.b64encode(code)
-        code = code.decode('utf-8')
-        # TODO: Support more languages beyond Python or NodeJS
-        image = 'bspar/openwhisk-runtime-python:{}-latest'.format(runtime)
-        payload = {'exec': {'kind':'blackbox', 'code':code, 'image':image}}
+        """Uploads contents of the specified file to the specified action.
+           Zip archives are streamed from a memory map unless stream=False.
+           With requirements='requirements.txt' a .py file is first packaged
+           with its dependencies by action_packager.build_action()."""
+        stream = kwargs.pop('stream', True)
+        filename = self._package_action(filename, runtime, kwargs)
+        url = self.gen.url_action(action_name, *args, **kwargs)
+        response = self._upload_action(url, filename, runtime_image(runtime),
+                                       stream=stream)
+        return response.json()
+
+    def action_deploy(self, filename, action_name, runtime='python3', *args, **kwargs):
+        """Creates or overwrites the action unless the remote action already
+           carries the code_digest() of this file and runtime image, which is
+           checked by fetching its metadata without the code.  Returns True
+           if the code was uploaded, False if the upload was skipped."""
+        stream = kwargs.pop('stream', True)
+        filename = self._package_action(filename, runtime, kwargs)
+        image = runtime_image(runtime)
+        digest = code_digest(filename, image)
+        remote = self._get(self.gen.url_action(action_name, code=False))
+        if remote.ok and annotation(remote.json(), DIGEST_ANNOTATION) == digest:
+            return False
+        kwargs['overwrite'] = True
         url = self.gen.url_action(action_name, *args, **kwargs)
-        return self._put(url, payload).json()
+        response = self._upload_action(url, filename, image, digest, stream)
+        response.raise_for_status()
+        return True
+
+    @staticmethod
+    def _package_action(filename, runtime, kwargs):
+        """Pops the packaging options out of kwargs and returns the file to
+           upload: filename itself or the zip built from it."""
+        requirements = kwargs.pop('requirements', None)
+        extra_files = kwargs.pop('extra_files', ())
+        slim = kwargs.pop('slim', False)
+        precompile = kwargs.pop('precompile', False)
+        if requirements is None and not extra_files:
+            return filename
+        return build_action(filename, requirements, runtime, extra_files,
+                            slim=slim, precompile=precompile)
+
+    def _upload_action(self, url, filename, image, digest=None, stream=True,
+                       extra=None):
+        """PUTs the file as a blackbox action tagged with its code_digest().
+           extra holds more of the action's body (parameters, limits,
+           annotations)."""
+        extra = dict(extra or {})
+        annotations = extra.pop('annotations', [])
+        is_zip = filename.lower().split('.')[-1] == 'zip'
+        if is_zip and stream:
+            payload = dict(extra, exec={'kind': 'blackbox', 'image': image},
+                           annotations=annotations + [{
+                               'key': DIGEST_ANNOTATION, 'value': digest or
+                               code_digest(filename, image)}])
+            with Base64JsonBody(filename, payload, ('exec', 'code')) as body:
+                response = self._put_stream(url, body)
+        else:
+            # Read the file into a string
+            with open(filename, 'rb') as in_file:
+                code = in_file.read()
+            digest = digest or code_digest(filename, image, code)
+            if is_zip:
+                code = base64.b64encode(code)
+            code = code.decode('utf-8')
+            payload = dict(extra, exec={'kind': 'blackbox', 'code': code,
+                                        'image': image},
+                           annotations=annotations + [{
+                               'key': DIGEST_ANNOTATION, 'value': digest}])
+            response = self._put(url, payload)
+        self._invalidate('actions')
+        return response
 
     def sequence_create(self, sequence_name, action_names, *args, **kwargs):
         payload = { 'exec': { 'kind' : 'sequence', 'components' : action_names }}
         url = self.gen.url_action(sequence_name, *args, **kwargs)
-        return self._put(url, payload).json()
+        response = self._put(url, payload)
+        self._invalidate('actions')
+        return response.json()
 
     def action_delete(self, action_name, *args, **kwargs):
         """Deletes the specified action."""
         url = self.gen.url_action(action_name, *args, **kwargs)
-        return self._delete(url).json()
+        response = self._delete(url)
+        self._invalidate('actions')
+        return response.json()
 
     def action_invoke(self, action_name, *args, **kwargs):
-        """Invokes the specified action in blocking mode."""
+        """Invokes the specified action.  If the activation is still running
+           when the server answers (a non-blocking invoke, or a blocking one
+           that outlived the server's wait) an ActivationFuture is returned."""
         '''url = (self.url_actions + '/' + action_name +
                '?blocking=true&result=false')'''
         payload = kwargs.pop('payload') if 'payload' in kwargs else {}
         url = self.gen.url_action(action_name, *args, **kwargs)
-        return self._post(url, payload).json()
+        result_only = str(kwargs.get('result')).lower() == 'true'
+        response = self._post(url, self._spill(payload))
+        if classify('post', response)[1]:
+            response.raise_for_status()  # throttled or down: retries ran out
+        body = response.json()
+        self._link_activation(response, body)
+        if response.status_code == 202 and 'activationId' in body:
+            return self.activation_future(body['activationId'], result_only)
+        return self._load(body, result_only and response.ok)
+
+    def action_invoke_many(self, action_name, payloads, concurrency=8,
+                           ordered=True, *args, **kwargs):
+        """Invokes action_name once per payload on a pool of `concurrency`
+           threads that share this session's connections.  Yields an
+           InvokeResult per payload, in input order if `ordered` else in
+           completion order.  A failing call (including HTTP status >= 400)
+           sets InvokeResult.error instead of stopping the batch.  payloads
+           may be any iterable; only a few per thread are read ahead."""
+        url = self.gen.url_action(action_name, *args, **kwargs)
+        result_only = str(kwargs.get('result')).lower() == 'true'
+        self.sessions.grow(concurrency)
+        return self._run_many(
+            lambda index, payload: self._invoke_one(url, result_only, index,
+                                                    payload),
+            payloads, concurrency, ordered)
+
+    def _invoke_one(self, url, result_only, index, payload):
+        """One invocation of action_invoke_many(), as an InvokeResult."""
+        try:
+            response = self._post(url, self._spill(payload))
+            response.raise_for_status()
+            body = response.json()
+            self._link_activation(response, body)
+            return InvokeResult(index, payload,
+                                self._load(body, result_only), None)
+        except Exception as e:
+            return InvokeResult(index, payload, None, e)
+
+    @staticmethod
+    def _run_many(invoke, payloads, concurrency, ordered):
+        """Yields invoke(index, payload) per payload, run on `concurrency`
+           threads with a few payloads read ahead per thread."""
+        todo = enumerate(payloads)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            def submit(count):
+                return [pool.submit(invoke, index, payload)
+                        for index, payload in itertools.islice(todo, count)]
+
+            if ordered:
+                pending = collections.deque(submit(2 * concurrency))
+                while pending:
+                    result = pending.popleft().result()
+                    pending.extend(submit(1))
+                    yield result
+            else:
+                pending = set(submit(2 * concurrency))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.update(submit(len(done)))
+                    for future in done:
+                        yield future.result()
 
     def action_get(self, action_name, *args, **kwargs):
         return self.actions_list(action_name, *args, **kwargs)
@@ -131,32 +373,56 @@ class OpenWhisk(object):
     def actions_list(self, *args, **kwargs):
         """Lists the actions defined in openwhisk."""
         url = self.gen.url_action(*args, **kwargs)
-        return self._get(url).json()
+        return self._list('actions', url).json()
 
     # Activations =============================================================
     @property
     def activations(self):
         """Returns a sorted list of the names of all activation."""
-        # TODO: remove set()
         return sorted(set(activation.get('name') for activation
-                          in self.activations_list().json()))
+                          in self.iter_activations()))
 
     @property
     def activation_counts(self):
         """Returns dict of how many times current actions have been invoked."""
         return collections.Counter(activation.get('name') for activation
-                                   in self.activations_list().json())
+                                   in self.iter_activations())
 
     @property
     def activation_ids(self):
         """Returns a sorted list of the ids of all activation."""
         return sorted(activation['activationId'] for activation
-                      in self.activations_list().json())
+                      in self.iter_activations())
+
+    def activation_future(self, activation_id, result_only=False):
+        """Returns an ActivationFuture that the shared poller resolves once
+           the activation has finished."""
+        if self._poller is None:
+            self._poller = ActivationPoller(self)
+        load = None
+        if self.offload is not None:
+            load = lambda body: self._load(body, result_only)
+        future = ActivationFuture(activation_id, result_only, load)
+        future.add_done_callback(self._link_future)
+        return self._poller.watch(future)
+
+    def _link_future(self, future):
+        if future.activation is not None:
+            self.instrumentation.activation(
+                future.activation, future.resolved_at - future.invoked_at)
 
     def activation_info(self, activation_id):
-        """Returns info on the activation."""
+        """Returns info on the activation, from self.store if it has it."""
+        if self.store is not None:
+            activation = self.store.get(activation_id)
+            if activation is not None:
+                return activation
         url = self.gen.url_activation(activation_id)
-        return self._get(url).json()
+        response = self._get(url)
+        activation = response.json()
+        if self.store is not None and response.ok:
+            self.store.put(activation)
+        return activation
 
     '''
     def activation_logs(self, activation_id):
@@ -164,14 +430,87 @@ class OpenWhisk(object):
         return self.get(self.url_activations + '/' + activation_id + '/logs')
     '''
     def activation_results(self, activation_id):
-        """Returns a sorted list of the ids of all activation."""
+        """Returns the response (status, success and result) of the
+           activation.  With self.store the whole record is fetched and kept
+           so later calls for its info, result or logs are served locally."""
+        if self.store is not None:
+            activation = self.activation_info(activation_id)
+            return activation.get('response', activation)
         url = self.gen.url_activation(activation_id, 'result')
         return self._get(url).json()
 
+    def activations_fetch(self, activation_ids, concurrency=8):
+        """Returns {activation_id: activation record} for activation_ids,
+           serving those in self.store locally and GETting the rest on
+           `concurrency` threads.  Ids the server doesn't know are left out;
+           other HTTP errors are raised."""
+        found = self.store.get_many(activation_ids) if self.store else {}
+        missing = [activation_id for activation_id in dict.fromkeys(
+                   activation_ids) if activation_id not in found]
+
+        def fetch(activation_id):
+            response = self._get(self.gen.url_activation(activation_id))
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+
+        if missing:
+            self.sessions.grow(concurrency)
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                fetched = [a for a in pool.map(fetch, missing) if a]
+            if self.store is not None:
+                self.store.put_many(fetched)
+            found.update((a['activationId'], a) for a in fetched)
+        return found
+
+    def activation_analytics(self, window=3600.0, name=None):
+        """Returns an ActivationAnalytics over the last `window` seconds of
+           activations (of action `name`), loaded by its refresh()."""
+        return ActivationAnalytics(self, window, name)
+
+    def watch_activations(self, name=None, **kwargs):
+        """Returns an ActivationWatcher: an iterator over the activations
+           (of action `name`) recorded from now on, oldest first, which
+           polls the listing since its cursor as often as they come."""
+        return ActivationWatcher(self, name, **kwargs)
+
     def activations_list(self):
         """Lists the activations defined in openwhisk."""
         return self._get(self.gen.url_activation())
 
+    def iter_activations(self, name=None, since=None, upto=None, docs=False,
+                         page_size=200):
+        """Lazily yields every activation (newest first) matching the server
+           side filters, walking skip/limit pages of page_size (OpenWhisk caps
+           it at 200).  The next page is fetched in the background while the
+           current one is consumed.  Unless upto is given, later pages are
+           pinned to the newest start time seen on the first page so new
+           activations don't shift the pages being walked."""
+        query = dict((key, value) for key, value in (('name', name),
+                     ('since', since), ('upto', upto)) if value is not None)
+        if docs:
+            query['docs'] = True
+
+        def fetch(skip):
+            url = self.gen.url_activation(skip=skip, limit=page_size, **query)
+            return self._get(url).json()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            skip = 0
+            page = pool.submit(fetch, skip)
+            while page is not None:
+                activations = page.result()
+                if activations and 'upto' not in query:
+                    if 'start' in activations[0]:
+                        query['upto'] = activations[0]['start']
+                page = None
+                if len(activations) >= page_size:
+                    skip += page_size
+                    page = pool.submit(fetch, skip)
+                for activation in activations:
+                    yield activation
+
     '''
     # Namespaces ==============================================================
     @property
@@ -193,19 +532,26 @@ class OpenWhisk(object):
 
     def packages_list(self):
         """Lists the packages defined in openwhisk."""
-        return self._get(self.gen.url_package())
+        return self._list('packages', self.gen.url_package())
 
-    def package_create(self, filename, package_name):
-        """Uploads contents of the specified file to the specified package."""
-        pass  # TODO
+    def package_create(self, filename, package_name, *args, **kwargs):
+        """Creates the package with the body in the specified JSON file (or
+           dict, or None for an empty package): parameters, annotations,
+           publish or binding.  overwrite=True replaces an existing one."""
+        url = self.gen.url_package(package_name, *args, **kwargs)
+        response = self._put(url, entity_body(filename))
+        self._invalidate('packages')
+        return response.json()
 
     def package_delete(self, package_name):
-        """Deletes the specified package."""
-        pass  # TODO
+        """Deletes the specified package, which must hold no actions."""
+        response = self._delete(self.gen.url_package(package_name))
+        self._invalidate('packages')
+        return response.json()
 
     def package_info(self, package_name):
         """Returns info on the specified package."""
-        pass  # TODO
+        return self._get(self.gen.url_package(package_name)).json()
 
     # Rules ===================================================================
     @property
@@ -215,19 +561,26 @@ class OpenWhisk(object):
 
     def rules_list(self):
         """Lists the rules defined in openwhisk."""
-        return self._get(self.gen.url_rule())
+        return self._list('rules', self.gen.url_rule())
 
-    def rule_create(self, filename, rule_name):
-        """Uploads contents of the specified file to the specified rule."""
-        pass  # TODO
+    def rule_create(self, filename, rule_name, *args, **kwargs):
+        """Creates the rule with the body in the specified JSON file (or
+           dict): {'trigger': '/_/trigger', 'action': '/_/action'}.  The
+           rule is active once created."""
+        url = self.gen.url_rule(rule_name, *args, **kwargs)
+        response = self._put(url, entity_body(filename))
+        self._invalidate('rules')
+        return response.json()
 
     def rule_delete(self, rule_name):
         """Deletes the specified rule."""
-        pass  # TODO
+        response = self._delete(self.gen.url_rule(rule_name))
+        self._invalidate('rules')
+        return response.json()
 
     def rule_info(self, rule_name):
         """Returns info on the specified rule."""
-        pass  # TODO
+        return self._get(self.gen.url_rule(rule_name)).json()
 
     # Triggers ================================================================
     @property
@@ -237,25 +590,39 @@ class OpenWhisk(object):
 
     def triggers_list(self):
         """Lists the triggers defined in openwhisk."""
-        return self._get(self.gen.url_trigger())
-
-    def trigger_create(self, filename, trigger_name):
-        """Uploads contents of the specified file to the specified trigger."""
-        # Read the file into a string  # TODO
-        '''with open(filename) as in_file:
-            code = in_file.read()
-        # print('File ' + filename + ' contents: >>>' + code + '<<<')
-        kind = {'py': 'python'}.get(filename.lower().split('.')[-1], 'nodejs')
-        payload = {'exec': {'kind': kind, 'code': code}}
-        return self._put(self.url_actions + action_name, payload)'''
+        return self._list('triggers', self.gen.url_trigger())
+
+    def trigger_create(self, filename, trigger_name, *args, **kwargs):
+        """Creates the trigger with the body in the specified JSON file (or
+           dict, or None for a bare trigger): parameters and annotations."""
+        url = self.gen.url_trigger(trigger_name, *args, **kwargs)
+        response = self._put(url, entity_body(filename))
+        self._invalidate('triggers')
+        return response.json()
 
     def trigger_delete(self, trigger_name):
-        """Deletes the specified package."""
-        pass  # TODO return self._delete(self.url_actions + action_name)
+        """Deletes the specified trigger."""
+        response = self._delete(self.gen.url_trigger(trigger_name))
+        self._invalidate('triggers')
+        return response.json()
 
     def trigger_info(self, trigger_name):
-        """Deletes the specified package."""
-        pass  # TODO return self._delete(self.url_actions + action_name)
+        """Returns info on the specified trigger."""
+        return self._get(self.gen.url_trigger(trigger_name)).json()
+
+    def trigger_fire(self, trigger_name, payload=None):
+        """Fires the specified trigger with payload: {'activationId': ...},
+           or {} if no active rule is on it (HTTP 204)."""
+        response = self._post(self.gen.url_trigger(trigger_name),
+                              payload or {})
+        if response.status_code == 204:
+            return {}
+        return response.json()
+
+    def trigger_emitter(self, trigger_name, **kwargs):
+        """Returns a TriggerEmitter that fires the specified trigger with
+           batches of the events emitted to it (see trigger_emitter.py)."""
+        return TriggerEmitter(self, trigger_name, **kwargs)
 
     # Debugging: ==============================================================
     #   These methods will be removed from the final API ======================
@@ -269,38 +636,83 @@ class OpenWhisk(object):
     def post_a_url(self, url, payload=None):
         return self._post(url, payload).json()
 
-    @classmethod
-    def _print_request(cls, req_type, url, payload=None):
-        if not DEBUG:
-            return
-        msg = 'Issuing {} request: url={}'.format(req_type, url)
-        if payload:
-            msg += ' payload={!r}'.format(payload)
-        print(msg)
-
-    @classmethod
-    def _print_response(cls, response):
-        if not DEBUG:
-            return response
-        print('Response.status_code={}\n{}'.format(response.status_code,
-                                                   response.text))
+    def _list(self, kind, url):
+        """GETs an entity listing, through self.cache if it is enabled."""
+        if self.cache is None:
+            return self._get(url)
+        key = (kind, url)
+        response = self.cache.get(key)
+        if response is None:
+            response = self._get(url)
+            if response.ok:
+                self.cache.put(key, response)
+        return response
+
+    def _invalidate(self, kind):
+        """Drops every cached listing of kind: the namespace's listing holds
+           the entities of its packages too."""
+        if self.cache is not None:
+            self.cache.invalidate(kind)
+
+    def _spill(self, payload):
+        return payload if self.offload is None else self.offload.spill(payload)
+
+    def _load(self, body, result_only):
+        """Fetches the offloaded fields of an invocation's result."""
+        if self.offload is None or not isinstance(body, dict):
+            return body
+        if result_only:
+            return self.offload.load(body, lazy=False)
+        response = body.get('response')
+        if isinstance(response, dict) and isinstance(response.get('result'),
+                                                     dict):
+            response['result'] = self.offload.load(response['result'],
+                                                   lazy=False)
+        return body
+
+    def _link_activation(self, response, body):
+        """Times an activation record returned by a blocking invoke."""
+        if isinstance(body, dict) and 'activationId' in body:
+            self.instrumentation.activation(body,
+                                            response.elapsed.total_seconds())
+
+    def _request(self, method, url, payload=None, gated=False):
+        send = getattr(self.session, method)
+        return self._timed(method, url, lambda: send(url, json=payload), gated)
+
+    def _timed(self, method, url, send, gated=False, rewind=None):
+        """self.retry.call(...), recorded in self.instrumentation"""
+        start = time.perf_counter()
+        try:
+            response = self.retry.call(method, send, gated, rewind)
+        except Exception as e:
+            self.instrumentation.request(method, url,
+                                         time.perf_counter() - start, error=e)
+            raise
+        self.instrumentation.request(method, url, time.perf_counter() - start,
+                                     response)
         return response
 
     def _delete(self, url, payload=None):
-        self._print_request('delete', url, payload)
-        return self._print_response(self.session.delete(url, json=payload))
+        return self._request('delete', url, payload)
 
     def _get(self, url, payload=None):
-        self._print_request('get', url, payload)
-        return self._print_response(self.session.get(url, json=payload))
+        return self._request('get', url, payload)
 
     def _post(self, url, payload=None):
-        self._print_request('post', url, payload)
-        return self._print_response(self.session.post(url, json=payload))
+        """POSTs are invocations (or trigger fires), so they are gated by
+           the adaptive in flight limit."""
+        return self._request('post', url, payload, gated=True)
 
     def _put(self, url, payload=None):
-        self._print_request('put', url, payload)
-        return self._print_response(self.session.put(url, json=payload))
+        return self._request('put', url, payload)
+
+    def _put_stream(self, url, body):
+        """PUTs a file-like body such as a streaming_upload.Base64JsonBody,
+           which must have a rewind() method for the upload to be retried."""
+        send = lambda: self.session.put(url, data=body, headers=body.headers)
+        return self._timed('put', url, send,
+                           rewind=getattr(body, 'rewind', None))
 
     # Misc utils ==============================================================
     def invoke_echo(self, message):
@@ -334,14 +746,9 @@ if __name__ == '__main__':
     pprint.pprint(whisk.action_invoke('hello_python', blocking=True,
                                       result=True, payload={'name': 'Wendel'}))
 
-    from time import sleep
     print('\n ### Testing async activation results ###')
     act = whisk.action_invoke('hello_python', payload={'name': 'Wendel P. Whisk'})
-    res = whisk.activation_results(act['activationId'])
-    while res.get('error', None):
-        res = whisk.activation_results(act['activationId'])
-        sleep(1)
-    pprint.pprint(res)
+    pprint.pprint(act.result(timeout=60))
     print('')
 
     print('\n ### Testing sequence with params ###')
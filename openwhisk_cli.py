@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""Command line interface of the OpenWhisk client, with an optional warm agent
+  `python -m openwhisk <subcommand>` (or ./openwhisk_cli.py) runs one of
+  invoke, list, get, create, delete or activations and prints its result as
+  JSON.  Only argparse, json and socket are imported up front: the client
+  (and requests with it) is imported by the subcommand that needs it.  The
+  agent (`agent start`) is a background process listening on a Unix socket
+  that keeps an OpenWhisk client, with its warm pooled connections, per
+  (apihost, auth).  While it runs, subcommands are forwarded to it, so a
+  call from a shell loop costs one interpreter start without requests and
+  no TLS handshake: mostly the server's own latency.  The agent exits
+  after --idle-timeout seconds without a call.  The auth comes from --auth
+  or $OPENWHISK_TOKEN, the apihost from --apihost or $OPENWHISK_APIHOST.
+  Examples:
+     $ python -m openwhisk agent start
+     $ python -m openwhisk invoke hello -p name Dana --result
+     $ python -m openwhisk list actions
+     $ python -m openwhisk activations --limit 5
+     $ python -m openwhisk agent stop
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+
+SOCKET_PATH = os.environ.get('OPENWHISK_AGENT_SOCKET') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'openwhisk-python', 'agent.sock')
+
+
+# Subcommands: each gets an OpenWhisk client and the request's arguments and
+# returns something JSON can encode ==========================================
+def cmd_invoke(whisk, args):
+    result = whisk.action_invoke(args['action'], blocking=args['blocking'],
+                                 result=args['result'],
+                                 payload=args['params'])
+    activation_id = getattr(result, 'activation_id', None)
+    return result if activation_id is None else {'activationId':
+                                                 activation_id}
+
+
+def cmd_list(whisk, args):
+    return {'actions': lambda: whisk.action_names,
+            'packages': lambda: whisk.packages,
+            'rules': lambda: whisk.rules,
+            'triggers': lambda: whisk.triggers,
+            'activations': lambda: whisk.activation_ids}[args['kind']]()
+
+
+def cmd_get(whisk, args):
+    return whisk.action_get(args['action'], code=args['code'])
+
+
+def cmd_create(whisk, args):
+    return whisk.action_create(args['file'], args['action'], args['runtime'],
+                               overwrite=True)
+
+
+def cmd_delete(whisk, args):
+    return whisk.action_delete(args['action'])
+
+
+def cmd_activations(whisk, args):
+    if args['id'] is None:
+        return [dict((key, activation.get(key)) for key
+                     in ('activationId', 'name', 'start', 'duration',
+                         'statusCode'))
+                for _, activation in zip(range(args['limit']),
+                                         whisk.iter_activations(
+                                             name=args['name']))]
+    if args['logs']:
+        return whisk.activation_info(args['id']).get('logs')
+    if args['result']:
+        return whisk.activation_results(args['id'])
+    return whisk.activation_info(args['id'])
+
+
+COMMANDS = {'invoke': cmd_invoke, 'list': cmd_list, 'get': cmd_get,
+            'create': cmd_create, 'delete': cmd_delete,
+            'activations': cmd_activations}
+
+
+def handle(request, clients, lock=None):
+    """Runs a request with the client in clients for its (apihost, auth,
+       insecure), made on first use: {'result': ...} or {'error': message}."""
+    key = (request.get('apihost'), request.get('auth'),
+           request.get('insecure'))
+    try:
+        command = COMMANDS[request['command']]
+        with lock or threading.Lock():
+            whisk = clients.get(key)
+            if whisk is None:
+                from openwhisk import OpenWhisk
+                whisk = clients[key] = OpenWhisk(
+                    request['auth'], apihost=request['apihost'],
+                    verify=not request['insecure'])
+        return {'result': command(whisk, request['args'])}
+    except Exception as e:
+        return {'error': '{}: {}'.format(type(e).__name__, e)}
+
+
+# The agent ===================================================================
+def ask_agent(path, request, timeout=None):
+    """Sends one JSON line to the agent at path and returns its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as answer:
+            line = answer.readline()
+    if not line:
+        raise ConnectionError('the agent closed the connection')
+    return json.loads(line.decode('utf-8'))
+
+
+def run_agent(path, idle_timeout=3600.0):
+    """Serves requests on a Unix socket at path (readable by this user
+       only) until asked to shut down or idle for idle_timeout seconds."""
+    import socketserver
+    import time
+
+    clients = {}
+    stats = {'pid': os.getpid(), 'started': time.time(), 'requests': 0}
+    lock = threading.Lock()
+    last_call = [time.monotonic()]
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            last_call[0] = time.monotonic()
+            command = request.get('command')
+            if command == 'stop':
+                answer = {'result': 'stopping'}
+                threading.Thread(target=server.shutdown).start()
+            elif command == 'status':
+                answer = {'result': dict(stats, clients=len(clients))}
+            else:
+                with lock:
+                    stats['requests'] += 1
+                answer = handle(request, clients, lock)
+            self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    def watch_idle():
+        while not stopped.wait(min(10.0, idle_timeout / 4)):
+            if time.monotonic() - last_call[0] > idle_timeout:
+                server.shutdown()
+                return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    umask = os.umask(0o177)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(umask)
+    stopped = threading.Event()
+    threading.Thread(target=watch_idle, daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        stopped.set()
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def cmd_agent(args):
+    if args.action == 'run':
+        run_agent(args.socket, args.idle_timeout)
+        return 0
+    if args.action == 'start':
+        import subprocess
+        import time
+        try:
+            ask_agent(args.socket, {'command': 'status'}, timeout=5)
+            return show({'result': 'already running'})
+        except OSError:
+            pass
+        subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                          '--socket', args.socket, 'agent', 'run',
+                          '--idle-timeout', str(args.idle_timeout)],
+                         start_new_session=True,
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                return show(ask_agent(args.socket, {'command': 'status'},
+                                      timeout=5))
+            except OSError:
+                time.sleep(0.05)
+        return show({'error': 'the agent did not start'})
+    try:
+        return show(ask_agent(args.socket, {'command': args.action},
+                              timeout=5))
+    except OSError:
+        return show({'error': 'no agent is listening on ' + args.socket})
+
+
+# Command line ================================================================
+def parameter(value):
+    """A -p value: JSON if it parses as JSON, else the string itself."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m openwhisk', description=__doc__.split('\n')[0])
+    parser.add_argument('--auth', default=os.environ.get('OPENWHISK_TOKEN'),
+                        help='user:key, default: $OPENWHISK_TOKEN')
+    parser.add_argument('--apihost', default=os.environ.get(
+        'OPENWHISK_APIHOST', 'localhost'), help='default: $OPENWHISK_APIHOST')
+    parser.add_argument('-k', '--insecure', action='store_true',
+                        help='skip TLS certificate verification')
+    parser.add_argument('--socket', default=SOCKET_PATH,
+                        help='the agent socket, default: ' + SOCKET_PATH)
+    parser.add_argument('--no-agent', action='store_true',
+                        help='run in this process even if an agent runs')
+    commands = parser.add_subparsers(dest='command', metavar='subcommand')
+    commands.required = True
+    invoke = commands.add_parser('invoke', help='invoke an action')
+    invoke.add_argument('action')
+    invoke.add_argument('-p', '--param', nargs=2, action='append', default=[],
+                        metavar=('KEY', 'VALUE'), help='a JSON or string '
+                        'parameter')
+    invoke.add_argument('-P', '--param-file', help='a JSON object of '
+                        'parameters')
+    invoke.add_argument('-b', '--blocking', action='store_true')
+    invoke.add_argument('-r', '--result', action='store_true',
+                        help='only the result (implies --blocking)')
+    kinds = ('actions', 'packages', 'rules', 'triggers', 'activations')
+    listing = commands.add_parser('list', help='list entity names')
+    listing.add_argument('kind', nargs='?', default='actions', choices=kinds)
+    get = commands.add_parser('get', help="an action's metadata")
+    get.add_argument('action')
+    get.add_argument('--code', action='store_true', help='with its code')
+    create = commands.add_parser('create', help='create or update an action')
+    create.add_argument('action')
+    create.add_argument('file')
+    create.add_argument('--runtime', default='python3')
+    delete = commands.add_parser('delete', help='delete an action')
+    delete.add_argument('action')
+    activations = commands.add_parser(
+        'activations', help='recent activations, or one of them')
+    activations.add_argument('id', nargs='?')
+    activations.add_argument('--name', help='only those of this action')
+    activations.add_argument('--limit', type=int, default=10)
+    activations.add_argument('--logs', action='store_true')
+    activations.add_argument('--result', action='store_true')
+    agent = commands.add_parser('agent', help='start, stop or ask the agent')
+    agent.add_argument('action', choices=('start', 'stop', 'status', 'run'))
+    agent.add_argument('--idle-timeout', type=float, default=3600.0)
+    return parser
+
+
+def request_of(args):
+    """The JSON-able request for the parsed command line args."""
+    values = dict(vars(args))
+    request = dict((key, values.pop(key)) for key in (
+        'command', 'auth', 'apihost', 'insecure'))
+    for key in ('socket', 'no_agent'):
+        values.pop(key)
+    if request['command'] == 'invoke':
+        params = {}
+        if values.pop('param_file'):
+            with open(args.param_file) as in_file:
+                params.update(json.load(in_file))
+        params.update((key, parameter(value))
+                      for key, value in values.pop('param'))
+        values['params'] = params
+        values['blocking'] = values['blocking'] or values['result']
+    elif request['command'] == 'create':
+        values['file'] = os.path.abspath(values['file'])  # for the agent
+    request['args'] = values
+    return request
+
+
+def show(answer):
+    if 'error' in answer:
+        print(answer['error'], file=sys.stderr)
+        return 1
+    print(json.dumps(answer['result'], indent=2))
+    return 0
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.command == 'agent':
+        return cmd_agent(args)
+    if not args.auth:
+        print('an auth is needed: --auth or $OPENWHISK_TOKEN (see `wsk '
+              'property get`)', file=sys.stderr)
+        return 2
+    request = request_of(args)
+    if not args.no_agent and os.path.exists(args.socket):
+        try:
+            return show(ask_agent(args.socket, request))
+        except OSError:
+            pass  # a stale socket: no agent after all
+    return show(handle(request, {}))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
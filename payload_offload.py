@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+"""Moves large payload fields to an object store and passes references instead
+  OpenWhisk limits invocation parameters and results to about 1MB, and every
+  hop of a sequence carries the whole JSON through the controller.  An
+  Offloader replaces each top-level field of a payload whose JSON is larger
+  than `threshold` bytes by a small reference to an object holding it in a
+  store: {'__offload__': {'store': url, 'key': sha256, 'bytes': size}}.
+  Objects are named by their content, so a field spilled twice is stored
+  once.  References are only fetched from stores configured for the
+  process, never from a URL a payload names, and their keys must be sha256
+  digests.  On the action side, the offloaded() decorator hands main() a
+  LazyPayload that fetches a referenced field the first time main() reads
+  it, and spills main()'s large result fields in turn.  Fields an action
+  passes on without reading travel as references, unfetched.  Stores are
+  named by URL and need only get(key) and put(key, data): FileStore
+  ('file:///shared/dir') and MinioStore ('minio://host:9000/bucket', or
+  minios:// over TLS, keys from $MINIO_ACCESS_KEY/$MINIO_SECRET_KEY).
+  Examples:
+     $ python3
+     >>> import openwhisk, payload_offload
+     >>> offload = payload_offload.Offloader('minio://minio:9000/payloads')
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth, offload=offload)
+     >>> whisk.action_invoke('resize', blocking=True, result=True,
+     ...                     payload={'image': big_base64_string})
+     # in the action (packaged with payload_offload.py):
+     >>> @payload_offload.offloaded
+     ... def main(args):
+     ...     return {'thumbnail': make_thumbnail(args['image'])}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+
+try:
+    import minio
+except ImportError:
+    minio = None
+
+REF_KEY = '__offload__'
+THRESHOLD = 64 * 1024
+KEY_PATTERN = re.compile('[0-9a-f]{64}')
+
+
+def check_key(key):
+    """Keys are sha256 hex digests: anything else could name a path."""
+    if not isinstance(key, str) or not KEY_PATTERN.fullmatch(key):
+        raise ValueError('invalid payload key: {!r}'.format(key))
+    return key
+
+
+class FileStore(object):
+    """Objects as files under root, a directory every party can reach."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.url = 'file://' + self.root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        check_key(key)
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as in_file:
+            return in_file.read()
+
+    def put(self, key, data):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as out_file:
+            out_file.write(data)
+        os.replace(tmp, path)  # readers never see a partial object
+
+
+class MinioStore(object):
+    """Objects in an S3-compatible bucket, through the minio package."""
+
+    def __init__(self, endpoint, bucket, access_key=None, secret_key=None,
+                 secure=False):
+        if minio is None:
+            raise ImportError('MinioStore requires the minio package')
+        self.bucket = bucket
+        self.url = '{}://{}/{}'.format('minios' if secure else 'minio',
+                                       endpoint, bucket)
+        self.client = minio.Minio(
+            endpoint, secure=secure,
+            access_key=access_key or os.environ.get('MINIO_ACCESS_KEY'),
+            secret_key=secret_key or os.environ.get('MINIO_SECRET_KEY'))
+        if not self.client.bucket_exists(bucket):
+            self.client.make_bucket(bucket)
+
+    def get(self, key):
+        response = self.client.get_object(self.bucket, key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def put(self, key, data):
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data),
+                               content_type='application/json')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(url):
+    """The store named by url, opened once per process, or url itself if it
+       is a store object, which is registered under its URL.  Either way
+       references to the store can then be fetched in this process."""
+    if not isinstance(url, str):
+        with _stores_lock:
+            _stores[url.url] = url
+        return url
+    with _stores_lock:
+        store = _stores.get(url)
+        if store is None:
+            scheme, _, rest = url.partition('://')
+            if scheme == 'file':
+                store = FileStore(rest)
+            elif scheme in ('minio', 'minios'):
+                endpoint, _, bucket = rest.partition('/')
+                store = MinioStore(endpoint, bucket,
+                                   secure=scheme == 'minios')
+            else:
+                raise ValueError('unknown payload store: {}'.format(url))
+            _stores[url] = store
+        return store
+
+
+def is_reference(value):
+    return isinstance(value, dict) and len(value) == 1 and REF_KEY in value
+
+
+def configured_store(url):
+    """The store references to url are fetched from: one opened in this
+       process (by an Offloader, offloaded(store=...) or open_store()), or
+       $OPENWHISK_PAYLOAD_STORE.  Any other URL comes from the payload and
+       is refused, as it could name any host or directory."""
+    with _stores_lock:
+        store = _stores.get(url)
+    if store is not None:
+        return store
+    if url and url == os.environ.get('OPENWHISK_PAYLOAD_STORE'):
+        return open_store(url)
+    raise ValueError('payload store not configured: {!r}'.format(url))
+
+
+def fetch(reference):
+    """The value a reference stands for."""
+    ref = reference[REF_KEY]
+    store = configured_store(ref.get('store'))
+    return json.loads(store.get(check_key(ref.get('key'))).decode('utf-8'))
+
+
+class LazyPayload(dict):
+    """A payload whose referenced fields are fetched when first read.
+       dict(payload) copies the references of fields not read yet, so those
+       are passed on without being fetched (json.dumps() reads them all)."""
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if is_reference(value):
+            value = fetch(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+
+class Offloader(object):
+    """Spills the fields of payloads larger than threshold bytes (of JSON)
+       to store, a store object or URL, and loads them back.  A store object
+       is what references to its URL are fetched from in this process."""
+
+    def __init__(self, store, threshold=THRESHOLD):
+        self.store = open_store(store)
+        self.threshold = threshold
+        self.spilled = self.spilled_bytes = 0
+        self._known = set()  # keys already put by this process
+        self.lock = threading.Lock()
+
+    def spill(self, payload):
+        """A copy of payload with its large fields replaced by references;
+           payload itself if nothing is large enough (or it isn't a dict)."""
+        if not isinstance(payload, dict):
+            return payload
+        spilled = None
+        for key in payload:
+            value = dict.__getitem__(payload, key)
+            if is_reference(value):
+                continue
+            data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+            if len(data) <= self.threshold:
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in self._known:
+                self.store.put(digest, data)
+                with self.lock:
+                    self._known.add(digest)
+                    self.spilled += 1
+                    self.spilled_bytes += len(data)
+            if spilled is None:
+                spilled = dict(payload)
+            spilled[key] = {REF_KEY: {'store': self.store.url, 'key': digest,
+                                      'bytes': len(data)}}
+        return payload if spilled is None else spilled
+
+    def load(self, payload, lazy=True):
+        """payload as a LazyPayload, or with every reference fetched now."""
+        if not isinstance(payload, dict):
+            return payload
+        loaded = LazyPayload(payload)
+        if not lazy:
+            loaded = dict(loaded.items())
+        return loaded
+
+
+def offloaded(main=None, store=None, threshold=THRESHOLD):
+    """Decorates an action's main(args): args arrive as a LazyPayload and
+       the large fields of the result are spilled.  Results go to store (a
+       store or URL), else $OPENWHISK_PAYLOAD_STORE; with neither they are
+       returned as they are.  References in args are fetched from those
+       stores only."""
+    if main is None:
+        return functools.partial(offloaded, store=store, threshold=threshold)
+
+    @functools.wraps(main)
+    def wrapper(args):
+        if store is not None:
+            open_store(store)  # configured for fetches too
+        result = main(LazyPayload(args))
+        if isinstance(result, LazyPayload):
+            result = dict(result)  # json.dumps() would fetch every field
+        target = store or os.environ.get('OPENWHISK_PAYLOAD_STORE')
+        if target is None:
+            return result
+        return Offloader(target, threshold).spill(result)
+    return wrapper
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+
+"""Keeps actions warm with pings sent just inside their idle timeout
+  OpenWhisk reclaims an action's container once it has been idle for a while
+  and the next invocation pays a cold start (its record has an initTime).
+  A Prewarmer invokes each of its actions with a small ping payload whenever
+  the action has been idle for its interval.  It learns that interval per
+  action: a ping (or any invocation through the same client) that finds a
+  warm container after an idle gap shows the idle timeout is longer than the
+  gap, one with an initTime that it is shorter.  While no cold start has been
+  seen the interval grows by `growth` from the configured one; after that it
+  stays at `margin` times the shortest gap known to go cold.  Invocations made
+  through the client postpone the next ping, and report() weighs the pings
+  (the cost) against the cold starts they spared those invocations (the tail
+  latency saved).  Actions should answer a ping payload quickly.
+  Examples:
+     $ python3
+     >>> import openwhisk, prewarm
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> warmer = prewarm.Prewarmer(whisk, ['hello', 'resize'], interval=60)
+     >>> warmer.start()
+     >>> print(prewarm.format_report(warmer.report()))
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import threading
+import time
+from urllib.parse import unquote
+
+from activation_future import ActivationFuture
+from instrumentation import ActivationEvent, RequestEvent
+from openwhisk import annotation
+
+PING = {'prewarm': True}
+
+
+def action_of(url):
+    """'https://host/api/v1/namespaces/_/actions/p/a?blocking=true' -> 'a'"""
+    return unquote(url.split('?', 1)[0].rsplit('/', 1)[-1])
+
+
+def short_name(name):
+    return name.rsplit('/', 1)[-1]
+
+
+class ActionWarmth(object):
+    """What a Prewarmer knows about one action.  Gaps, intervals and idle
+       timeouts are in seconds, ping_ms and init_ms in ms."""
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.warm_max = 0.0   # longest idle gap that found a warm container
+        self.cold_min = None  # shortest longer gap that found none
+        self.last_use = None  # time.monotonic() the last invocation ended
+        self.last_user = None  # ... the last one not made by the Prewarmer
+        self.pending = None   # (gap, rescued) of a use awaiting its record
+        self.pings = self.cold_pings = self.failures = self.ping_ms = 0
+        self.uses = self.cold_uses = self.rescued = 0
+        self.inits = self.init_ms = 0
+
+    def cold_start(self, init_ms):
+        self.inits += 1
+        self.init_ms += init_ms
+
+    def report(self):
+        init_ms = float(self.init_ms) / self.inits if self.inits else None
+        return {'interval': self.interval, 'warm_max': self.warm_max,
+                'cold_min': self.cold_min, 'pings': self.pings,
+                'cold_pings': self.cold_pings, 'failures': self.failures,
+                'ping_ms': self.ping_ms, 'uses': self.uses,
+                'cold_uses': self.cold_uses, 'rescued': self.rescued,
+                'init_ms': init_ms,
+                'saved_ms': init_ms * self.rescued if init_ms else None,
+                'pings_per_rescue': (float(self.pings) / self.rescued
+                                     if self.rescued else None)}
+
+
+class Prewarmer(object):
+    """Pings the actions of `whisk` from a daemon thread, one at a time, so
+       that they stay warm.  interval is where learning starts (or, with
+       learn=False, the fixed interval) and min_interval/max_interval bound
+       it.  Actions are matched to the client's invocations by their last
+       path segment."""
+
+    def __init__(self, whisk, actions=(), interval=60.0, margin=0.8,
+                 growth=1.5, min_interval=1.0, max_interval=3600.0,
+                 learn=True, payload=PING, timeout=60.0):
+        self.whisk = whisk
+        self.interval = interval
+        self.margin = margin
+        self.growth = growth
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.learn = learn
+        self.payload = payload
+        self.timeout = timeout
+        self.actions = {}  # name: ActionWarmth
+        self.lock = threading.Condition()
+        self._local = threading.local()  # pinging: this thread's own calls
+        self._thread = None
+        self._stopped = True
+        for name in actions:
+            self.add(name)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add(self, name, interval=None):
+        with self.lock:
+            if name not in self.actions:
+                self.actions[name] = ActionWarmth(name,
+                                                  interval or self.interval)
+            self.lock.notify()
+        return self.actions[name]
+
+    def remove(self, name):
+        with self.lock:
+            self.actions.pop(name, None)
+            self.lock.notify()
+
+    def start(self):
+        if self._thread is None:
+            self._stopped = False
+            self.whisk.instrumentation.add_hook(self.observe)
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name='prewarmer')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            self._stopped = True
+            self.lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.whisk.instrumentation.remove_hook(self.observe)
+
+    @staticmethod
+    def due(state):
+        """When state's action should next be pinged (time.monotonic())."""
+        return 0 if state.last_use is None else state.last_use + state.interval
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self._stopped:
+                    now = time.monotonic()
+                    due = [name for name, state in self.actions.items()
+                           if self.due(state) <= now]
+                    if due:
+                        break
+                    soonest = min([self.due(state) for state
+                                   in self.actions.values()] or [None])
+                    self.lock.wait(None if soonest is None else soonest - now)
+                if self._stopped:
+                    return
+            for name in due:
+                try:
+                    self.ping(name)
+                except Exception:
+                    pass  # counted in failures; retried after the interval
+
+    def ping(self, name):
+        """Invokes `name` with the ping payload, learns from whether it found
+           a warm container and returns the activation record."""
+        with self.lock:
+            state = self.actions[name]
+            start = time.monotonic()
+            gap = None if state.last_use is None else start - state.last_use
+        self._local.pinging = True
+        try:
+            record = self.whisk.action_invoke(name, blocking=True,
+                                              payload=dict(self.payload))
+            if isinstance(record, ActivationFuture):
+                record = record.result(self.timeout)
+        except Exception:
+            with self.lock:
+                state.failures += 1
+                state.last_use = time.monotonic()
+            raise
+        finally:
+            self._local.pinging = False
+        with self.lock:
+            state.last_use = time.monotonic()
+            state.pings += 1
+            state.ping_ms += record.get('duration') or 0
+            init = annotation(record, 'initTime')
+            if init is not None:
+                state.cold_pings += 1
+                state.cold_start(init)
+            self._learn(state, gap, init is not None)
+        return record
+
+    def observe(self, event):
+        """Instrumentation hook: the client's own invocations of an action
+           postpone its next ping and are checked for cold starts too."""
+        if getattr(self._local, 'pinging', False):
+            return
+        if isinstance(event, RequestEvent):
+            if event.verb != 'post' or event.entity != 'actions' or \
+                    event.status is None or event.status >= 400:
+                return
+            with self.lock:
+                state = self._find(action_of(event.url))
+                if state is None:
+                    return
+                end = time.monotonic()
+                start = end - event.seconds
+                gap = None
+                if state.last_use is not None:
+                    gap = start - state.last_use
+                # cold without the Prewarmer, but warm thanks to its pings?
+                timeout = state.cold_min
+                would_be_cold = state.last_user is None or (
+                    timeout is not None and start - state.last_user > timeout)
+                rescued = would_be_cold and gap is not None and (
+                    timeout is None or gap < timeout)
+                state.uses += 1
+                state.rescued += rescued
+                state.pending = (gap, rescued)
+                state.last_use = state.last_user = end
+                self.lock.notify()
+        elif isinstance(event, ActivationEvent):
+            with self.lock:
+                state = self._find(event.action)
+                if state is None or state.pending is None:
+                    return
+                gap, rescued = state.pending
+                state.pending = None
+                cold = event.init is not None
+                if cold:
+                    state.cold_uses += 1
+                    state.rescued -= rescued
+                    state.cold_start(event.init)
+                self._learn(state, gap, cold)
+
+    def _find(self, short):
+        for name, state in self.actions.items():
+            if short_name(name) == short:
+                return state
+        return None
+
+    def _learn(self, state, gap, cold):
+        """Narrows the idle timeout to (warm_max, cold_min) and sets the
+           interval from it.  A cold start after a gap known to stay warm
+           (a concurrent invocation, an eviction) says nothing about it."""
+        if gap is None:
+            return
+        if cold:
+            if gap > state.warm_max and (state.cold_min is None or
+                                         gap < state.cold_min):
+                state.cold_min = gap
+        elif gap > state.warm_max:
+            state.warm_max = gap
+            if state.cold_min is not None and gap >= state.cold_min:
+                state.cold_min = None  # the timeout went up: explore again
+        if not self.learn:
+            return
+        if state.cold_min is not None:
+            state.interval = self.margin * state.cold_min
+        elif not cold:
+            state.interval = max(state.interval, state.warm_max * self.growth)
+        state.interval = min(self.max_interval,
+                             max(self.min_interval, state.interval))
+
+    def report(self):
+        """{action: {...}}: the learned interval and idle timeout bounds
+           (warm_max, cold_min); the cost, pings and their billed ping_ms;
+           the client's uses, cold_uses, and rescued, the uses that found a
+           container kept warm by pings after being idle longer than the
+           idle timeout; init_ms, the mean cold start seen, and saved_ms,
+           the cold start latency the rescued uses did not pay."""
+        with self.lock:
+            return dict((name, state.report())
+                        for name, state in self.actions.items())
+
+
+def format_report(report):
+    """A text table of Prewarmer.report(), one line per action."""
+    width = max([6] + [len(name) for name in report])
+    lines = ['{:<{}} {:>9} {:>15} {:>6} {:>5} {:>5} {:>7} {:>9}'.format(
+        'action', width, 'interval', 'idle timeout', 'pings', 'cold', 'uses',
+        'rescued', 'saved ms')]
+    for name, stats in sorted(report.items()):
+        timeout = '{:.1f}-{}'.format(stats['warm_max'], '?' if stats[
+            'cold_min'] is None else '{:.1f}'.format(stats['cold_min']))
+        lines.append('{:<{}} {:>9.1f} {:>15} {:>6} {:>5} {:>5} {:>7} {:>9}'
+                     .format(name, width, stats['interval'], timeout,
+                             stats['pings'], stats['cold_pings'],
+                             stats['uses'], stats['rescued'],
+                             int(stats['saved_ms'] or 0)))
+    return '\n'.join(lines)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""Retries and adaptive concurrency for requests to a throttling OpenWhisk
+  OpenWhisk answers 429 when a namespace exceeds its concurrent invocation or
+  per minute limits, and the controller or its gateway answer 502/503 when
+  they are overloaded.  RetryController sits under the request methods of
+  OpenWhisk: it classifies each response, retries the transient failures
+  after a jittered exponential backoff (or the server's Retry-After) and
+  adjusts how many gated requests (invocations) may be in flight, AIMD
+  style: +1 per window of successes, halved on throttling, so a busy client
+  settles just under the namespace's limit instead of hammering it.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth, max_retries=4,
+     ...                             max_in_flight=100)
+     >>> list(whisk.action_invoke_many('hello', payloads, concurrency=200))
+     >>> whisk.retry.stats()
+     {'limit': 61.7, 'in_flight': 0, 'requests': 1312, 'retries': 312, ...}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import random
+import threading
+import time
+
+import requests
+import urllib3
+
+OK = 'ok'
+THROTTLED = 'throttled'      # 429
+UNAVAILABLE = 'unavailable'  # 502, 503 and connection failures
+TIMEOUT = 'timeout'          # read timeouts
+ERROR = 'error'              # anything else that raised
+
+
+def sent(error):
+    """False if a requests ConnectionError shows the request never left:
+       a connect timeout or a refused or unresolved connection."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, 'reason', reason)  # inside a MaxRetryError
+    # NewConnectionError is a ConnectTimeoutError
+    return not isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+
+
+def classify(method, response=None, error=None):
+    """Returns (outcome, retry) for a response or the exception raised
+       instead.  A 502 with a JSON object body comes from OpenWhisk for an
+       action that ran and failed (its activation, or with result=true its
+       error), so it is final; a gateway's 502 (HTML or empty) is retried.
+       A POST is only retried after an error that happened before it was
+       sent (the connection could not be made): after a read timeout or a
+       reset the invocation may already be running."""
+    if error is not None:
+        if isinstance(error, requests.exceptions.ReadTimeout):
+            return TIMEOUT, method != 'post'
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return UNAVAILABLE, method != 'post' or not sent(error)
+        return ERROR, False
+    if response.status_code == 429:
+        return THROTTLED, True
+    if response.status_code == 503:
+        return UNAVAILABLE, True
+    if response.status_code == 502:
+        try:
+            ran = isinstance(response.json(), dict)
+        except ValueError:
+            ran = False
+        return (OK, False) if ran else (UNAVAILABLE, True)
+    return OK, False
+
+
+class RetryController(object):
+    """Retries up to max_retries times, sleeping a random time up to
+       base_delay * 2 ** (attempt - 1) (at most max_delay) or Retry-After.
+       Gated requests wait while `limit` of them are in flight; the limit
+       grows by 1 per `limit` successes up to max_limit and is multiplied by
+       decrease (at most once per window: only requests sent after the last
+       decrease count) on 429, 502/503 and timeouts."""
+
+    def __init__(self, max_retries=4, base_delay=0.1, max_delay=10.0,
+                 max_limit=1000, min_limit=1, decrease=0.5, sleep=time.sleep):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.sleep = sleep
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.counts = collections.Counter()
+        self._last_decrease = 0.0
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+
+    def acquire(self):
+        """Waits for a free slot; returns when the request was let through."""
+        with self.available:
+            while self.in_flight >= max(self.min_limit, int(self.limit)):
+                self.available.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, outcome):
+        with self.available:
+            self.in_flight -= 1
+            if outcome == OK:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            elif outcome != ERROR and started > self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_decrease = time.monotonic()
+            self.available.notify_all()
+
+    def delay(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get(
+            'Retry-After')
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass  # an HTTP date: use our own backoff
+        return random.uniform(0, min(self.max_delay,
+                                     self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, method, send, gated=False, rewind=None):
+        """Returns send()'s response, retrying transient failures; the last
+           response (or exception) is returned (or raised) once retries run
+           out.  rewind() is called before resending, e.g. to restart a
+           streamed body."""
+        attempt = 0
+        while True:
+            started = self.acquire() if gated else None
+            response = error = None
+            try:
+                response = send()
+            except requests.exceptions.RequestException as e:
+                error = e
+            except BaseException:
+                if gated:
+                    self.release(started, ERROR)
+                raise
+            outcome, retry = classify(method, response, error)
+            if gated:
+                self.release(started, outcome)
+            with self.lock:
+                self.counts['requests'] += 1
+                self.counts[outcome] += 1
+                if retry and attempt >= self.max_retries:
+                    self.counts['gave_up'] += 1
+                elif retry:
+                    self.counts['retries'] += 1
+            if not retry or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            if response is not None:
+                response.close()  # hand the connection back to the pool
+            self.sleep(self.delay(attempt, response))
+            if rewind is not None:
+                rewind()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(limit=round(self.limit, 1), in_flight=self.in_flight)
+            for key in ('requests', 'retries', 'gave_up', OK, THROTTLED,
+                        UNAVAILABLE, TIMEOUT, ERROR):
+                stats[key] = self.counts[key]
+        return stats
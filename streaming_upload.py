@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""Streamed JSON request bodies for uploading large action archives
+  A zip action is sent to OpenWhisk as base64 inside a JSON document.  Building
+  that document in memory keeps the raw bytes, their base64, the decoded str
+  and the serialized body alive at once.  Base64JsonBody instead memory-maps
+  the archive and base64-encodes it chunk by chunk as the body is read, so
+  peak memory stays around chunk_size whatever the size of the archive.
+  Examples:
+     $ python3
+     >>> import requests, streaming_upload
+     >>> payload = {'exec': {'kind': 'blackbox', 'image': image}}
+     >>> body = streaming_upload.Base64JsonBody('big.zip', payload,
+     ...                                        ('exec', 'code'))
+     >>> requests.put(url, data=body, headers=body.headers)
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import base64
+import copy
+import json
+import mmap
+import os
+
+PLACEHOLDER = '\x00base64 goes here\x00'
+
+
+class Base64JsonBody(object):
+    """File-like body: json.dumps(payload) with the base64 of filename as the
+       string at payload[path[0]][path[1]]...  It knows its length up front
+       (so requests sends a Content-Length rather than chunking), and read()
+       encodes chunk_size bytes of the file at a time (a multiple of 3, so
+       the chunks concatenate into one valid base64 string)."""
+
+    headers = {'Content-Type': 'application/json'}
+
+    def __init__(self, filename, payload, path, chunk_size=3 << 18):
+        payload = copy.deepcopy(payload)
+        node = payload
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = PLACEHOLDER
+        prefix, suffix = json.dumps(payload).split(json.dumps(PLACEHOLDER))
+        self.prefix = (prefix + '"').encode('utf-8')
+        self.suffix = ('"' + suffix).encode('utf-8')
+        self.chunk_size = chunk_size - chunk_size % 3 or 3
+        self._file = open(filename, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        if self._size:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self._segments = self._iter_segments()
+        self._buffer = memoryview(b'')
+
+    def __len__(self):
+        return (len(self.prefix) + 4 * ((self._size + 2) // 3) +
+                len(self.suffix))
+
+    def __iter__(self):
+        """requests only streams bodies that are iterable."""
+        return self
+
+    def __next__(self):
+        data = self.read(self.chunk_size)
+        if not data:
+            raise StopIteration
+        return data
+
+    next = __next__
+
+    def _iter_segments(self):
+        yield self.prefix
+        for start in range(0, self._size, self.chunk_size):
+            yield base64.b64encode(self._map[start:start + self.chunk_size])
+        yield self.suffix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self)
+        parts = []
+        while size > 0:
+            if not self._buffer:
+                segment = next(self._segments, None)
+                if segment is None:
+                    break
+                self._buffer = memoryview(segment)
+            parts.append(self._buffer[:size])
+            size -= len(parts[-1])
+            self._buffer = self._buffer[len(parts[-1]):]
+        if len(parts) == 1:
+            return parts[0].tobytes()
+        return b''.join(parts)
+
+    def rewind(self):
+        """Starts over from the first byte, e.g. to retry a failed upload."""
+        self._segments = self._iter_segments()
+        self._buffer = memoryview(b'')
+
+    def close(self):
+        self._buffer = memoryview(b'')
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+from action_packager import build_action
+
+builds = []
+
+
+def fake_builder(requirements, build_dir, image):
+    """Stands in for docker: a 'virtualenv' with one 4MB package."""
+    builds.append(image)
+    site = os.path.join(build_dir, 'virtualenv', 'lib', 'python3.6',
+                        'site-packages')
+    os.makedirs(site)
+    with open(os.path.join(site, 'dep.py'), 'wb') as out_file:
+        out_file.write(b'x = 1\n' * ((4 << 20) // 6))
+
+
+directory = tempfile.mkdtemp()
+cache_dir = os.path.join(directory, 'cache')
+main, helper, requirements = (os.path.join(directory, name) for name in
+                              ('action.py', 'helper.py', 'requirements.txt'))
+for filename, text in ((main, 'def main(args):\n    return args\n'),
+                       (helper, 'y = 2\n'), (requirements, 'minio\n')):
+    with open(filename, 'w') as out_file:
+        out_file.write(text)
+
+output = build_action(main, requirements, extra_files=[helper],
+                      cache_dir=cache_dir, builder=fake_builder)
+assert output == os.path.join(directory, 'action.zip')
+with zipfile.ZipFile(output) as zip_file:
+    assert sorted(zip_file.namelist()) == [
+        '__main__.py', 'helper.py', 'virtualenv/lib/python3.6/site-packages/dep.py']
+    assert zip_file.read('__main__.py').startswith(b'def main')
+
+# nothing changed: the output is left alone
+mtime = os.stat(output).st_mtime
+build_action(main, requirements, extra_files=[helper], cache_dir=cache_dir,
+             builder=fake_builder)
+assert os.stat(output).st_mtime == mtime
+
+# only code changed: the cached layer is reused and the rebuild is quick
+with open(main, 'a') as out_file:
+    out_file.write('# changed\n')
+start = time.time()
+build_action(main, requirements, extra_files=[helper], cache_dir=cache_dir,
+             builder=fake_builder)
+assert time.time() - start < 1.0
+assert len(builds) == 1
+with zipfile.ZipFile(output) as zip_file:
+    assert zip_file.read('__main__.py').endswith(b'# changed\n')
+
+# a different runtime image needs its own layer
+build_action(main, requirements, 'python2', cache_dir=cache_dir,
+             builder=fake_builder)
+assert len(builds) == 2
+
+# slim=True drops the dependency that main never imports
+slim = build_action(main, requirements, output=os.path.join(directory,
+                    'slim.zip'), cache_dir=cache_dir, builder=fake_builder,
+                    slim=True)
+with zipfile.ZipFile(slim) as zip_file:
+    assert zip_file.namelist() == ['__main__.py']
+# the same files zip to the same bytes, whatever their mtimes: a fresh
+# checkout deploys nothing new
+def contents(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+first = build_action(main, requirements, extra_files=[helper],
+                     output=os.path.join(directory, 'first.zip'),
+                     cache_dir=os.path.join(directory, 'cache1'),
+                     builder=fake_builder)
+for filename in (main, helper):
+    os.utime(filename, (1e9, 1e9))
+second = build_action(main, requirements, extra_files=[helper],
+                      output=os.path.join(directory, 'second.zip'),
+                      cache_dir=os.path.join(directory, 'cache2'),
+                      builder=fake_builder)
+assert contents(first) == contents(second)
+
+# concurrent builds of one output don't share a partial file
+errors = []
+
+
+def build_same():
+    try:
+        build_action(main, extra_files=[helper], cache_dir=cache_dir,
+                     output=os.path.join(directory, 'same.zip'))
+    except Exception as e:
+        errors.append(e)
+
+
+threads = [threading.Thread(target=build_same) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert errors == [], errors
+with zipfile.ZipFile(os.path.join(directory, 'same.zip')) as zip_file:
+    assert zip_file.namelist() == ['__main__.py', 'helper.py']
+assert not [name for name in os.listdir(directory) if 'partial' in name]
+shutil.rmtree(directory)
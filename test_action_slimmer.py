@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+from action_slimmer import slim_action
+
+site = 'virtualenv/lib/python{}.{}/site-packages/'.format(*sys.version_info[:2])
+files = {
+    '__main__.py': 'import json\nimport minio\n\ndef main(args):\n'
+                   '    return {"ok": minio.VERSION}\n',
+    'virtualenv/bin/activate_this.py': '',
+    'virtualenv/bin/pip': '#!/bin/sh\n',
+    site + 'minio/__init__.py': 'from .api import VERSION\n',
+    site + 'minio/api.py': 'import urllib3\nVERSION = 4\n',
+    site + 'minio/tests/test_api.py': 'import pytest\n',
+    site + 'minio/__pycache__/api.cpython-36.pyc': 'junk',
+    site + 'minio-4.0.0.dist-info/METADATA': 'Name: minio\n',
+    site + 'urllib3/__init__.py': 'from . import util\nimport certifi\n',
+    site + 'urllib3/util.py': 'x = 1\n',
+    site + 'certifi.py': '',
+    site + 'six.py': 'import certifi\n',
+    site + 'dynamic.py': '',
+    site + 'pip/__init__.py': '',
+    site + 'setuptools/__init__.py': '',
+    site + 'distutils-precedence.pth': '',
+    site + 'ns-nspkg.pth': '',
+}
+directory = tempfile.mkdtemp()
+archive = os.path.join(directory, 'action.zip')
+with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    for name, text in sorted(files.items()):
+        zip_file.writestr(name, text)
+        if name.startswith('virtualenv/lib/'):  # like `zip -r` via lib64
+            zip_file.writestr(name.replace('/lib/', '/lib64/'), text)
+    zip_file.comment = b'{"layer": "key"}'
+
+report = slim_action(archive, keep=['dynamic'], precompile=True)
+assert [step.step for step in report] == ['original', 'prune', 'dedupe',
+                                          'unused', 'precompile']
+assert [step.files for step in report[:4]] == [31, 18, 10, 9]
+assert report[0].size > report[3].size
+assert report[3].import_seconds is not None
+
+with zipfile.ZipFile(archive) as zip_file:
+    names = set(zip_file.namelist())
+    assert zip_file.comment == b'{"layer": "key"}'
+sources = set(name for name in files if name.endswith('.py'))
+kept = sources - set(name for name in sources if 'tests' in name or
+                     '/six' in name or '/pip' in name or '/setuptools' in name)
+assert kept | set([site + 'ns-nspkg.pth']) <= names
+assert not any('lib64' in name or 'dist-info' in name or 'six' in name or
+               'setuptools' in name or name.endswith('/pip') for name in names)
+assert site + 'minio/__pycache__/api.cpython-{}{}.pyc'.format(
+    *sys.version_info[:2]) in names
+
+# extension modules are kept when imported, directly or by a package
+binary = {
+    '__main__.py': 'import ujson\nimport cffi\nimport PIL\n',
+    site + 'ujson.cpython-36m-x86_64-linux-gnu.so': 'ELF',
+    site + 'cffi/__init__.py': 'from .api import FFI\n',
+    site + 'cffi/api.py': 'import _cffi_backend\nFFI = 1\n',
+    site + '_cffi_backend.cpython-36m-x86_64-linux-gnu.so': 'ELF',
+    site + 'unused.cpython-36m-x86_64-linux-gnu.so': 'ELF',
+    site + 'PIL/__init__.py': 'from . import _imaging\n',
+    site + 'PIL/_imaging.cpython-36m-x86_64-linux-gnu.so': 'ELF',
+    site + 'Pillow.libs/libjpeg-1a2b3c.so.62': 'ELF',  # loaded by _imaging
+}
+with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    for name, text in sorted(binary.items()):
+        zip_file.writestr(name, text)
+slim_action(archive)
+with zipfile.ZipFile(archive) as zip_file:
+    names = set(zip_file.namelist())
+assert names == set(binary) - set([site + 'unused.cpython-36m-x86_64-'
+                                   'linux-gnu.so']), names
+shutil.rmtree(directory)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from activation_analytics import ActivationAnalytics
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+
+# numpy is only imported once analytics are used, not with openwhisk
+imported = subprocess.check_output(
+    [sys.executable, '-c', 'import sys, openwhisk; print(list(sys.modules))'],
+    cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True)
+assert "'numpy'" not in imported
+
+
+class FakeWhisk(object):
+    """Serves iter_activations() from a list, recording the since= asked."""
+
+    def __init__(self):
+        self.activations = []
+        self.asked = []
+
+    def iter_activations(self, name=None, since=None, page_size=200):
+        self.asked.append(since)
+        return [a for a in sorted(self.activations, key=lambda a: -a['start'])
+                if a['start'] >= since and name in (None, a['name'])]
+
+
+def activation(n, name, start, duration, status=0, wait=None, init=None):
+    annotations = [{'key': 'path', 'value': 'guest/' + name}]
+    if wait is not None:
+        annotations.append({'key': 'waitTime', 'value': wait})
+    if init is not None:
+        annotations.append({'key': 'initTime', 'value': init})
+    return {'activationId': 'id{}'.format(n), 'name': name, 'start': start,
+            'duration': duration, 'statusCode': status,
+            'annotations': annotations}
+
+
+now = int(time.time() * 1000)
+whisk = FakeWhisk()
+whisk.activations = [activation(n, 'a', now - 1000 * n, n, wait=2,
+                                init=100 if n % 10 == 0 else None,
+                                status=1 if n % 4 == 0 else 0)
+                     for n in range(1, 101)]
+whisk.activations += [activation(100 + n, 'b', now - 500 * n, 1000 + n)
+                      for n in range(1, 11)]
+analytics = ActivationAnalytics(whisk, window=3600)
+assert analytics.refresh() == 110
+assert analytics.cursor == now - 500
+assert abs(whisk.asked[0] - (now - 3600 * 1000)) < 5000
+
+stats = analytics.stats()
+assert sorted(stats) == ['a', 'b']
+a = stats['a']
+assert a['count'] == 100 and a['errors'] == 25 and a['error_rate'] == 0.25
+assert a['cold'] == 10 and a['cold_ratio'] == 0.1
+assert a['p50'] == 50.5 and 95 <= a['p95'] <= 96 and 99 <= a['p99'] <= 100
+assert a['wait_mean'] == 2 and a['init_mean'] == 100
+b = stats['b']
+assert b['count'] == 10 and b['cold'] == 0 and b['init_mean'] is None
+assert b['wait_mean'] is None and b['p50'] == 1005.5
+assert analytics.counts() == {'a': 100, 'b': 10}
+assert analytics.counts(action='b') == {'b': 10}
+assert analytics.counts(action='nope') == {}
+# time ranges: last seconds before the cursor, or since/upto in ms
+assert analytics.counts(last=5) == {'a': 5, 'b': 10}
+assert analytics.counts(since=now - 10500, upto=now - 9500) == {'a': 1}
+
+# a refresh asks only since the cursor (less settle) and skips duplicates
+whisk.activations.append(activation(1000, 'a', now + 100, 7))
+assert analytics.refresh() == 1
+assert whisk.asked[-1] == now - 500 - 60 * 1000
+assert analytics.refresh() == 0
+assert analytics.counts()['a'] == 101 and len(analytics) == 111
+
+# memory follows the window: old rows go as the cursor moves on
+analytics = ActivationAnalytics(whisk, window=30, settle=1)
+analytics.refresh()
+assert analytics.counts() == {'a': 30, 'b': 10}
+later = [activation(2000 + n, 'c', now + 100000 + n, 1) for n in range(5)]
+analytics.ingest(later)
+assert analytics.counts() == {'c': 5}
+assert len(analytics) == 5 and len(analytics.column('start')) == 5
+assert analytics.nbytes() < 256 * 40  # shrunk back to its minimum capacity
+try:
+    analytics.column('start')[0] = 0
+    assert False, 'columns should be read-only'
+except ValueError:
+    pass
+
+# against the emulator, whose listings carry statusCode at the top level
+directory = tempfile.mkdtemp()
+broken = os.path.join(directory, 'broken.py')
+with open(broken, 'w') as out_file:
+    out_file.write('def main(args):\n    return 1 / 0\n')
+emulator = WhiskEmulator(cold_start=0.05).start()
+try:
+    client = OpenWhisk('user:password', apihost=emulator.apihost)
+    client.action_create('hello/hello.py', 'hello')
+    client.action_create(broken, 'broken')
+    for _ in range(4):
+        client.action_invoke('hello', blocking=True)
+    client.action_invoke('broken', blocking=True)
+    analytics = client.activation_analytics(window=600)
+    assert analytics.refresh() == 5
+    stats = analytics.stats()
+    assert stats['hello']['count'] == 4 and stats['hello']['errors'] == 0
+    assert stats['hello']['cold'] == 1 and stats['hello']['init_mean'] >= 50
+    assert stats['broken']['error_rate'] == 1.0
+    client.action_invoke('hello', blocking=True)
+    assert analytics.refresh() == 1
+    assert analytics.counts() == {'hello': 5, 'broken': 1}
+finally:
+    emulator.stop()
+    shutil.rmtree(directory)
+print('ok')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import time
+
+from activation_store import ActivationStore
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+
+def record(n, logs=100):
+    return {'activationId': 'id{}'.format(n), 'name': 'hello',
+            'response': {'status': 'success', 'success': True,
+                         'result': {'n': n, 'text': 'abc' * 100}},
+            'logs': ['2017-01-01T00:00:00Z stdout: line {}'.format(i)
+                     for i in range(logs)]}
+
+
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'sub', 'activations.db')
+    store = ActivationStore(path)
+    assert store.get('id0') is None
+    store.put(record(0))
+    store.put({'activationId': 'running'})  # no response yet: not stored
+    assert store.get('id0') == record(0)
+    assert store.get('running') is None
+    stats = store.stats()
+    assert stats['activations'] == 1 and stats['hits'] == 1
+    assert 0 < stats['bytes'] < len(str(record(0))) / 10  # compressed
+    store.put(record(0))  # replacing doesn't count twice
+    assert store.stats()['bytes'] == stats['bytes']
+    store.close()
+
+    # it persists, and is bounded, dropping the least recently read
+    store = ActivationStore(path, max_bytes=stats['bytes'] * 10)
+    assert store.get('id0') == record(0)
+    store.put_many([record(n) for n in range(1, 8)])
+    time.sleep(0.01)
+    assert len(store.get_many(['id1', 'id2', 'nope'])) == 2
+    store.put_many([record(n) for n in range(8, 12)])
+    stats = store.stats()
+    assert stats['bytes'] <= store.max_bytes and stats['evictions'] > 0
+    held = store.get_many('id{}'.format(n) for n in range(12))
+    assert 'id1' in held and 'id2' in held and 'id11' in held
+    assert 'id0' not in held and 'id3' not in held
+    store.clear()
+    assert len(store) == 0 and store.stats()['bytes'] == 0
+    store.close()
+
+    # the client reads through the store and fetches misses in parallel
+    emulator = WhiskEmulator().start()
+    try:
+        whisk = OpenWhisk('user:password', apihost=emulator.apihost,
+                          activation_store=os.path.join(directory, 'w.db'))
+        gets = []
+        whisk.instrumentation.add_hook(
+            lambda event: getattr(event, 'verb', '') == 'get' and
+            gets.append(event.url))
+        whisk.action_create('hello/hello.py', 'hello')
+        ids = [whisk.action_invoke('hello', blocking=True)['activationId']
+               for _ in range(6)]
+        info = whisk.activation_info(ids[0])
+        assert whisk.activation_info(ids[0]) == info
+        assert whisk.activation_results(ids[0]) == info['response']
+        assert len(gets) == 1
+        fetched = whisk.activations_fetch(ids + ['missing'], concurrency=4)
+        assert sorted(fetched) == sorted(ids)
+        assert len(gets) == 1 + 5 + 1  # just the misses
+        assert whisk.activations_fetch(ids) == fetched
+        assert len(gets) == 7
+        assert whisk.activations_fetch(ids + ['missing']) == fetched
+        assert len(gets) == 8  # 'missing' is asked again
+        assert whisk.store.stats()['activations'] == 6
+
+        # without a store nothing is kept, results come from /result
+        plain = OpenWhisk('user:password', apihost=emulator.apihost)
+        assert plain.store is None
+        assert plain.activation_results(ids[1]) == fetched[ids[1]]['response']
+        assert plain.activations_fetch(ids[:2]) == dict(
+            (i, fetched[i]) for i in ids[:2])
+    finally:
+        emulator.stop()
+finally:
+    shutil.rmtree(directory)
+print('ok')
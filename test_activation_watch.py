@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+emulator = WhiskEmulator().start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    whisk.action_create('hello/hello.py', 'hello')
+    whisk.action_create('hello/hello.py', 'other')
+    for n in range(5):  # history the watcher must not replay
+        whisk.action_invoke('hello', blocking=True, payload={'name': str(n)})
+
+    requests = []
+    whisk.instrumentation.add_hook(
+        lambda event: getattr(event, 'verb', None) and
+        requests.append(event.url))
+    watcher = whisk.watch_activations('hello', min_interval=0.05,
+                                      max_interval=0.4, idle_timeout=1.5)
+
+    def invoke():
+        time.sleep(0.3)
+        for n in range(250):  # more than a page between two polls
+            whisk.action_invoke('hello', blocking=True,
+                                payload={'name': 'n{}'.format(n)})
+            whisk.action_invoke('other', blocking=True)
+    thread = threading.Thread(target=invoke)
+    thread.start()
+    seen = [activation['activationId'] for activation in watcher]
+    thread.join()
+    stats = watcher.stats()
+    print(stats)
+    assert len(seen) == len(set(seen)) == 250  # each new one, once
+    watches = [url for url in requests if '/activations' in url]
+    assert len(watches) == stats['requests']
+    assert all('since=' in url for url in watches[1:])
+    listed = [a['activationId'] for a in whisk.iter_activations(name='hello')]
+    assert set(seen) == set(listed[:250])
+    assert stats['yielded'] == 250 and stats['fetched'] == 0
+    assert stats['interval'] == 0.4  # idle at the end: backed off
+
+    # under steady load each poll lists only what is new, however long
+    # the settle window is
+    watcher = whisk.watch_activations('hello', min_interval=0.1,
+                                      max_interval=0.1, idle_timeout=1.0)
+    start = watcher.stats()
+    for n in range(60):
+        whisk.action_invoke('hello', blocking=True, payload={'name': 'l'})
+        time.sleep(0.02)
+        watcher.poll()
+    stats = watcher.stats()
+    polls = stats['polls'] - start['polls']
+    assert stats['requests'] - start['requests'] == polls
+    assert stats['listed'] - start['listed'] <= 2 * polls, stats
+    assert stats['rescans'] == 0 and len(list(watcher)) == 0
+
+    # idle, a poll is one small request and polls back off
+    watcher = whisk.watch_activations(min_interval=0.05, max_interval=1.0,
+                                      idle_timeout=3.0)
+    del requests[:]  # it starts at the newest activation
+    assert list(watcher) == []
+    polls = watcher.stats()['polls']
+    assert 5 <= polls <= 12 and len(requests) == polls
+    assert watcher.stats()['interval'] == 1.0
+
+    # details fetch the full records, with results and logs
+    watcher = whisk.watch_activations(details=True, idle_timeout=0.5)
+    for n in range(3):
+        whisk.action_invoke('hello', blocking=True, payload={'name': str(n)})
+    records = list(watcher)
+    assert [record['response']['result']['data']['greeting']
+            for record in records] == ['Hello 0!', 'Hello 1!', 'Hello 2!']
+    assert all('logs' in record for record in records)
+    assert watcher.stats()['fetched'] == 3
+
+    # an activation that runs past quicker ones is still yielded
+    directory = tempfile.mkdtemp()
+    try:
+        slow = os.path.join(directory, 'slow.py')
+        with open(slow, 'w') as out_file:
+            out_file.write('import time\n\ndef main(args):\n'
+                           '    time.sleep(3)\n    return {}\n')
+        whisk.action_create(slow, 'slow')
+    finally:
+        shutil.rmtree(directory)
+    watcher = whisk.watch_activations(min_interval=0.05, max_interval=0.5,
+                                      rescan=1.0, idle_timeout=5.0)
+    assert watcher.settle == 61.0  # the default time limit, and a second
+    whisk.action_invoke('slow')
+    for n in range(3):
+        whisk.action_invoke('hello', blocking=True, payload={'name': 'q'})
+    watched = [activation['name'] for activation in watcher]
+    assert watched == ['hello', 'hello', 'hello', 'slow'], watched
+    assert watcher.stats()['rescans'] >= 3
+
+    # since replays history
+    oldest = min(a['start'] for a in whisk.iter_activations())
+    assert len(list(whisk.watch_activations(since=oldest, idle_timeout=0.2))) \
+        == len(list(whisk.iter_activations()))
+finally:
+    emulator.stop()
+print('ok')
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import shutil
+import tempfile
+import warnings
+
+import aiohttp
+
+from action_packager import build_action, runtime_image
+from async_openwhisk import AsyncOpenWhisk
+from whisk_emulator import WhiskEmulator
+
+
+async def exercise(apihost, archive):
+    async with AsyncOpenWhisk('user:password', apihost=apihost,
+                              pool_size=16) as whisk:
+        await whisk.action_create('hello/hello.py', 'hello')
+        assert await whisk.action_names() == ['hello']
+        action = await whisk.action_get('hello')
+        assert action['exec']['image'] == runtime_image('python3')
+
+        # blocking, result only
+        assert await whisk.action_invoke('hello', blocking=True, result=True,
+                                         payload={'name': 'Wendel'}) == {
+            'data': {'greeting': 'Hello Wendel!', 'foo': 'bar'},
+            'operation': 'global'}
+
+        # non-blocking: an activation id to look up later
+        activation_id = (await whisk.action_invoke(
+            'hello', payload={'name': 'later'}))['activationId']
+        for _ in range(100):
+            result = await whisk.activation_results(activation_id)
+            if 'result' in result:
+                break
+            await asyncio.sleep(0.05)
+        assert result['result']['data']['greeting'] == 'Hello later!'
+
+        # many invocations in flight on one event loop
+        results = await asyncio.gather(*(
+            whisk.action_invoke('hello', blocking=True, result=True,
+                                payload={'name': str(n)})
+            for n in range(50)))
+        assert [r['data']['greeting'] for r in results] == [
+            'Hello {}!'.format(n) for n in range(50)]
+        listed = await whisk.activations_list(name='hello', limit=100)
+        assert len(listed) == 52, len(listed)
+
+        # zip actions, packages and sequences
+        whisk.package = 'pkg'
+        await whisk.action_create(archive, 'zipped')
+        assert await whisk.action_names() == ['zipped']
+        whisk.package = None
+        await whisk.sequence_create('twice', ['guest/hello', 'pkg/zipped'])
+        result = await whisk.action_invoke('twice', blocking=True,
+                                           result=True)
+        assert result['data']['greeting'] == 'Hello stranger!'
+
+        await whisk.action_delete('twice')
+        assert await whisk.action_names() == ['hello', 'zipped']
+    assert whisk.session is None
+
+
+async def failures(apihost):
+    """Error statuses raise, after retries where the sync client retries."""
+    async with AsyncOpenWhisk('user:wrong', apihost=apihost) as whisk:
+        try:
+            await whisk.action_names()
+            assert False, 'a 401 must raise'
+        except aiohttp.ClientResponseError as e:
+            assert e.status == 401
+    async with AsyncOpenWhisk('user:password', apihost=apihost,
+                              max_retries=1) as whisk:
+        await whisk.action_create('hello/hello.py', 'hello')
+        try:
+            await whisk.action_get('missing')
+            assert False, 'a 404 must raise'
+        except aiohttp.ClientResponseError as e:
+            assert e.status == 404
+        for _ in range(2):
+            await whisk.action_invoke('hello', blocking=True, result=True)
+        try:
+            await whisk.action_invoke('hello', blocking=True, result=True)
+            assert False, 'a 429 must raise once retries run out'
+        except aiohttp.ClientResponseError as e:
+            assert e.status == 429
+        assert whisk.retry.counts['throttled'] == 2
+        assert whisk.retry.counts['retries'] == 1
+        assert whisk.retry.counts['gave_up'] == 1
+
+
+warnings.simplefilter('error', DeprecationWarning)  # e.g. aiohttp.BasicAuth
+directory = tempfile.mkdtemp()
+try:
+    archive = build_action('hello/hello.py',
+                           output=os.path.join(directory, 'hello.zip'),
+                           cache_dir=os.path.join(directory, 'cache'))
+    with WhiskEmulator() as emulator:
+        asyncio.run(exercise(emulator.apihost, archive))
+    with WhiskEmulator(auth='user:password', per_minute_limit=2) as emulator:
+        asyncio.run(failures(emulator.apihost))
+finally:
+    shutil.rmtree(directory)
+
+print('ok')
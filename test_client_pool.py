@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import threading
+
+from client_pool import ClientPool
+from whisk_emulator import WhiskEmulator
+
+try:
+    ClientPool([('http://localhost:1', 'user:password')], policy='fastest')
+    assert False, 'unknown policy'
+except ValueError:
+    pass
+
+fast = WhiskEmulator().start()
+slow = WhiskEmulator(latency=0.05).start()
+dead = WhiskEmulator().start()
+port = int(dead.apihost.rsplit(':', 1)[1])
+try:
+    endpoints = [(e.apihost, 'user:password') for e in (fast, slow, dead)]
+    pool = ClientPool(endpoints, max_retries=0, timeout=5)
+    pool.broadcast('action_create', 'hello/hello.py', 'hello')
+    assert [s['apihost'] for s in pool.stats()] == [e[0] for e in endpoints]
+    assert pool.action_names == ['hello']  # properties go through too
+
+    # least outstanding: concurrent calls spread over every endpoint
+    def invoke_some():
+        for _ in range(10):
+            pool.action_invoke('hello', blocking=True, result=True)
+    threads = [threading.Thread(target=invoke_some) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    calls = [s['calls'] for s in pool.stats()]
+    assert all(count >= 5 for count in calls), calls
+    assert all(s['outstanding'] == 0 for s in pool.stats())
+
+    # a batch is spread too, and generators hold their endpoint until done
+    before = [s['calls'] for s in pool.stats()]
+    results = list(pool.action_invoke_many('hello', [{}] * 30,
+                                           concurrency=6, result=True))
+    assert [r.error for r in results] == [None] * 30
+    spread = [s['calls'] - b for s, b in zip(pool.stats(), before)]
+    assert sum(spread) == 30 and all(count >= 3 for count in spread), spread
+    activations = pool.iter_activations()
+    next(activations)
+    assert sum(s['outstanding'] for s in pool.stats()) == 1
+    activations.close()
+    assert all(s['outstanding'] == 0 for s in pool.stats())
+
+    # an action that fails (a 502 with its activation) is not the endpoint's
+    # fault
+    directory = tempfile.mkdtemp()
+    try:
+        failing = os.path.join(directory, 'failing.py')
+        with open(failing, 'w') as out_file:
+            out_file.write('def main(args):\n    raise ValueError(args)\n')
+        pool.broadcast('action_create', failing, 'failing')
+    finally:
+        shutil.rmtree(directory)
+    pool = ClientPool(endpoints[:2], max_retries=0)
+    for _ in range(10):
+        assert 'error' in pool.action_invoke('failing', blocking=True,
+                                             result=True)
+    assert all(s['healthy'] and s['ejections'] == 0 for s in pool.stats())
+
+    # latency weighted: the slow host gets little of the traffic
+    pool = ClientPool(endpoints[:2], policy='latency', max_retries=0)
+    for _ in range(40):
+        assert pool.action_invoke('hello', blocking=True, result=True)[
+            'data']['greeting'] == 'Hello stranger!'
+    fast_stats, slow_stats = pool.stats()
+    assert fast_stats['latency_ms'] < slow_stats['latency_ms']
+    assert slow_stats['calls'] <= 5, pool.stats()
+
+    # a dead host is taken out of rotation, probed and put back
+    dead.stop()
+    pool = ClientPool(endpoints, max_retries=0, min_requests=3, timeout=1)
+    errors = 0
+    for _ in range(30):
+        try:
+            pool.actions_list()
+        except Exception:
+            errors += 1
+    stats = pool.stats()
+    assert stats[2]['healthy'] is False and stats[2]['ejections'] == 1
+    assert errors == 3 == stats[2]['errors'], (errors, stats)
+    assert stats[0]['healthy'] and stats[1]['healthy']
+    assert pool.probe() == 2  # still down
+    dead = WhiskEmulator(port=port).start()
+    assert pool.probe() == 3
+    assert pool.stats()[2]['healthy'] and pool.stats()[2]['error_rate'] == 0
+    pool.actions_list()
+finally:
+    for emulator in (fast, slow, dead):
+        try:
+            emulator.stop()
+        except Exception:
+            pass
+print('ok')
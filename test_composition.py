@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import time
+
+from composition import (ActionError, Composition, CompositionError,
+                         format_run)
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+STEP = '''import time
+
+def main(args):
+    time.sleep({secs})
+    if {fail}:
+        raise ValueError('broken')
+    return {{'path': args.get('path', []) + [{name!r}]}}
+'''
+
+# structure checks need no server
+flow = Composition()
+flow.add('a')
+try:
+    flow.add('b', after=['nope'])
+    assert False, 'unknown dependency'
+except ValueError:
+    pass
+try:
+    flow.add('a')
+    assert False, 'duplicate node'
+except ValueError:
+    pass
+flow.add('b', after='a')
+flow.add('c', after=['a'])
+assert flow.sinks() == ['b', 'c']
+
+directory = tempfile.mkdtemp()
+emulator = WhiskEmulator().start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    for name, secs, fail in (('a', 0.2, False), ('b', 0.4, False),
+                             ('c', 0.2, False), ('d', 0.1, False),
+                             ('slow', 2, False), ('broken', 0, True)):
+        filename = os.path.join(directory, name + '.py')
+        with open(filename, 'w') as out_file:
+            out_file.write(STEP.format(secs=secs, fail=fail, name=name))
+        whisk.action_create(filename, name)
+        whisk.action_invoke(name, blocking=True)  # warm up
+
+    # a -> (b, c) -> d: the branches run concurrently and d joins them
+    flow = Composition()
+    flow.add('a')
+    flow.add('b', after=['a'])
+    flow.add('c', after=['a'])
+    flow.add('d', after=['b', 'c'],
+             join=lambda results: {'path': sum((r['path'] for r
+                                                in results.values()), [])})
+    run = flow.run(whisk, {'path': ['input']})
+    print(format_run(run))
+    assert run.output == {'path': ['input', 'a', 'b', 'input', 'a', 'c',
+                                   'd']}
+    assert run.results['b'] == {'path': ['input', 'a', 'b']}
+    assert [step.node for step in run.critical_path] == ['a', 'b', 'd']
+    assert [step.node for step in run.steps] == ['a', 'b', 'c', 'd']
+    steps = dict((step.node, step) for step in run.steps)
+    assert steps['b'].start >= steps['a'].end
+    assert steps['d'].start >= max(steps['b'].end, steps['c'].end)
+    assert run.serial >= 0.9  # 0.2 + 0.4 + 0.2 + 0.1
+    assert run.elapsed < run.serial - 0.1, run
+
+    # without a join a fan-in gets {node: result}; several sinks -> dict
+    flow = Composition()
+    flow.add('a')
+    flow.add('c', after='a')
+    flow.add('d', after=['a', 'c'])
+    flow.add('second_d', action='d', after=['a'])
+    run = flow.run(whisk)
+    assert run.output['second_d'] == {'path': ['a', 'd']}
+    assert run.output['d'] == {'path': ['d']}  # {a: ..., c: ...} has no path
+
+    # failures and per node timeouts stop the run
+    flow = Composition()
+    flow.add('a')
+    flow.add('broken', after='a')
+    try:
+        flow.run(whisk)
+        assert False, 'should have failed'
+    except CompositionError as e:
+        assert e.node == 'broken' and isinstance(e.cause, ActionError)
+        assert 'broken' in str(e.cause)
+    flow = Composition()
+    flow.add('a', timeout=5)
+    flow.add('slow', after='a', timeout=0.3)
+    start = time.monotonic()
+    try:
+        flow.run(whisk)
+        assert False, 'should have timed out'
+    except CompositionError as e:
+        assert e.node == 'slow' and isinstance(e.cause, TimeoutError)
+    assert time.monotonic() - start < 1.5
+finally:
+    emulator.stop()
+    shutil.rmtree(directory)
+print('ok')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from connection_pool import SessionPool
+from openwhisk import OpenWhisk
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers {'path': ...}; /slow after a second, /busy after 50ms.  Counts
+       the client ports so the tests can tell how many connections were
+       opened."""
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    ports = set()
+
+    def do_GET(self):
+        self.ports.add(self.client_address[1])
+        if self.path == '/slow':
+            time.sleep(1)
+        elif self.path == '/busy':
+            time.sleep(0.05)
+        self.reply({'path': self.path})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.do_GET()
+
+    def reply(self, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def connections(func):
+    StandInHandler.ports.clear()
+    func()
+    return len(StandInHandler.ports)
+
+
+# one shared session keeps reusing its connection
+sessions = SessionPool(('user', 'pass'))
+assert sessions.session is sessions.session
+assert sessions.session.auth == ('user', 'pass')
+assert connections(lambda: [sessions.session.get(url + '/a').json()
+                            for _ in range(5)]) == 1
+
+# idle connections are replaced after keepalive_timeout seconds
+sessions = SessionPool(keepalive_timeout=0.1)
+sessions.session.get(url)
+assert connections(lambda: sessions.session.get(url)) == 1
+time.sleep(0.3)
+assert connections(lambda: sessions.session.get(url)) == 1
+assert connections(lambda: [sessions.session.get(url),
+                            time.sleep(0.3),
+                            sessions.session.get(url)]) == 2
+
+# a default socket timeout, which a per request timeout still overrides
+sessions = SessionPool(timeout=0.2)
+try:
+    sessions.session.get(url + '/slow')
+    assert False, 'should have timed out'
+except requests.exceptions.ReadTimeout:
+    pass
+assert sessions.session.get(url + '/slow', timeout=5).ok
+
+# thread local sessions share the adapter and so the warm connections
+sessions = SessionPool(thread_local=True, pool_maxsize=4)
+assert sessions.thread_local
+seen = []
+
+
+def work(n):
+    session = sessions.session
+    seen.append((threading.get_ident(), session))
+    return session.get(url + '/busy').json()['path']
+
+
+with ThreadPoolExecutor(4) as pool:
+    assert list(pool.map(work, range(4))) == ['/busy'] * 4
+    assert connections(lambda: list(pool.map(work, range(40)))) <= 4
+by_thread = dict(seen)
+assert len(by_thread) == 4
+assert len(set(map(id, by_thread.values()))) == 4
+assert all(session.get_adapter(url) is sessions.adapter
+           for session in by_thread.values())
+
+# grow() swaps in a bigger pool that the existing thread sessions pick up
+adapter = sessions.adapter
+sessions.grow(2)
+assert sessions.adapter is adapter
+sessions.grow(16)
+assert sessions.adapter is not adapter
+assert sessions.adapter._pool_maxsize == 16
+with ThreadPoolExecutor(4) as pool:
+    list(pool.map(work, range(8)))
+assert sessions.session.get_adapter(url) is sessions.adapter
+
+# pool_block=True makes threads wait for a connection instead of opening more
+sessions = SessionPool(pool_maxsize=1, pool_block=True)
+with ThreadPoolExecutor(4) as pool:
+    assert connections(lambda: list(pool.map(
+        lambda n: sessions.session.get(url + '/busy').ok, range(8)))) == 1
+sessions.close()
+
+# the client passes its options through and can be shared by threads
+whisk = OpenWhisk('user:pass', apihost=url, thread_local=True, timeout=0.2,
+                  pool_maxsize=4, keepalive_timeout=30)
+assert whisk.sessions.thread_local
+assert whisk.sessions.adapter.timeout == 0.2
+with ThreadPoolExecutor(2) as pool:
+    sessions_used = set(pool.map(lambda n: (time.sleep(0.05),
+                                            id(whisk.session))[1], range(4)))
+assert len(sessions_used) == 2
+results = list(whisk.action_invoke_many('hello', [{'n': n} for n in range(20)],
+                                        concurrency=8))
+assert [result.error for result in results] == [None] * 20
+assert whisk.sessions.adapter._pool_maxsize == 8
+try:
+    whisk._get(url + '/slow')
+    assert False, 'should have timed out'
+except requests.exceptions.ReadTimeout:
+    pass
+
+server.shutdown()
+print('ok')
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+
+import openwhisk
+from instrumentation import (ActivationEvent, Histogram, Instrumentation,
+                             RequestEvent, entity_of)
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+base = 'https://h/api/v1/namespaces/_'
+assert entity_of(base + '/actions') == 'actions'
+assert entity_of(base + '/actions/a?blocking=True') == 'actions'
+assert entity_of(base + '/packages/p/actions/a') == 'actions'
+assert entity_of(base + '/packages/p') == 'packages'
+assert entity_of(base + '/packages') == 'packages'
+assert entity_of(base + '/activations/x/logs') == 'activations'
+assert entity_of(base) == 'namespaces'
+
+histogram = Histogram(buckets=(0.1, 1.0))
+for value in (0.05, 0.1, 0.5, 2.0):
+    histogram.observe(value)
+assert histogram.counts == [2, 1, 1]
+assert list(histogram.cumulative()) == [2, 3, 4]
+assert histogram.quantile(0.5) == 0.1 and histogram.quantile(1) == float('inf')
+assert histogram.count == 4 and abs(histogram.sum - 2.65) < 1e-9
+
+emulator = WhiskEmulator(cold_start=0.1, latency=0.005).start()
+try:
+    events = []
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    instrumentation = whisk.instrumentation
+    instrumentation.add_hook(events.append)
+    whisk.action_create('hello/hello.py', 'hello')
+    assert whisk.action_invoke('hello', blocking=True, result=True)  # cold
+    first = whisk.action_invoke('hello', blocking=True)
+    second = whisk.action_invoke('hello', blocking=True)
+    future = whisk.action_invoke('hello')
+    future.result(timeout=10)
+    whisk.activation_future('missing').cancel()
+    assert whisk._get(whisk.gen.url_action('missing')).status_code == 404
+
+    requests = [e for e in events if isinstance(e, RequestEvent)]
+    activations = [e for e in events if isinstance(e, ActivationEvent)]
+    assert [(e.verb, e.entity, e.status) for e in requests
+            if e.entity == 'actions'] == [
+        ('put', 'actions', 200), ('post', 'actions', 200),
+        ('post', 'actions', 200), ('post', 'actions', 200),
+        ('post', 'actions', 202), ('get', 'actions', 404)]
+    assert ('get', 'activations', 200) in [(e.verb, e.entity, e.status)
+                                           for e in requests]  # the poller
+    assert all(e.seconds >= 0.005 for e in requests)
+    # result=True answers carry no timings; the future is linked on resolve
+    assert [e.activation_id for e in activations] == [
+        first['activationId'], second['activationId'], future.activation_id]
+    assert activations[1].round_trip >= activations[1].duration / 1000.0
+    assert activations[1].init is None and activations[1].wait is not None
+
+    stats = instrumentation.to_dict()
+    posts = [h for h in stats['histograms']['request_seconds']
+             if (h['entity'], h['verb']) == ('actions', 'post')]
+    assert posts[0]['count'] == 4
+    assert stats['histograms']['activation_duration_seconds'][0][
+        'action'] == 'hello'
+    assert stats['histograms']['activation_round_trip_seconds'][0][
+        'count'] == 3
+    assert {'entity': 'actions', 'verb': 'get', 'status': 404,
+            'count': 1} in stats['responses']
+    assert json.loads(instrumentation.to_json()) == json.loads(
+        json.dumps(stats))
+
+    text = instrumentation.to_prometheus()
+    assert '# TYPE openwhisk_client_request_seconds histogram' in text
+    assert ('openwhisk_client_request_seconds_count{entity="actions",'
+            'verb="post"} 4') in text
+    assert ('openwhisk_client_request_seconds_bucket{entity="actions",'
+            'verb="post",le="+Inf"} 4') in text
+    assert 'openwhisk_client_activation_wait_seconds_sum{action="hello"}' in \
+        text
+    assert ('openwhisk_client_responses_total{entity="actions",verb="get",'
+            'status="404"} 1') in text
+
+    # clients can share one Instrumentation; DEBUG logs through a hook that
+    # checks the flag per event, so it can be flipped on an existing client
+    other = OpenWhisk('user:password', apihost=emulator.apihost,
+                      instrumentation=instrumentation)
+    assert instrumentation.hooks == [openwhisk.debug_hook, events.append]
+    instrumentation.remove_hook(events.append)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        whisk.actions_list()
+        openwhisk.DEBUG = True
+        try:
+            whisk.actions_list()
+        finally:
+            openwhisk.DEBUG = False
+    lines = output.getvalue().splitlines()  # only the second listing
+    assert len(lines) == 1, lines
+    assert lines[0].startswith('GET {}/api/v1/namespaces/_/actions -> 200 '
+                               'in '.format(emulator.apihost)), lines
+    other.action_invoke('hello', blocking=True, result=True)
+    assert posts[0]['count'] == 4  # to_dict() is a snapshot
+    assert ('openwhisk_client_request_seconds_count{entity="actions",'
+            'verb="post"} 5') in instrumentation.to_prometheus()
+    instrumentation.reset()
+    assert instrumentation.to_dict() == {'histograms': {}, 'responses': []}
+finally:
+    emulator.stop()
+print('ok')
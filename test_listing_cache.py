@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import time
+
+from listing_cache import ListingCache
+
+cache = ListingCache(ttl=60, maxsize=2)
+assert cache.get(('actions', 'a')) is None
+cache.put(('actions', 'a'), 'A')
+cache.put(('rules', 'b'), 'B')
+assert cache.get(('actions', 'a')) == 'A'  # 'a' is now most recent
+cache.put(('actions', 'pkg/c'), 'C')  # so 'b' gets evicted
+assert cache.get(('rules', 'b')) is None
+assert cache.get(('actions', 'pkg/c')) == 'C'
+assert cache.stats() == {'hits': 2, 'misses': 2, 'evictions': 1, 'size': 2}
+
+cache.invalidate('rules')
+assert cache.get(('actions', 'pkg/c')) == 'C'
+cache.invalidate('actions')  # whatever package they were listed under
+assert cache.get(('actions', 'pkg/c')) is None
+assert cache.get(('actions', 'a')) is None
+cache.put(('rules', 'b'), 'B')
+cache.invalidate()
+assert len(cache) == 0
+
+cache = ListingCache(ttl=0.01)
+cache.put(('triggers', 't'), 'T')
+time.sleep(0.02)
+assert cache.get(('triggers', 't')) is None
+assert len(cache) == 0
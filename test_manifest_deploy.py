@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from manifest_deploy import (Change, DeployError, Manifest, deploy,
+                             format_changes)
+from openwhisk import OpenWhisk, annotation
+from whisk_emulator import WhiskEmulator
+
+STEP = '''def main(args):
+    return dict(args, path=args.get('path', []) + [{name!r}])
+'''
+
+directory = tempfile.mkdtemp()
+try:
+    for name in ('resize', 'tag', 'store'):
+        with open(os.path.join(directory, name + '.py'), 'w') as out_file:
+            out_file.write(STEP.format(name=name))
+    manifest = {
+        'name': 'shop',
+        'packages': {'imaging': {'parameters': {'quality': 80}}},
+        'actions': {'imaging/resize': {'file': 'resize.py',
+                                       'limits': {'timeout': 5000}},
+                    'tag': 'tag.py',
+                    'store': {'file': 'store.py',
+                              'parameters': {'bucket': 'b1'}}},
+        'sequences': {'pipeline': ['imaging/resize', 'tag'],
+                      'full': ['pipeline', 'store']},
+        'triggers': {'uploaded': {}},
+        'rules': {'on_upload': {'trigger': 'uploaded', 'action': 'full'}}}
+    path = os.path.join(directory, 'manifest.json')
+    with open(path, 'w') as out_file:
+        json.dump(manifest, out_file)
+
+    # dependency levels, and mistakes caught before anything is sent
+    levels = Manifest(path).levels
+    assert levels[('packages', 'imaging')] == levels[('triggers',
+                                                      'uploaded')] == 0
+    assert levels[('actions', 'imaging/resize')] == 1
+    assert levels[('actions', 'tag')] == 0  # needs nothing in the manifest
+    assert levels[('actions', 'pipeline')] == 2
+    assert levels[('actions', 'full')] == 3
+    assert levels[('rules', 'on_upload')] == 4
+    nested = Manifest({'packages': {'imaging': {}}, 'sequences': {
+        'imaging/echo': ['/whisk.system/utils/echo']}})
+    assert nested.levels[('actions', 'imaging/echo')] == 1  # after imaging
+    assert nested.entities[('actions', 'imaging/echo')].body['exec'][
+        'components'] == ['/whisk.system/utils/echo']  # already qualified
+    try:
+        Manifest({'sequences': {'a': ['b'], 'b': ['a']}})
+        assert False, 'a cycle'
+    except ValueError:
+        pass
+
+    emulator = WhiskEmulator().start()
+    try:
+        whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+        requests = []
+        whisk.instrumentation.add_hook(
+            lambda event: getattr(event, 'verb', None) and
+            requests.append((event.verb, event.entity)))
+        whisk.action_create('hello/hello.py', 'hello')  # not in the manifest
+
+        # the entity methods deploy() builds on
+        whisk.package_create(None, 'scratch')
+        assert whisk.package_info('scratch')['name'] == 'scratch'
+        whisk.trigger_create(None, 'ping')
+        whisk.rule_create({'trigger': '/_/ping', 'action': '/_/hello'},
+                          'ping_hello')
+        assert whisk.rule_info('ping_hello')['trigger'] == 'ping'
+        whisk.rule_delete('ping_hello')
+        whisk.trigger_delete('ping')
+        whisk.package_delete('scratch')
+        assert whisk.packages == whisk.rules == whisk.triggers == []
+
+        result = deploy(whisk, path)
+        print(format_changes(result.changes))
+        assert len(result.changes) == 8 and result.unchanged == 0
+        assert all(change.op == 'create' for change in result.changes)
+        assert sorted(whisk.action_names) == ['full', 'hello', 'pipeline',
+                                              'resize', 'store', 'tag']
+        resize = whisk.action_get('imaging/resize')
+        assert resize['limits']['timeout'] == 5000
+        assert annotation(resize, 'manifest') == 'shop'
+        assert whisk.package_info('imaging')['parameters'] == [
+            {'key': 'quality', 'value': 80}]
+        assert whisk.rule_info('on_upload')['action'] == 'full'
+        assert whisk.action_invoke('full', blocking=True, result=True)[
+            'path'] == ['resize', 'tag', 'store']
+
+        activations = len(whisk.activation_ids)
+        whisk._post(whisk.gen.url_trigger('uploaded'), {}).raise_for_status()
+        deadline = time.monotonic() + 10
+        while len(whisk.activation_ids) < activations + 4:  # full, pipeline,
+            assert time.monotonic() < deadline  # resize, tag, store
+            time.sleep(0.05)
+            whisk._invalidate('activations')
+
+        # a second deploy only lists: one GET per kind
+        del requests[:]
+        result = deploy(whisk, path)
+        assert result.changes == [] and result.unchanged == 8
+        assert sorted(requests) == [('get', 'actions'), ('get', 'packages'),
+                                    ('get', 'rules'), ('get', 'triggers')]
+        assert format_changes(result.changes) == 'no changes'
+
+        # changed code and parameters are updated, removed entities deleted
+        with open(os.path.join(directory, 'tag.py'), 'a') as out_file:
+            out_file.write('# changed\n')
+        manifest['actions']['store']['parameters']['bucket'] = 'b2'
+        del manifest['rules']
+        del manifest['triggers']
+        plan = deploy(whisk, Manifest(manifest, base_dir=directory),
+                      dry_run=True)
+        assert sorted(plan.changes) == [
+            Change('delete', 'rules', 'on_upload'),
+            Change('delete', 'triggers', 'uploaded'),
+            Change('update', 'actions', 'store'),
+            Change('update', 'actions', 'tag')], plan.changes
+        assert whisk.rules  # a dry run changes nothing
+        result = deploy(whisk, Manifest(manifest, base_dir=directory))
+        assert sorted(result.changes) == sorted(plan.changes)
+        assert whisk.rules == [] and whisk.triggers == []
+        assert whisk.action_get('store')['parameters'] == [
+            {'key': 'bucket', 'value': 'b2'}]
+        assert 'hello' in whisk.action_names  # not ours: left alone
+
+        # a failing change stops the deploy
+        broken = dict(manifest, rules={'r': {'trigger': 'nope',
+                                             'action': 'tag'}})
+        try:
+            deploy(whisk, Manifest(broken, base_dir=directory))
+            assert False, 'the trigger does not exist'
+        except DeployError as e:
+            assert e.change == Change('create', 'rules', 'r')
+
+        # fully qualified references are used as they are
+        names = {'name': 'qualified', 'packages': {'q': {}},
+                 'actions': {'q/step': 'tag.py'},
+                 'sequences': {'q/seq': ['/_/q/step', '/_/tag']},
+                 'triggers': {'go': {}},
+                 'rules': {'go_seq': {'trigger': '/_/go',
+                                      'action': '/_/q/seq'}}}
+        result = deploy(whisk, Manifest(names, base_dir=directory))
+        assert len(result.changes) == 5
+        assert whisk.action_get('q/seq')['exec']['components'] == [
+            '/_/q/step', '/_/tag']
+        assert whisk.action_invoke('q/seq', blocking=True, result=True)[
+            'path'] == ['tag', 'tag']
+        assert whisk.rule_info('go_seq')['action'] == 'q/seq'
+        assert len(deploy(whisk, Manifest({'name': 'qualified'})).changes) \
+            == 5
+
+        # hundreds of entities deploy in a few seconds
+        many = {'name': 'many', 'packages': dict(
+            ('p{}'.format(p), {}) for p in range(10)), 'actions': dict(
+            ('p{}/a{}'.format(n % 10, n), 'tag.py') for n in range(200))}
+        start = time.monotonic()
+        result = deploy(whisk, Manifest(many, base_dir=directory))
+        elapsed = time.monotonic() - start
+        print('210 entities in {:.2f}s'.format(elapsed))
+        assert len(result.changes) == 210 and elapsed < 30
+        assert deploy(whisk, Manifest(many, base_dir=directory)).changes == []
+        result = deploy(whisk, Manifest({'name': 'many'}))
+        assert len(result.changes) == 210  # packages after their actions
+        assert whisk.packages == ['imaging']
+    finally:
+        emulator.stop()
+finally:
+    shutil.rmtree(directory)
+print('ok')
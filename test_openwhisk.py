@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+from activation_future import ActivationFuture, ActivationPoller
+from openwhisk import OpenWhisk, as_completed
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Echoes the POSTed payload back; {'fail': ...} answers with a 502.
+       Invoking the action 'slow' answers 202 and finishes 0.2s later."""
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    activations = []  # (finished_at, activation record)
+    actions = {}      # url path: PUT payload
+    list_requests = 0
+    puts = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+        if urlparse(self.path).path.endswith('/actions/slow'):
+            activation_id = uuid.uuid4().hex
+            start = int(time.time() * 1000)
+            record = {'activationId': activation_id, 'name': 'slow',
+                      'start': start, 'response': {'result': payload}}
+            self.activations.append((time.time() + 0.2, record))
+            return self.reply(202, {'activationId': activation_id})
+        self.reply(502 if 'fail' in payload else 200, {'echo': payload})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if '/actions/' in url.path:
+            if url.path not in self.actions:
+                return self.reply(404, {'error': 'The requested resource '
+                                                 'does not exist.'})
+            action = dict(self.actions[url.path])
+            if query.get('code') == ['False']:
+                action['exec'] = dict(action['exec'], code=None)
+            return self.reply(200, action)
+        if '/activations/' in url.path:
+            activation_id = url.path.rsplit('/', 1)[1]
+            for finished_at, record in self.activations:
+                if (record['activationId'] == activation_id and
+                        finished_at <= time.time()):
+                    return self.reply(200, record)
+            return self.reply(404, {'error': 'The requested resource '
+                                             'does not exist.'})
+        StandInHandler.list_requests += 1
+        since = int(query.get('since', [0])[0])
+        upto = int(query.get('upto', [2 ** 63])[0])
+        skip = int(query.get('skip', [0])[0])
+        limit = int(query.get('limit', [30])[0])
+        done = [record for finished_at, record in reversed(self.activations)
+                if finished_at <= time.time() and
+                since <= record['start'] <= upto]
+        self.reply(200, done[skip:skip + limit])
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        StandInHandler.puts += 1
+        self.actions[urlparse(self.path).path] = payload
+        self.reply(200, payload)
+
+    def do_DELETE(self):
+        self.actions.pop(urlparse(self.path).path, None)
+        self.reply(200, {})
+
+    def reply(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+server = StandInServer(('127.0.0.1', 0), StandInHandler)
+threading.Thread(target=server.serve_forever).start()
+apihost = 'http://127.0.0.1:{}'.format(server.server_address[1])
+whisk = OpenWhisk('user:password', apihost=apihost)
+
+try:
+    # action_invoke_many(): ordered, completion order, per item errors
+    payloads = [{'n': n} for n in range(50)]
+    results = list(whisk.action_invoke_many('echo', payloads, concurrency=8,
+                                            blocking=True, result=True))
+    assert [r.index for r in results] == list(range(50))
+    assert [r.result['echo'] for r in results] == payloads
+    assert not any(r.error for r in results)
+
+    results = list(whisk.action_invoke_many('echo', iter(payloads),
+                                            concurrency=16, ordered=False))
+    assert sorted(r.index for r in results) == list(range(50))
+
+    payloads = [{'n': 0}, {'fail': 1}, {'n': 2}]
+    results = list(whisk.action_invoke_many('echo', payloads, concurrency=2))
+    assert [r.error is None for r in results] == [True, False, True]
+    assert results[1].error.response.status_code == 502
+    assert results[2].result == {'echo': {'n': 2}}
+
+    # 202 answers become ActivationFutures resolved by one batched poller
+    futures = [whisk.action_invoke('slow', payload={'n': n}, result=True)
+               for n in range(20)]
+    assert not futures[0].done()
+    done = list(as_completed(futures, timeout=10))
+    assert sorted(f.result()['n'] for f in done) == list(range(20))
+    assert StandInHandler.list_requests < len(futures)
+    future = whisk.action_invoke('slow', blocking=True)
+    assert future.result(timeout=10)['response']['result'] == {}
+
+    # iter_activations() walks every page, properties use a single pass
+    activations = list(whisk.iter_activations(page_size=4))
+    assert len(activations) == 21
+    assert len(set(a['activationId'] for a in activations)) == 21
+    assert whisk.activation_counts == {'slow': 21}
+    assert whisk.activations == ['slow']
+    assert len(whisk.activation_ids) == 21
+    newest = activations[0]['start']
+    assert all(a['start'] == newest
+               for a in whisk.iter_activations(since=newest, page_size=2))
+
+    # a cancelled future stays cancelled; a resolving one can't be
+    # cancelled, and load() runs outside the poller's lock
+    future = ActivationFuture('gone')
+    assert future.cancel()
+    future._resolve({})
+    assert future.cancelled()
+    poller = ActivationPoller(whisk, min_interval=0.01)
+    accepted = whisk._post(whisk.gen.url_action('slow'), {'n': 1}).json()
+    future = poller.watch(ActivationFuture(
+        accepted['activationId'], result_only=True,
+        load=lambda result: (future.cancel(), poller.pending, result)))
+    assert future.result(timeout=5) == (False, 0, {'n': 1})
+
+    # opt-in listing cache, invalidated by writes through the same client
+    cached = OpenWhisk('user:password', apihost=apihost, cache_ttl=60)
+    before = StandInHandler.list_requests
+    cached.action_names
+    cached.action_names
+    cached.packages
+    assert StandInHandler.list_requests == before + 2
+    assert cached.cache.hits == 1 and cached.cache.misses == 2
+    cached.action_delete('echo')
+    cached.action_names
+    cached.packages
+    assert StandInHandler.list_requests == before + 3
+
+    # action_deploy() skips the upload when the remote digest matches
+    assert whisk.action_deploy('hello/hello.py', 'hello') is True
+    assert whisk.action_deploy('hello/hello.py', 'hello') is False
+    assert StandInHandler.puts == 1
+    assert whisk.action_deploy('hello/hello.py', 'hello', 'python2') is True
+    assert whisk.action_deploy('hello/hello_zip.py', 'hello', 'python2')
+    assert StandInHandler.puts == 3
+    whisk.action_create('hello/hello.py', 'hello')
+    assert not whisk.action_deploy('hello/hello.py', 'hello')
+
+    # zip archives are streamed from a memory map (with a Content-Length)
+    archive = os.path.join(tempfile.mkdtemp(), 'big.zip')
+    data = os.urandom(300001)
+    with open(archive, 'wb') as out_file:
+        out_file.write(data)
+    for stream in (True, False):
+        whisk.action_create(archive, 'big', stream=stream)
+        path = urlparse(whisk.gen.url_action('big')).path
+        action = StandInHandler.actions[path]
+        assert base64.b64decode(action['exec']['code']) == data
+    assert not whisk.action_deploy(archive, 'big')
+    os.remove(archive)
+finally:
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from openwhisk_cli import main
+from whisk_emulator import WhiskEmulator
+
+
+def cli(*argv):
+    """(exit code, parsed JSON output) of an in-process CLI call."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        code = main(list(common) + list(argv))
+    return code, json.loads(out.getvalue() or 'null')
+
+
+def run(*argv, **kwargs):
+    """A CLI call in a fresh interpreter: (seconds, stdout, stderr)."""
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, '-X', 'importtime', '-m',
+                           'openwhisk'] + list(common) + list(argv),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, **kwargs)
+    return time.perf_counter() - start, done.stdout, done.stderr
+
+
+os.environ.pop('OPENWHISK_TOKEN', None)
+
+
+directory = tempfile.mkdtemp()
+emulator = WhiskEmulator().start()
+try:
+    common = ['--auth', 'user:password', '--apihost', emulator.apihost,
+              '--socket', os.path.join(directory, 'agent.sock')]
+    assert cli('create', 'hello', 'hello/hello.py')[0] == 0
+    assert cli('list') == (0, ['hello'])
+    assert cli('list', 'rules') == (0, [])
+    code, result = cli('invoke', 'hello', '-p', 'name', 'Dana', '-r')
+    assert result['data']['greeting'] == 'Hello Dana!'
+    code, record = cli('invoke', 'hello', '-p', 'name', '"7"', '-b')
+    assert record['response']['result']['data']['greeting'] == 'Hello 7!'
+    code, accepted = cli('invoke', 'hello')  # non-blocking
+    assert list(accepted) == ['activationId']
+    time.sleep(0.2)
+    code, recent = cli('activations', '--limit', '2')
+    assert len(recent) == 2 and recent[0]['name'] == 'hello'
+    assert cli('activations', record['activationId'], '--result')[1][
+        'result']['data']['greeting'] == 'Hello 7!'
+    assert cli('activations', record['activationId'], '--logs') == (
+        0, record['logs'])
+    assert cli('get', 'hello')[1]['name'] == 'hello'
+    with contextlib.redirect_stderr(io.StringIO()) as err:
+        assert main(['--apihost', emulator.apihost, 'list']) == 2
+    assert '--auth' in err.getvalue()
+
+    # with the agent, a fresh CLI process imports no HTTP stack
+    assert 'no agent' in run('agent', 'status')[2]  # nothing listening yet
+    seconds, out, _ = run('agent', 'start', check=True)
+    assert json.loads(out)['requests'] == 0
+    direct = [run('--no-agent', 'list') for _ in range(3)]
+    agent = [run('list') for _ in range(3)]
+    assert all(json.loads(out) == ['hello'] for _, out, _ in direct + agent)
+    assert all('requests' in err for _, _, err in direct)
+    assert not any('requests' in err or 'urllib3' in err
+                   for _, _, err in agent)
+    print('direct {:.0f}ms, through the agent {:.0f}ms'.format(
+        1000 * sorted(s for s, _, _ in direct)[1],
+        1000 * sorted(s for s, _, _ in agent)[1]))
+    assert sorted(s for s, _, _ in agent)[1] < sorted(
+        s for s, _, _ in direct)[1]
+    assert json.loads(run('agent', 'status')[1])['requests'] == 3
+    assert json.loads(run('agent', 'stop')[1]) == 'stopping'
+    deadline = time.monotonic() + 5
+    while os.path.exists(common[-1]) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(common[-1])
+    assert json.loads(run('list')[1]) == ['hello']  # no agent: in-process
+finally:
+    subprocess.run([sys.executable, 'openwhisk_cli.py', '--socket',
+                    os.path.join(directory, 'agent.sock'), 'agent', 'stop'],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    emulator.stop()
+    shutil.rmtree(directory)
+print('ok')
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+
+from composition import Composition
+from openwhisk import OpenWhisk
+from payload_offload import (REF_KEY, FileStore, LazyPayload, Offloader,
+                             is_reference, offloaded)
+from whisk_emulator import WhiskEmulator
+
+ROUTE = '''import payload_offload
+
+@payload_offload.offloaded
+def main(args):
+    return dict(args, routed=True)  # passes blob on without reading it
+'''
+GROW = '''import payload_offload
+
+@payload_offload.offloaded
+def main(args):
+    return dict(args, blob=args['blob'] * 2)
+'''
+SLOW = '''import time
+import payload_offload
+
+@payload_offload.offloaded
+def main(args):
+    time.sleep(0.3)
+    return {'blob': args['blob'] * 2}
+'''
+MEASURE = '''import payload_offload
+
+@payload_offload.offloaded
+def main(args):
+    return {'length': len(args['blob']), 'routed': args['routed']}
+'''
+
+
+class CountingStore(FileStore):
+    gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return FileStore.get(self, key)
+
+
+directory = tempfile.mkdtemp()
+try:
+    store = CountingStore(os.path.join(directory, 'store'))
+    offload = Offloader(store, threshold=1000)
+    small = {'a': 1, 'b': 'x' * 10}
+    assert offload.spill(small) is small and offload.spill([1]) == [1]
+    payload = {'big': 'y' * 5000, 'small': 2,
+               'nested': {'z': list(range(500))}}
+    spilled = offload.spill(payload)
+    assert spilled['small'] == 2 and payload['big'] == 'y' * 5000
+    assert is_reference(spilled['big']) and is_reference(spilled['nested'])
+    assert spilled['big'][REF_KEY]['bytes'] == 5002
+    assert offload.spill(dict(payload)) == spilled  # named by content
+    assert offload.spilled == 2
+    assert offload.spill(spilled) is spilled  # references stay as they are
+
+    lazy = offload.load(spilled)
+    assert isinstance(lazy, LazyPayload) and store.gets == 0
+    assert lazy['small'] == 2 and store.gets == 0
+    assert is_reference(dict(lazy)['big'])  # copies pass references on
+    assert lazy['big'] == 'y' * 5000 and store.gets == 1
+    assert lazy.get('big') == 'y' * 5000 and store.gets == 1  # fetched once
+    assert offload.load(spilled, lazy=False) == payload and store.gets == 3
+
+    @offloaded(store=store.url, threshold=1000)
+    def main(args):
+        return {'first': args['big'][:3], 'echo': args['big'], 'n': 1}
+    result = main(spilled)
+    assert result['first'] == 'yyy' and result['n'] == 1
+    assert result['echo'] == spilled['big']  # same content, same object
+    assert offloaded(lambda args: {'x': 'x' * 5000})({}) == {'x': 'x' * 5000}
+
+    # references name only configured stores, and only sha256 keys
+    secret = os.path.join(directory, 'secret.json')
+    with open(secret, 'w') as out_file:
+        out_file.write('{"password": "hunter2"}')
+    for ref in ({'store': store.url, 'key': '../../secret.json'},
+                {'store': store.url, 'key': secret},
+                {'store': 'file://' + directory, 'key': 'a' * 64},
+                {'store': 'minio://attacker.example:9000/b', 'key': 'a' * 64},
+                {'store': 'file://' + os.path.join(directory, 'new'),
+                 'key': 'a' * 64}):
+        try:
+            main({'big': {REF_KEY: ref}})
+            assert False, ref
+        except ValueError:
+            pass
+    assert not os.path.exists(os.path.join(directory, 'new'))
+
+    # against the emulator, which refuses payloads and results over 200KB
+    for name, code in (('route', ROUTE), ('grow', GROW), ('slow', SLOW),
+                       ('measure', MEASURE)):
+        with open(os.path.join(directory, name + '.py'), 'w') as out_file:
+            out_file.write(code)
+    # the action containers fetch from the store they are configured with
+    os.environ['OPENWHISK_PAYLOAD_STORE'] = 'file://' + os.path.join(
+        directory, 'store')
+    emulator = WhiskEmulator(max_payload=200 * 1024).start()
+    try:
+        blob = 'b' * (300 * 1024)
+        plain = OpenWhisk('user:password', apihost=emulator.apihost)
+        plain.action_create(os.path.join(directory, 'measure.py'), 'measure')
+        assert 'too large' in plain.action_invoke(
+            'measure', blocking=True, payload={'blob': blob})['error']
+
+        offload = Offloader('file://' + os.path.join(directory, 'store'),
+                            threshold=64 * 1024)
+        whisk = OpenWhisk('user:password', apihost=emulator.apihost,
+                          offload=offload)
+        assert whisk.action_invoke('measure', blocking=True, result=True,
+                                   payload={'blob': blob, 'routed': 0}) == {
+            'length': 300 * 1024, 'routed': 0}
+        for name in ('route', 'grow'):
+            whisk.action_create(os.path.join(directory, name + '.py'), name)
+        result = whisk.action_invoke('grow', blocking=True, result=True,
+                                     payload={'blob': blob})
+        assert result['blob'] == blob * 2  # fetched for the caller
+        record = whisk.action_invoke('grow', blocking=True,
+                                     payload={'blob': blob})
+        assert record['response']['result']['blob'] == blob * 2
+        # results that come through a future are fetched too
+        whisk.action_create(os.path.join(directory, 'slow.py'), 'slow')
+        emulator.blocking_timeout = 0.1
+        future = whisk.action_invoke('slow', blocking=True, result=True,
+                                     payload={'blob': blob})
+        assert future.result(timeout=10) == {'blob': blob * 2}
+        emulator.blocking_timeout = 60
+        future = whisk.action_invoke('slow', payload={'blob': blob})
+        assert future.result(timeout=10)['response']['result'] == {
+            'blob': blob * 2}
+        # each hop of a sequence carries a reference, not the blob
+        whisk.sequence_create('pipeline', ['route', 'grow', 'measure'])
+        result = whisk.action_invoke('pipeline', blocking=True, result=True,
+                                     payload={'blob': blob})
+        assert result == {'length': 600 * 1024, 'routed': True}, result
+        # so does each node of a composition
+        flow = Composition()
+        flow.add('grow')
+        flow.add('measure', after='grow')
+        run = flow.run(whisk, {'blob': blob, 'routed': 1})
+        assert run.output == {'length': 600 * 1024, 'routed': 1}
+    finally:
+        emulator.stop()
+finally:
+    shutil.rmtree(directory)
+print('ok')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import time
+
+from instrumentation import ActivationEvent, RequestEvent
+from openwhisk import OpenWhisk, debug_hook
+from prewarm import Prewarmer, action_of, format_report
+from whisk_emulator import WhiskEmulator
+
+assert action_of('http://h/api/v1/namespaces/_/actions/p/a%20b?x=1') == 'a b'
+
+# learning narrows the idle timeout to (warm_max, cold_min)
+warmer = Prewarmer(None, ['p/a'], interval=10, min_interval=1)
+state = warmer.actions['p/a']
+warmer._learn(state, None, True)  # the first call: nothing to learn
+assert state.interval == 10 and state.cold_min is None
+warmer._learn(state, 10, False)
+assert state.warm_max == 10 and state.interval == 15  # explores upwards
+warmer._learn(state, 15, True)
+assert state.cold_min == 15 and state.interval == 12  # margin * cold_min
+warmer._learn(state, 5, True)  # shorter than a warm gap: not the timeout
+assert state.cold_min == 15 and state.interval == 12
+warmer._learn(state, 12, False)
+assert state.warm_max == 12 and state.interval == 12
+warmer._learn(state, 20, False)  # the timeout went up
+assert state.cold_min is None and state.interval == 30
+fixed = Prewarmer(None, ['a'], interval=10, learn=False)
+fixed._learn(fixed.actions['a'], 10, False)
+assert fixed.actions['a'].interval == 10
+
+# the client's own invocations are matched by the action's last segment
+url = 'http://h/api/v1/namespaces/_/actions/p/a?blocking=true'
+warmer.observe(RequestEvent('post', 'actions', url, 200, 0.01, None))
+warmer.observe(ActivationEvent('a', 'id', 0.01, 0, 250, 5))
+report = warmer.report()['p/a']
+assert report['uses'] == 1 and report['cold_uses'] == 1
+assert report['rescued'] == 0 and report['init_ms'] == 250
+warmer.observe(RequestEvent('get', 'actions', url, 200, 0.01, None))
+warmer.observe(RequestEvent('post', 'actions', url, 429, 0.01, None))
+assert warmer.report()['p/a']['uses'] == 1
+
+# against the emulator, whose containers go after 1-1.25s idle
+emulator = WhiskEmulator(idle_timeout=1.0, cold_start=0.1).start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    whisk.action_create('hello/hello.py', 'hello')
+    with Prewarmer(whisk, ['hello'], interval=0.4, min_interval=0.1,
+                   margin=0.8) as warmer:
+        time.sleep(8)
+        report = warmer.report()['hello']
+        assert report['cold_min'] is not None, report
+        assert report['warm_max'] < report['cold_min'] <= 1.6, report
+        assert report['interval'] <= 0.8 * report['cold_min'] + 1e-9
+        assert report['cold_pings'] >= 2 and report['init_ms'] >= 100
+        # idle for longer than the timeout, but kept warm
+        for _ in range(3):
+            time.sleep(1.5)
+            whisk.action_invoke('hello', blocking=True)
+        report = warmer.report()['hello']
+        print(format_report(warmer.report()))
+        assert report['uses'] == 3 and report['rescued'] >= 2, report
+        assert report['saved_ms'] >= 200 and report['pings'] > 10
+    assert warmer._thread is None and \
+        whisk.instrumentation.hooks == [debug_hook]
+finally:
+    emulator.stop()
+print('ok')
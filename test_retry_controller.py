@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import threading
+import time
+
+import requests
+import urllib3
+
+from retry_controller import RetryController, classify
+
+
+def response(status, body=None, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = b'' if body is None else json.dumps(body).encode('utf-8')
+    resp.raw = io.BytesIO(resp._content)
+    resp.headers.update(headers or {})
+    return resp
+
+
+def replay(*answers):
+    """send() that answers (or raises) each of answers in turn."""
+    answers = list(answers)
+
+    def send():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return send
+
+
+# what is retried
+assert classify('post', response(200, {})) == ('ok', False)
+assert classify('post', response(404, {})) == ('ok', False)
+assert classify('post', response(429, {})) == ('throttled', True)
+assert classify('get', response(503)) == ('unavailable', True)
+assert classify('post', response(502)) == ('unavailable', True)
+assert classify('post', response(502, {'error': 'boom'})) == ('ok', False)
+assert classify('post', error=requests.exceptions.ConnectTimeout()) == (
+    'unavailable', True)
+refused = requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(
+    None, '/', urllib3.exceptions.NewConnectionError(None, 'refused')))
+assert classify('post', error=refused) == ('unavailable', True)
+reset = requests.exceptions.ConnectionError(urllib3.exceptions.ProtocolError(
+    'Connection aborted.', ConnectionResetError()))
+assert classify('post', error=reset) == ('unavailable', False)  # sent
+assert classify('get', error=reset) == ('unavailable', True)
+assert classify('get', error=requests.exceptions.ReadTimeout()) == (
+    'timeout', True)
+assert classify('post', error=requests.exceptions.ReadTimeout()) == (
+    'timeout', False)
+assert classify('get', error=requests.exceptions.InvalidURL()) == (
+    'error', False)
+
+# retries with growing, jittered delays until an answer sticks
+sleeps = []
+retry = RetryController(max_retries=4, base_delay=0.1, sleep=sleeps.append)
+resp = retry.call('post', replay(response(429), response(503),
+                                 response(502), response(200, {'x': 1})))
+assert resp.json() == {'x': 1}
+assert len(sleeps) == 3
+assert all(0 <= delay <= 0.1 * 2 ** n for n, delay in enumerate(sleeps))
+stats = retry.stats()
+assert stats['requests'] == 4 and stats['retries'] == 3
+assert stats['throttled'] == 1 and stats['unavailable'] == 2
+assert stats['ok'] == 1 and stats['gave_up'] == 0
+
+# Retry-After is honoured, up to max_delay
+sleeps[:] = []
+retry = RetryController(max_delay=5, sleep=sleeps.append)
+retry.call('get', replay(response(429, headers={'Retry-After': '2'}),
+                         response(429, headers={'Retry-After': '60'}),
+                         response(200)))
+assert sleeps == [2.0, 5]
+
+# the last answer is returned (or raised) when the retries run out
+retry = RetryController(max_retries=2, sleep=lambda secs: None)
+assert retry.call('post', replay(*[response(429)] * 3)).status_code == 429
+assert retry.stats()['gave_up'] == 1
+try:
+    retry.call('get', replay(*[requests.exceptions.ConnectionError()] * 3))
+    assert False, 'should have raised'
+except requests.exceptions.ConnectionError:
+    pass
+try:
+    retry.call('post', replay(requests.exceptions.ReadTimeout()))
+    assert False, 'should have raised'
+except requests.exceptions.ReadTimeout:
+    pass
+assert retry.stats()['timeout'] == 1 and retry.stats()['gave_up'] == 2
+
+# streamed bodies are rewound before they are sent again
+rewinds = []
+retry = RetryController(sleep=lambda secs: None)
+retry.call('put', replay(response(503), response(200)),
+           rewind=lambda: rewinds.append(1))
+assert rewinds == [1]
+
+# AIMD: halved once per window of throttling, +1 per window of successes
+retry = RetryController(max_limit=8, sleep=lambda secs: None)
+started = [retry.acquire() for _ in range(4)]
+for when in started:
+    retry.release(when, 'throttled')  # all sent before the first decrease
+assert retry.limit == 4
+retry.release(retry.acquire(), 'throttled')
+assert retry.limit == 2
+for _ in range(2):
+    retry.release(retry.acquire(), 'ok')
+assert 2.8 < retry.limit < 3.0  # 2 + 1/2 + 1/2.5
+retry.release(retry.acquire(), 'error')  # not a congestion signal
+assert 2.8 < retry.limit < 3.0
+for _ in range(100):
+    retry.release(retry.acquire(), 'ok')
+assert retry.limit == 8
+
+# gated calls never exceed the limit, and a failing send frees its slot
+retry = RetryController(max_limit=3, sleep=lambda secs: None)
+lock = threading.Lock()
+running = [0, 0]  # now, most
+
+
+def slow_send():
+    with lock:
+        running[0] += 1
+        running[1] = max(running)
+    time.sleep(0.02)
+    with lock:
+        running[0] -= 1
+    return response(200)
+
+
+threads = [threading.Thread(target=retry.call, args=('post', slow_send, True))
+           for _ in range(12)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert running[1] == 3, running
+try:
+    retry.call('post', replay(KeyError('boom')), gated=True)
+    assert False, 'should have raised'
+except KeyError:
+    pass
+assert retry.stats()['in_flight'] == 0
+
+print('ok')
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import base64
+import json
+import os
+import tempfile
+
+from streaming_upload import Base64JsonBody
+
+payload = {'exec': {'kind': 'blackbox', 'image': 'x/y:z'}, 'name': 'caf\xe9'}
+directory = tempfile.mkdtemp()
+for size in (0, 1, 2, 3, 4, 1000, 100003):
+    filename = os.path.join(directory, '{}.zip'.format(size))
+    data = os.urandom(size)
+    with open(filename, 'wb') as out_file:
+        out_file.write(data)
+    for chunk_size, read_size in ((3, 1), (10, 7), (3 << 10, 8192),
+                                  (3 << 18, -1)):
+        with Base64JsonBody(filename, payload, ('exec', 'code'),
+                            chunk_size) as body:
+            length = len(body)
+            parts = iter(lambda: body.read(read_size), b'')
+            text = b''.join(parts)
+            body.rewind()
+            body.read(read_size)  # a partly sent body starts over too
+            body.rewind()
+            assert b''.join(body) == text
+        assert len(text) == length
+        body = json.loads(text.decode('utf-8'))
+        assert base64.b64decode(body['exec'].pop('code')) == data
+        assert body == payload
+    os.remove(filename)
+os.rmdir(directory)
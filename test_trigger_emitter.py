@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import queue
+import time
+
+from openwhisk import OpenWhisk
+from whisk_emulator import WhiskEmulator
+
+emulator = WhiskEmulator().start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    whisk.trigger_create(None, 'clicks')
+    assert whisk.trigger_fire('clicks', {'x': 1}) == {}  # no rule yet: 204
+    whisk.action_create('hello/hello.py', 'hello')
+    whisk.rule_create({'trigger': '/_/clicks', 'action': '/_/hello'},
+                      'on_click')
+    assert 'activationId' in whisk.trigger_fire('clicks', {'x': 1})
+    fires = emulator.stats()['fires']
+
+    # thousands of events go out in a few fires
+    with whisk.trigger_emitter('clicks', max_events=500) as emitter:
+        for n in range(5000):
+            emitter.emit({'n': n, 'page': '/index.html'})
+    stats = emitter.stats()
+    print(stats)
+    assert stats['events'] == 5000 and stats['pending'] == 0
+    assert stats['failures'] == 0 and stats['in_flight'] == 0
+    assert emulator.stats()['fires'] - fires == stats['fires'] <= 100
+    assert stats['events_per_fire'] >= 50
+    assert stats['flush_ms_p50'] <= stats['flush_ms_p95'] <= \
+        stats['flush_ms_max']
+    try:
+        emitter.emit({'n': -1})
+        assert False, 'closed'
+    except ValueError:
+        pass
+
+    # the time window fires what is buffered, the size window caps batches
+    fired = []
+    emitter = whisk.trigger_emitter('clicks', max_delay=0.05)
+    emitter.whisk = type('Spy', (object,), {'_post': lambda self, url, body:
+                                            fired.append(body) or
+                                            whisk._post(url, body)})()
+    for n in range(3):
+        emitter.emit(n)
+    deadline = time.monotonic() + 5
+    while not fired:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert fired == [{'events': [0, 1, 2]}]
+    emitter.max_bytes = 20  # '"xxxx",' is 7 bytes
+    for n in range(10):
+        emitter.emit('xxxx')
+    assert emitter.flush(timeout=5)
+    assert [len(body['events']) for body in fired[1:]] == [2, 2, 2, 2, 2]
+    emitter.close()
+
+    # failed fires are counted and handed to on_error
+    failed = []
+    with whisk.trigger_emitter('nothing', on_error=lambda events, error:
+                               failed.extend(events)) as emitter:
+        emitter.emit('lost')
+    assert emitter.stats()['failures'] == 1 and failed == ['lost']
+finally:
+    emulator.stop()
+
+# a slow server pushes back on emit()
+emulator = WhiskEmulator(latency=0.2).start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    whisk.trigger_create(None, 'clicks')
+    emitter = whisk.trigger_emitter('clicks', max_events=10, max_pending=20,
+                                    concurrency=1)
+    try:
+        for n in range(100):
+            emitter.emit(n, timeout=0)
+        assert False, 'the buffer is bounded'
+    except queue.Full:
+        pass
+    start = time.monotonic()
+    for n in range(40):
+        emitter.emit(n)  # waits for room
+    assert time.monotonic() - start > 0.2
+    assert emitter.stats()['blocked_s'] > 0.2
+    emitter.close()
+    assert emitter.stats()['pending'] == 0
+finally:
+    emulator.stop()
+print('ok')
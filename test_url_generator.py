@@ -36,39 +36,66 @@ urls0 = ['https://localhost/api/v1/namespaces/_/' + x for x in (
 
 # print(urls0)
 
-gen = UrlGenerator()
-urls1 = [
-    gen.url_action(),
-    gen.url_action(skip=1, limit=2),
-    gen.url_action('n A m E'),
-    gen.url_action('n A m E', blocking=False),
-    gen.url_action('n A m E', overwrite=True),
-
-    gen.url_activation(),
-    gen.url_activation(docs=True, name='n A m E', ),
-    gen.url_activation(skip=1, limit=2),
-    gen.url_activation(upto=99999999, since=77),
-    gen.url_activation('activation_id'),
-    gen.url_activation('activation_id', 'logs'),
-    gen.url_activation('activation_id', 'result'),
-
-    gen.url_package(),
-    gen.url_package(public=True),
-    gen.url_package(skip=1, limit=2),
-    gen.url_package('n A m E'),
-    gen.url_package('n A m E', overwrite=True),
-
-    gen.url_rule(),
-    gen.url_rule(skip=1, limit=2),
-    gen.url_rule('n A m E', state='disabled'),
-    gen.url_rule('n A m E', overwrite=True),
-
-    gen.url_trigger(),
-    gen.url_trigger(skip=1, limit=2),
-    gen.url_trigger('n A m E', state='disabled'),
-    gen.url_trigger('n A m E', overwrite=True)]
-
-
-for x, y in zip(urls0, urls1):
+
+def all_urls(gen):
+    return [
+        gen.url_action(),
+        gen.url_action(skip=1, limit=2),
+        gen.url_action('n A m E'),
+        gen.url_action('n A m E', blocking=False),
+        gen.url_action('n A m E', overwrite=True),
+
+        gen.url_activation(),
+        gen.url_activation(docs=True, name='n A m E', ),
+        gen.url_activation(skip=1, limit=2),
+        gen.url_activation(upto=99999999, since=77),
+        gen.url_activation('activation_id'),
+        gen.url_activation('activation_id', 'logs'),
+        gen.url_activation('activation_id', 'result'),
+
+        gen.url_package(),
+        gen.url_package(public=True),
+        gen.url_package(skip=1, limit=2),
+        gen.url_package('n A m E'),
+        gen.url_package('n A m E', overwrite=True),
+
+        gen.url_rule(),
+        gen.url_rule(skip=1, limit=2),
+        gen.url_rule('n A m E', state='disabled'),
+        gen.url_rule('n A m E', overwrite=True),
+
+        gen.url_trigger(),
+        gen.url_trigger(skip=1, limit=2),
+        gen.url_trigger('n A m E', state='disabled'),
+        gen.url_trigger('n A m E', overwrite=True)]
+
+
+for x, y in zip(urls0, all_urls(UrlGenerator())):
     print('\n'.join((x, y)))
     assert x == y
+
+
+# the compiled mode gives byte-identical URLs, also when served from its caches
+gen = UrlGenerator(compiled=True)
+assert all_urls(gen) == urls0
+assert all_urls(gen) == urls0
+gen.package = 'p Kg'
+slow = UrlGenerator()
+slow.package = 'p Kg'
+assert all_urls(gen) == all_urls(slow)
+args = ('path0', 1, 2.0, True)
+kwargs = dict(query0=-1.2, query1=False, query2='Open ?/& Whisk', query3=1,
+              d={'e': 'Hi', 'f': [0, 1]})
+for kind in ('action', 'activation', 'package', 'rule', 'trigger'):
+    for gens in ((gen, slow), (UrlGenerator(compiled=True), UrlGenerator())):
+        urls = [getattr(g, 'url_' + kind)(*args, **kwargs) for g in gens]
+        assert urls[0] == urls[1], urls
+# True and 1 hash alike but must not share a cached query string
+assert gen.url_action('a', blocking=True).endswith('?blocking=True')
+assert gen.url_action('a', blocking=1).endswith('?blocking=1')
+
+
+# an api_host that carries its own scheme is used as-is
+gen = UrlGenerator('http://localhost:8080')
+assert gen.url_action('n A m E') == ('http://localhost:8080/api/v1/namespaces/'
+                                     '_/actions/n+A+m+E')
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import time
+
+import requests
+
+from action_packager import build_action
+from activation_future import ActivationPoller
+from openwhisk import OpenWhisk, annotation
+from retry_controller import RetryController
+from whisk_emulator import WhiskEmulator
+
+directory = tempfile.mkdtemp()
+sleepy = os.path.join(directory, 'sleepy.py')
+with open(sleepy, 'w') as out_file:
+    out_file.write('import time\n\ndef main(args):\n'
+                   '    time.sleep(args.get("secs", 0))\n'
+                   '    return {"slept": args.get("secs", 0)}\n')
+broken = os.path.join(directory, 'broken.py')
+with open(broken, 'w') as out_file:
+    out_file.write('def main(args):\n    return 1 / 0\n')
+
+emulator = WhiskEmulator(concurrency_limit=2, idle_timeout=0.5).start()
+try:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    whisk.action_create('hello/hello.py', 'hello')
+    assert whisk.action_names == ['hello']
+    assert whisk.action_invoke('hello', blocking=True, result=True,
+                               payload={'name': 'Wendel'}) == {
+        'data': {'greeting': 'Hello Wendel!', 'foo': 'bar'},
+        'operation': 'global'}
+
+    # cold then warm: initTime only on the first activation
+    cold, warm = [whisk.action_invoke('hello', blocking=True)
+                  for _ in range(2)]
+    assert annotation(warm, 'initTime') is None
+    assert annotation(warm, 'waitTime') is not None
+    assert warm['logs'][0].endswith('stdout: Hello stranger!')
+    oldest = list(whisk.iter_activations())[-1]['activationId']
+    assert annotation(whisk.activation_info(oldest), 'initTime') > 0
+    assert whisk.activation_counts == {'hello': 3}
+
+    # idle containers are reaped, so initTime comes back
+    time.sleep(1.6)
+    assert annotation(whisk.action_invoke('hello', blocking=True),
+                      'initTime') is not None
+
+    # non-blocking invoke, zip actions and packages
+    future = whisk.action_invoke('hello', result=True,
+                                 payload={'name': 'zip'})
+    archive = build_action('hello/hello.py',
+                           output=os.path.join(directory, 'hello.zip'),
+                           cache_dir=os.path.join(directory, 'cache'))
+    whisk.package = 'pkg'
+    whisk.action_create(archive, 'zipped')
+    assert whisk.action_names == ['zipped']
+    assert whisk.action_invoke('zipped', blocking=True, result=True)[
+        'data']['greeting'] == 'Hello stranger!'
+    whisk.package = None
+    assert future.result(timeout=10)['data']['greeting'] == 'Hello zip!'
+
+    # the namespace's listing holds packaged actions, so a cached client
+    # drops it on writes in a package too, and packages aren't per package
+    cached = OpenWhisk('user:password', apihost=emulator.apihost,
+                       cache_ttl=300)
+    cached.package_create(None, 'pkg')
+    assert cached.action_names == ['hello', 'zipped']
+    assert cached.packages == ['pkg']
+    cached.package = 'pkg'
+    assert cached.action_names == ['zipped']
+    assert cached.packages == ['pkg']  # the listing cached under ''
+    cached.action_create('hello/hello.py', 'again')
+    assert cached.action_names == ['again', 'zipped']
+    cached.package = ''
+    assert cached.action_names == ['again', 'hello', 'zipped']
+    cached.action_delete('hello')
+    cached.package = 'pkg'
+    cached.action_delete('again')
+    cached.package = ''
+    assert cached.action_names == ['zipped']
+    assert cached.cache.stats()['hits'] == 1
+    whisk.action_create('hello/hello.py', 'hello')
+
+    # sequences pass each result on; errors answer 502 with the error
+    whisk.sequence_create('twice', ['guest/hello', '/_/pkg/zipped'])
+    assert whisk.action_invoke('twice', blocking=True, result=True)[
+        'data']['greeting'] == 'Hello stranger!'
+    whisk.action_create(broken, 'broken')
+    response = whisk._post(whisk.gen.url_action('broken', blocking=True,
+                                                result=True), {})
+    assert response.status_code == 502
+    assert 'ZeroDivisionError' in response.json()['error']
+
+    # more than concurrency_limit in flight is throttled with 429s
+    whisk.action_create(sleepy, 'sleepy')
+    whisk.retry.max_retries = 0
+    results = list(whisk.action_invoke_many('sleepy', [{'secs': 0.5}] * 4,
+                                            concurrency=4, blocking=True,
+                                            result=True))
+    codes = sorted(r.error.response.status_code if r.error else 200
+                   for r in results)
+    assert codes == [200, 200, 429, 429], codes
+    assert emulator.stats()['throttled'] == 2
+
+    # ... which the client retries, lowering its own in flight limit
+    whisk.retry = RetryController(max_retries=8, max_limit=4)
+    results = list(whisk.action_invoke_many('sleepy', [{'secs': 0.2}] * 4,
+                                            concurrency=4, blocking=True,
+                                            result=True))
+    assert [r.result for r in results] == [{'slept': 0.2}] * 4
+    stats = whisk.retry.stats()
+    assert stats['throttled'] >= 1 and stats['retries'] == stats['throttled']
+    assert stats['limit'] < 4
+
+    # a blocking invoke that outlives the server's wait becomes a future
+    emulator.blocking_timeout = 0.1
+    future = whisk.action_invoke('sleepy', blocking=True, result=True,
+                                 payload={'secs': 0.3})
+    assert future.result(timeout=10) == {'slept': 0.3}
+    emulator.blocking_timeout = 60
+
+    # records beyond the poller's page cap are fetched by id, once they
+    # have been pending for fetch_after, and not again within fetch_after
+    poller = ActivationPoller(whisk, page_size=2, max_pages=1,
+                              fetch_after=5)
+    oldest = [a['activationId'] for a in whisk.iter_activations()][-3:]
+    assert poller._lookup(0, dict.fromkeys(oldest, time.time())) == {}
+    assert poller.requests == 1
+    assert sorted(poller._lookup(0, dict.fromkeys(oldest, 0))) == \
+        sorted(oldest)
+    assert poller.requests == 1 + 1 + 3
+    assert len(poller._lookup(0, dict.fromkeys(oldest, 0))) == 0
+    assert poller.requests == 1 + 1 + 3 + 1
+
+    # triggers fire the actions of their active rules
+    whisk._put(whisk.gen.url_trigger('ping'), {})
+    whisk._put(whisk.gen.url_rule('ping_hello'), {'trigger': '/_/ping',
+                                                  'action': '/_/hello'})
+    fired = whisk._post(whisk.gen.url_trigger('ping'), {'name': 'rule'})
+    assert fired.status_code == 202
+    for _ in range(100):
+        if whisk.activation_counts.get('hello') == 7:
+            break
+        time.sleep(0.05)
+    assert whisk.activation_counts['ping'] == 1
+    assert whisk.activation_counts['hello'] == 7
+finally:
+    emulator.stop()
+    shutil.rmtree(directory)
+
+# per minute throttling and injected latency
+with WhiskEmulator(per_minute_limit=2, latency=0.05) as emulator:
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost)
+    start = time.time()
+    whisk.action_create('hello/hello.py', 'hello')
+    assert time.time() - start >= 0.05
+    codes = [whisk._post(whisk.gen.url_action('hello', blocking=True), {})
+             .status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    whisk = OpenWhisk('user:password', apihost=emulator.apihost,
+                      max_retries=1)
+    try:  # once the retries give up, invoking raises
+        whisk.action_invoke('hello', blocking=True, result=True)
+        assert False, 'throttled'
+    except requests.exceptions.HTTPError as e:
+        assert e.response.status_code == 429
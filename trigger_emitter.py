@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""Fires a trigger with batches of events instead of one POST per event
+  A TriggerEmitter buffers the events given to emit() and fires its trigger
+  with {'events': [...]} once `max_events` are buffered, their JSON reaches
+  `max_bytes` (kept well under the 1MB payload limit), or the oldest has
+  waited `max_delay` seconds, whichever comes first.  `concurrency` sender
+  threads fire batches through the client's pooled, retried POSTs.  At most
+  `max_pending` events are buffered: emit() then blocks until a batch goes
+  out (backpressure on the event source), or raises queue.Full after its
+  timeout.  The rules on the trigger get every batch, so their actions
+  should expect a list of events.  stats() reports the events per fire and
+  the flush latency: from the oldest event of a batch being buffered to the
+  fire being answered.
+  Examples:
+     $ python3
+     >>> import openwhisk
+     >>> whisk = openwhisk.OpenWhisk(wsk_auth)
+     >>> with whisk.trigger_emitter('clicks', max_delay=0.1) as emitter:
+     ...     for click in click_stream:
+     ...         emitter.emit(click)
+     >>> emitter.stats()
+     {'events': 52310, 'fires': 105, 'events_per_fire': 498.2, ...}
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import collections
+import json
+import queue
+import threading
+import time
+
+MAX_BYTES = 512 * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TriggerEmitter(object):
+    """Batches the events emitted to trigger `trigger_name` of `whisk`.
+       on_error(events, error), if given, is called with the events of a
+       fire that failed after the client's retries."""
+
+    def __init__(self, whisk, trigger_name, max_events=500,
+                 max_bytes=MAX_BYTES, max_delay=0.05, max_pending=10000,
+                 concurrency=2, key='events', on_error=None):
+        if max_pending < max_events:
+            raise ValueError('max_pending must be at least max_events')
+        self.whisk = whisk
+        self.trigger_name = trigger_name
+        self.url = whisk.gen.url_trigger(trigger_name)
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.key = key
+        self.on_error = on_error
+        self.buffer = collections.deque()  # (event, bytes, buffered at)
+        self.buffered_bytes = 0
+        self.in_flight = 0
+        self.flushing = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.events = self.fires = self.fired_events = 0
+        self.failures = self.failed_events = 0
+        self.blocked = 0.0  # seconds emit() waited for room
+        self.last_error = None
+        self.flush_ms = collections.deque(maxlen=1024)
+        self.fire_ms = collections.deque(maxlen=1024)
+        whisk.sessions.grow(concurrency)
+        self.threads = [threading.Thread(target=self._send, daemon=True,
+                                         name='trigger-emitter')
+                        for _ in range(concurrency)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def emit(self, event, timeout=None):
+        """Buffers event (anything JSON can encode), waiting up to timeout
+           seconds (None: for ever) for room; raises queue.Full if there is
+           none by then."""
+        size = len(json.dumps(event, separators=(',', ':'))) + 1
+        with self.cond:
+            if self.closed:
+                raise ValueError('emit() on a closed TriggerEmitter')
+            if len(self.buffer) >= self.max_pending:
+                start = time.monotonic()
+                ready = self.cond.wait_for(
+                    lambda: len(self.buffer) < self.max_pending, timeout)
+                self.blocked += time.monotonic() - start
+                if not ready:
+                    raise queue.Full('{} events are buffered'.format(
+                        len(self.buffer)))
+            self.buffer.append((event, size, time.monotonic()))
+            self.buffered_bytes += size
+            self.events += 1
+            if (len(self.buffer) == 1 or len(self.buffer) >= self.max_events
+                    or self.buffered_bytes >= self.max_bytes):
+                self.cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Fires every buffered event now and waits for the fires to be
+           answered; False if they were not within timeout seconds."""
+        with self.cond:
+            self.flushing += 1
+            self.cond.notify_all()
+            try:
+                return self.cond.wait_for(
+                    lambda: not self.buffer and not self.in_flight, timeout)
+            finally:
+                self.flushing -= 1
+
+    def close(self, timeout=None):
+        """Flushes and stops the sender threads."""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _due(self):
+        """Seconds until the buffer must be fired: 0 now, None never."""
+        if not self.buffer:
+            return None
+        if (self.closed or self.flushing or
+                len(self.buffer) >= self.max_events or
+                self.buffered_bytes >= self.max_bytes):
+            return 0
+        return self.buffer[0][2] + self.max_delay - time.monotonic()
+
+    def _cut(self):
+        """Takes the next batch off the buffer: (events, oldest buffered)."""
+        events, size, oldest = [], 0, self.buffer[0][2]
+        while self.buffer and len(events) < self.max_events:
+            if events and size + self.buffer[0][1] > self.max_bytes:
+                break
+            event, event_size, _ = self.buffer.popleft()
+            events.append(event)
+            size += event_size
+        self.buffered_bytes -= size
+        return events, oldest
+
+    def _send(self):
+        while True:
+            with self.cond:
+                due = self._due()
+                while due is None or due > 0:
+                    if due is None and self.closed:
+                        return
+                    self.cond.wait(due)
+                    due = self._due()
+                events, oldest = self._cut()
+                self.in_flight += 1
+                self.cond.notify_all()  # room for emit()
+            start = time.monotonic()
+            error = None
+            try:
+                self.whisk._post(self.url,
+                                 {self.key: events}).raise_for_status()
+            except Exception as e:
+                error = e
+            end = time.monotonic()
+            with self.cond:
+                self.in_flight -= 1
+                if error is None:
+                    self.fires += 1
+                    self.fired_events += len(events)
+                    self.flush_ms.append((end - oldest) * 1000)
+                    self.fire_ms.append((end - start) * 1000)
+                else:
+                    self.failures += 1
+                    self.failed_events += len(events)
+                    self.last_error = error
+                self.cond.notify_all()
+            if error is not None and self.on_error is not None:
+                self.on_error(events, error)
+
+    def stats(self):
+        with self.cond:
+            flush_ms, fire_ms = list(self.flush_ms), list(self.fire_ms)
+            return {'events': self.events, 'fires': self.fires,
+                    'events_per_fire': (float(self.fired_events) / self.fires
+                                        if self.fires else None),
+                    'pending': len(self.buffer),
+                    'in_flight': self.in_flight, 'failures': self.failures,
+                    'failed_events': self.failed_events,
+                    'blocked_s': self.blocked,
+                    'flush_ms_p50': percentile(flush_ms, 0.5),
+                    'flush_ms_p95': percentile(flush_ms, 0.95),
+                    'flush_ms_max': max(flush_ms) if flush_ms else None,
+                    'fire_ms_p50': percentile(fire_ms, 0.5)}
@@ -12,6 +12,7 @@
      >>> print(gen.url_action('my_action'))
      >>> gen.package = 'my_package'
      >>> print(gen.url_action('my_action', blocking=True, result=True))
+     >>> fast = url_generator.UrlGenerator(compiled=True)  # same URLs, cached
 /*
  * Licensed to the Apache Software Foundation (ASF) under one or more
  * contributor license agreements.  See the NOTICE file distributed with
@@ -30,6 +31,8 @@
  */
 """
 
+import functools
+
 try:
     from urllib.parse import quote_plus, urlencode  # Python 3
 except ImportError:
@@ -52,15 +55,31 @@ def url_finish(*args, **kwargs):
     return s
 
 
+def quote_path(path):
+    return '/' + quote_plus(path, safe='/')
+
+
 class UrlGenerator(object):
     """https://console.ng.bluemix.net/docs/openwhisk/openwhisk_reference.html
-       https://console.ng.bluemix.net/apidocs/98-ibm-bluemix-openwhisk"""
-
-    def __init__(self, api_host='localhost'):
-        self.url_base = 'https://{}/api/v1/namespaces/_'.format(api_host)
+       https://console.ng.bluemix.net/apidocs/98-ibm-bluemix-openwhisk
+       With compiled=True the base URL of each entity is precomputed whenever
+       the package changes, and the quoted paths and the query strings made
+       only of bool and str values (blocking=True, result=True, ...) are kept
+       in LRU caches of cache_size entries.  URLs are identical either way."""
+
+    def __init__(self, api_host='localhost', compiled=False, cache_size=1024):
+        # api_host may carry its own scheme (e.g. 'http://localhost:8080')
+        if '://' not in api_host:
+            api_host = 'https://' + api_host
+        self.url_base = '{}/api/v1/namespaces/_'.format(api_host)
         self.url_whisk_system = self.url_base + '/whisk.system/packages'
         self.url_whisk_utils = self.url_base + '/whisk.system/actions/utils'
         self._package = ''
+        self.compiled = compiled
+        if compiled:
+            self._quote = functools.lru_cache(cache_size)(quote_path)
+            self._urlencode = functools.lru_cache(cache_size)(urlencode)
+            self._routes = self._compile_routes()
 
     @property
     def package(self):
@@ -69,6 +88,32 @@ class UrlGenerator(object):
     @package.setter
     def package(self, package_name):
         self._package = str(package_name or '').strip()
+        if self.compiled:
+            self._routes = self._compile_routes()
+
+    def _compile_routes(self):
+        curr_package = self._curr_package
+        routes = dict((kind, curr_package + kind) for kind in (
+            '/actions', '/activations', '/rules', '/triggers'))
+        routes['/packages'] = self.url_base + '/packages'
+        return routes
+
+    def _compiled_url(self, kind, args, kwargs):
+        """url_finish() for the compiled mode."""
+        url = self._routes[kind]
+        if args:
+            if len(args) == 1 and type(args[0]) is str:
+                url += self._quote(args[0])
+            else:
+                url += self._quote('/'.join(str(arg) for arg in args))
+        if kwargs:
+            query = tuple(kwargs.items())
+            # True == 1 and both hash alike, so only cache unambiguous types
+            if all(type(value) in (bool, str) for key, value in query):
+                url += '?' + self._urlencode(query)
+            else:
+                url += '?' + urlencode(kwargs)
+        return url
 
     @property
     def _curr_package(self):
@@ -78,19 +123,29 @@ class UrlGenerator(object):
                                 if self._package else '')
 
     def url_package(self, *args, **kwargs):
+        if self.compiled:
+            return self._compiled_url('/packages', args, kwargs)
         return self.url_base + '/packages' + url_finish(*args, **kwargs)
 
     def url_action(self, *args, **kwargs):
+        if self.compiled:
+            return self._compiled_url('/actions', args, kwargs)
         return self._curr_package + '/actions' + url_finish(*args, **kwargs)
 
     def url_activation(self, *args, **kwargs):
+        if self.compiled:
+            return self._compiled_url('/activations', args, kwargs)
         return self._curr_package + '/activations' + url_finish(*args,
                                                                 **kwargs)
 
     def url_rule(self, *args, **kwargs):
+        if self.compiled:
+            return self._compiled_url('/rules', args, kwargs)
         return self._curr_package + '/rules' + url_finish(*args, **kwargs)
 
     def url_trigger(self, *args, **kwargs):
+        if self.compiled:
+            return self._compiled_url('/triggers', args, kwargs)
         return self._curr_package + '/triggers' + url_finish(*args, **kwargs)
 
 
@@ -0,0 +1,819 @@
+#!/usr/bin/env python3
+
+"""Local stand-in for the OpenWhisk REST API, for offline load testing
+  Implements the part of the API that UrlGenerator targets: actions (including
+  sequences and the /packages/{package}/actions/... form), activations with
+  their result and logs, packages, rules and triggers (firing a trigger
+  invokes the actions of its active rules), plus whisk.system/utils/echo.
+  Python actions such as hello/hello.py or a zip built by action_packager.py
+  run in warm "containers": worker processes that load the code once (their
+  initTime is recorded on the cold activation) and are reused until idle for
+  idle_timeout seconds.  Activation records carry start, end, duration and the
+  waitTime/initTime annotations like the real thing.  Injected latency,
+  slower cold starts and 429 throttling (concurrent and per minute limits)
+  make client throughput and tail latency measurable on one Linux box.
+  Examples:
+     $ ./whisk_emulator.py --port 3233 --latency 0.002 --cold-start 0.3
+     $ python3
+     >>> import openwhisk, whisk_emulator
+     >>> with whisk_emulator.WhiskEmulator(concurrency_limit=64) as emulator:
+     ...     whisk = openwhisk.OpenWhisk('user:pass', emulator.apihost)
+     ...     whisk.action_create('hello/hello.py', 'hello')
+     ...     print(whisk.action_invoke('hello', blocking=True, result=True))
+/*
+ * Licensed to the Apache Software Foundation (ASF) under one or more
+ * contributor license agreements.  See the NOTICE file distributed with
+ * this work for additional information regarding copyright ownership.
+ * The ASF licenses this file to You under the Apache License, Version 2.0
+ * (the "License"); you may not use this file except in compliance with
+ * the License.  You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+"""
+
+import argparse
+import base64
+import collections
+import copy
+import io
+import json
+import os
+import random
+import select
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote_plus, urlparse
+
+NAMESPACE = 'guest'
+KINDS = ('actions', 'packages', 'rules', 'triggers')
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def flag(query, name, default=False):
+    value = query.get(name)
+    return default if value is None else value.lower() == 'true'
+
+
+def entity_name(name):
+    """'/guest/pkg/hello', '_/hello' or 'hello' -> 'pkg/hello' or 'hello'"""
+    parts = [part for part in name.split('/') if part]
+    if len(parts) > 1 and parts[0] in (NAMESPACE, '_'):
+        parts = parts[1:]
+    return '/'.join(parts)
+
+
+# Containers ==================================================================
+def container_main():
+    """Runs in the container process (`whisk_emulator.py --container`): reads
+       the action as a JSON line on stdin and loads it, then runs main() for
+       every args line until stdin closes, answering each line on stdout."""
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    action = json.loads(sys.stdin.readline())
+    namespace = {'__name__': '__openwhisk__'}
+    try:
+        code, filename = action['code'], 'action.py'
+        if action['binary']:
+            import tempfile
+            import zipfile
+            workdir = tempfile.mkdtemp(prefix='action-')
+            with zipfile.ZipFile(io.BytesIO(base64.b64decode(code))) as zf:
+                zf.extractall(workdir)
+            activate = os.path.join(workdir, 'virtualenv', 'bin',
+                                    'activate_this.py')
+            if os.path.exists(activate):
+                with open(activate) as in_file:
+                    exec(in_file.read(), {'__file__': activate})
+            sys.path.insert(0, workdir)
+            os.chdir(workdir)
+            filename = os.path.join(workdir, '__main__.py')
+            with open(filename) as in_file:
+                code = in_file.read()
+        exec(compile(code, filename, 'exec'), namespace)
+        main = namespace['main']
+    except Exception as e:
+        channel.write(json.dumps('Initialization has failed due to: '
+                                 '{!r}'.format(e)) + '\n')
+        channel.flush()
+        return
+    channel.write('null\n')
+    channel.flush()
+    for line in sys.stdin:
+        args = json.loads(line)
+        out, err = io.StringIO(), io.StringIO()
+        sys.stdout, sys.stderr = out, err
+        try:
+            result, error = main(args), None
+            if not isinstance(result, dict):
+                result, error = None, ('The action did not return a '
+                                       'dictionary.')
+        except Exception as e:
+            result, error = None, 'An error has occurred: {!r}'.format(e)
+        finally:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
+        logs = ['{}Z {}: {}'.format(stamp, stream, line)
+                for stream, text in (('stdout', out.getvalue()),
+                                     ('stderr', err.getvalue()))
+                for line in text.splitlines()]
+        try:
+            answer = json.dumps([result, error, logs])
+        except (TypeError, ValueError) as e:
+            answer = json.dumps([None, 'The action did not return a JSON '
+                                 'serializable dictionary: {!r}'.format(e),
+                                 logs])
+        channel.write(answer + '\n')
+        channel.flush()
+
+
+class Container(object):
+    """A warm worker process for one version of one action."""
+
+    def __init__(self, action, cold_start=0.0):
+        self.action = action['_fqn']
+        self.version = action['_digest']
+        start = time.time()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--container'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, universal_newlines=True)
+        self.process.stdin.write(json.dumps({
+            'code': action['exec'].get('code') or '',
+            'binary': action['exec'].get('binary', False)}) + '\n')
+        self.process.stdin.flush()
+        time.sleep(cold_start)
+        try:
+            self.init_error = self._receive(None)
+        except (EOFError, ValueError):
+            self.init_error = 'The action container exited on initialization.'
+        self.init_time = int((time.time() - start) * 1000)
+        self.last_used = time.time()
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def _receive(self, timeout):
+        ready = select.select([self.process.stdout], [], [], timeout)[0]
+        line = self.process.stdout.readline() if ready else ''
+        if not line:
+            raise EOFError
+        return json.loads(line)
+
+    def run(self, args, timeout):
+        try:
+            self.process.stdin.write(json.dumps(args) + '\n')
+            self.process.stdin.flush()
+            return self._receive(timeout)
+        except EOFError:
+            self.kill()
+            return None, 'The action exceeded its time limits of {} ' \
+                         'milliseconds.'.format(int(timeout * 1000)), []
+        except (IOError, OSError, ValueError) as e:
+            self.kill()
+            return None, 'The action container failed: {!r}'.format(e), []
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class ContainerPool(object):
+    """Idle containers per action; cold starts when none is idle, evicting
+       the least recently used idle container when max_containers are up."""
+
+    def __init__(self, max_containers=100, idle_timeout=600.0, cold_start=0.0):
+        self.max_containers = max_containers
+        self.idle_timeout = idle_timeout
+        self.cold_start = cold_start
+        self.idle = collections.defaultdict(list)  # action name: containers
+        self.busy = 0
+        self.cold_starts = 0
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+
+    def acquire(self, action):
+        """Returns (container, cold) for the current version of action,
+           waiting for a container to be released when max_containers are
+           all busy."""
+        evict = []
+        with self.available:
+            self._reap(evict)
+            while True:
+                container = self._take_idle(action, evict)
+                if container is not None:
+                    self.busy += 1
+                    break
+                if self.busy < self.max_containers:
+                    everyone = [c for cs in self.idle.values() for c in cs]
+                    everyone.sort(key=lambda c: c.last_used)
+                    while everyone and (len(everyone) + self.busy >=
+                                        self.max_containers):
+                        oldest = everyone.pop(0)
+                        self.idle[oldest.action].remove(oldest)
+                        evict.append(oldest)
+                    self.busy += 1
+                    self.cold_starts += 1
+                    break
+                self.available.wait()
+        for old in evict:
+            old.kill()
+        if container is not None:
+            return container, False
+        try:
+            return Container(action, self.cold_start), True
+        except Exception:
+            self.release(None)
+            raise
+
+    def _take_idle(self, action, evict):
+        idle = self.idle[action['_fqn']]
+        while idle:
+            container = idle.pop()
+            if container.version == action['_digest']:
+                return container
+            evict.append(container)  # the action has been updated since
+        return None
+
+    def release(self, container):
+        with self.available:
+            self.busy -= 1
+            self.available.notify()
+            if container is None:
+                return
+            if container.alive and not container.init_error:
+                container.last_used = time.time()
+                self.idle[container.action].append(container)
+                return
+        container.kill()
+
+    def _reap(self, evict):
+        """Moves containers idle for longer than idle_timeout to evict."""
+        cutoff = time.time() - self.idle_timeout
+        for containers in self.idle.values():
+            while containers and containers[0].last_used < cutoff:
+                evict.append(containers.pop(0))
+
+    def reap(self):
+        evict = []
+        with self.lock:
+            self._reap(evict)
+        for container in evict:
+            container.kill()
+
+    def shutdown(self):
+        with self.lock:
+            containers = [c for cs in self.idle.values() for c in cs]
+            self.idle.clear()
+        for container in containers:
+            container.kill()
+
+
+# Emulator ====================================================================
+class Throttled(Exception):
+    pass
+
+
+class WhiskEmulator(object):
+    """An in-process OpenWhisk look-alike served over plain http.
+       latency (+ up to jitter) seconds are added to every response,
+       cold_start seconds to every container start.  More than
+       concurrency_limit activations in flight or per_minute_limit
+       invocations within a minute are answered with 429.  Activations
+       queue (growing their waitTime) when max_containers (default:
+       concurrency_limit) are all busy.  Invocation payloads and results
+       are limited to max_payload bytes of JSON, like OpenWhisk's 1MB."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 cold_start=0.0, concurrency_limit=100, per_minute_limit=None,
+                 idle_timeout=600.0, blocking_timeout=60.0,
+                 max_activations=100000, auth=None, max_containers=None,
+                 max_payload=1048576):
+        self.latency = latency
+        self.jitter = jitter
+        self.concurrency_limit = concurrency_limit
+        self.per_minute_limit = per_minute_limit
+        self.blocking_timeout = blocking_timeout
+        self.auth = auth
+        self.entities = dict((kind, {}) for kind in KINDS)
+        self.activations = collections.OrderedDict()  # id: record, by start
+        self.max_activations = max_activations
+        self.max_payload = max_payload
+        self.pool = ContainerPool(max_containers or concurrency_limit,
+                                  idle_timeout, cold_start)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency_limit + 4)
+        self.in_flight = 0
+        self.recent = collections.deque()  # invocation times, last minute
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self.apihost = 'http://{}:{}'.format(*self.server.server_address[:2])
+        self._stopped = threading.Event()
+
+    def start(self):
+        for target in (self.server.serve_forever, self._reaper):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(wait=True)
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _reaper(self):
+        while not self._stopped.wait(min(1.0, self.pool.idle_timeout / 4)):
+            self.pool.reap()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, in_flight=self.in_flight,
+                        cold_starts=self.pool.cold_starts,
+                        activations=len(self.activations))
+
+    # Entities ================================================================
+    def put_entity(self, kind, name, doc, overwrite):
+        with self.lock:
+            store = self.entities[kind]
+            if name in store and not overwrite:
+                return 409, {'error': 'resource already exists'}
+            missing = self._missing_references(kind, doc)
+            if missing:
+                return missing
+            revision = store.get(name, {}).get('_revision', 0) + 1
+            doc = dict(doc, name=name.split('/')[-1],
+                       namespace=NAMESPACE + ('/' + name.rsplit('/', 1)[0]
+                                              if '/' in name else ''),
+                       version='0.0.{}'.format(revision), _revision=revision,
+                       publish=doc.get('publish', False))
+            doc.setdefault('annotations', [])
+            doc.setdefault('parameters', [])
+            if kind == 'actions':
+                exec_ = doc.setdefault('exec', {})
+                if exec_.get('kind') != 'sequence':
+                    code = exec_.get('code') or ''
+                    exec_['binary'] = _looks_binary(code)
+                doc['limits'] = dict({'timeout': 60000, 'memory': 256,
+                                      'logs': 10}, **doc.get('limits', {}))
+                doc['_fqn'] = name
+                doc['_digest'] = uuid.uuid4().hex  # retires warm containers
+            elif kind == 'rules':
+                doc['trigger'] = entity_name(doc.get('trigger', ''))
+                doc['action'] = entity_name(doc.get('action', ''))
+                doc['status'] = doc.get('status', 'active')
+            store[name] = doc
+            return 200, public(doc)
+
+    def _missing_references(self, kind, doc):
+        """Sequences need their components, rules their trigger and action
+           (status, error) if one is missing, else None."""
+        if kind == 'actions' and doc.get('exec', {}).get('kind') == 'sequence':
+            for component in doc['exec'].get('components', []):
+                if entity_name(component) not in self.entities['actions']:
+                    return 400, {'error': 'Sequence component does not '
+                                          'exist: {}'.format(component)}
+        elif kind == 'rules':
+            for key in ('trigger', 'action'):
+                if entity_name(doc.get(key, '')) not in self.entities[
+                        key + 's']:
+                    return 404, {'error': 'The {} of the rule does not '
+                                          'exist.'.format(key)}
+        return None
+
+    def get_entity(self, kind, name, code=True):
+        with self.lock:
+            doc = self.entities[kind].get(name)
+        if doc is None:
+            return 404, {'error': 'The requested resource does not exist.'}
+        doc = public(doc)
+        if not code and 'exec' in doc:
+            doc['exec'] = dict(doc['exec'], code=None)
+            del doc['exec']['code']
+        return 200, doc
+
+    def delete_entity(self, kind, name):
+        with self.lock:
+            if kind == 'packages':
+                held = sum(1 for action in self.entities['actions']
+                           if action.startswith(name + '/'))
+                if held:
+                    return 409, {'error': 'Package not empty (contains {} '
+                                          'entities)'.format(held)}
+            doc = self.entities[kind].pop(name, None)
+        if doc is None:
+            return 404, {'error': 'The requested resource does not exist.'}
+        return 200, public(doc)
+
+    def list_entities(self, kind, prefix, query):
+        """The namespace's action listing includes the actions of its
+           packages, each with its package in its namespace."""
+        skip, limit = int(query.get('skip', 0)), int(query.get('limit', 30))
+        everything = kind == 'actions' and not prefix
+        with self.lock:
+            docs = [public(doc, summary=True) for name, doc
+                    in sorted(self.entities[kind].items())
+                    if name.startswith(prefix) and (
+                        everything or '/' not in name[len(prefix):])]
+        return 200, docs[skip:skip + limit if limit else None]
+
+    # Invocations =============================================================
+    def invoke(self, name, payload, blocking, result_only, cause=None):
+        """Returns (status, body) of invoking the action name."""
+        received = time.time()
+        with self.lock:
+            action = self.entities['actions'].get(name)
+            if action is None:
+                return 404, {'error': 'The requested resource does not '
+                                      'exist.'}
+            try:
+                self._admit(received)
+            except Throttled as e:
+                return 429, {'error': str(e)}
+            self.counts['invocations'] += 1
+        activation_id = uuid.uuid4().hex
+        finished = threading.Event()
+        self.executor.submit(self._activate, action, payload, activation_id,
+                             received, finished, cause)
+        if blocking and finished.wait(self.blocking_timeout):
+            record = self.get_activation(activation_id)[1]
+            status = 200 if record['response']['success'] else 502
+            if result_only:
+                return status, record['response']['result']
+            return status, record
+        return 202, {'activationId': activation_id}
+
+    def _admit(self, received):
+        """Throttles like the controller does; called with self.lock held."""
+        if self.in_flight >= self.concurrency_limit:
+            self.counts['throttled'] += 1
+            raise Throttled('Too many concurrent requests in flight (count: '
+                            '{}, allowed: {}).'.format(self.in_flight,
+                                                       self.concurrency_limit))
+        while self.recent and self.recent[0] < received - 60:
+            self.recent.popleft()
+        if self.per_minute_limit and len(self.recent) >= self.per_minute_limit:
+            self.counts['throttled'] += 1
+            raise Throttled('Too many requests in the last minute (count: {}, '
+                            'allowed: {}).'.format(len(self.recent),
+                                                   self.per_minute_limit))
+        self.recent.append(received)
+        self.in_flight += 1
+
+    def _activate(self, action, payload, activation_id, received, finished,
+                  cause):
+        try:
+            record = self._run(action, payload, activation_id, received, cause)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        self._record(record)
+        finished.set()
+
+    def _run(self, action, payload, activation_id, received, cause=None):
+        """Runs action (or a sequence) and returns its activation record."""
+        args = dict((p['key'], p['value']) for p in action['parameters'])
+        args.update(payload or {})
+        start = time.time()
+        annotations = [{'key': 'path', 'value': '{}/{}'.format(
+                        action['namespace'], action['name'])},
+                       {'key': 'kind', 'value': action['exec'].get('kind')},
+                       {'key': 'limits', 'value': action['limits']}]
+        logs = []
+        if action['exec'].get('kind') == 'sequence':
+            result, error = args, None
+            for component in action['exec'].get('components', []):
+                with self.lock:
+                    step = self.entities['actions'].get(entity_name(component))
+                if step is None:
+                    result, error = None, 'Sequence component does not ' \
+                                          'exist: {}'.format(component)
+                    break
+                step_id = uuid.uuid4().hex
+                record = self._run(step, result, step_id, time.time(),
+                                   activation_id)
+                self._record(record)
+                logs.append(step_id)
+                if not record['response']['success']:
+                    result = record['response']['result']
+                    error = result.get('error')
+                    break
+                result = record['response']['result']
+            annotations.append({'key': 'topmost', 'value': True})
+        else:
+            try:
+                container, cold = self.pool.acquire(action)
+            except Exception as e:
+                container, cold = None, False
+                result, error = None, 'Failed to start a container: ' \
+                                      '{!r}'.format(e)
+            start = time.time()
+            if container is not None:
+                try:
+                    if container.init_error:
+                        result, error = None, container.init_error
+                    else:
+                        timeout = action['limits']['timeout'] / 1000.0
+                        result, error, logs = container.run(args, timeout)
+                        size = len(json.dumps(result))
+                        if size > self.max_payload:
+                            result, error = None, 'The action produced a ' \
+                                'response that exceeded the allowed length: ' \
+                                '{} > {} bytes.'.format(size, self.max_payload)
+                finally:
+                    self.pool.release(container)
+            annotations.append({'key': 'waitTime',
+                                'value': int((start - received) * 1000)})
+            if cold:
+                annotations.append({'key': 'initTime',
+                                    'value': container.init_time})
+                start -= container.init_time / 1000.0
+        end = time.time()
+        response = {'status': 'success', 'statusCode': 0, 'success': True,
+                    'result': result}
+        if error is not None:
+            response = {'status': 'action developer error', 'statusCode': 2,
+                        'success': False, 'result': {'error': error}}
+        record = {'activationId': activation_id, 'namespace': NAMESPACE,
+                  'name': action['name'], 'version': action['version'],
+                  'subject': NAMESPACE, 'publish': False,
+                  'start': int(start * 1000), 'end': int(end * 1000),
+                  'duration': int((end - start) * 1000),
+                  'response': response, 'logs': logs,
+                  'annotations': annotations}
+        if cause:
+            record['cause'] = cause
+        return record
+
+    def _record(self, record):
+        with self.lock:
+            self.activations[record['activationId']] = record
+            while len(self.activations) > self.max_activations:
+                self.activations.popitem(last=False)
+
+    def fire(self, name, payload):
+        """Fires trigger name: records its activation and invokes the action
+           of every active rule on it."""
+        with self.lock:
+            trigger = self.entities['triggers'].get(name)
+            rules = [rule for rule in self.entities['rules'].values()
+                     if rule['trigger'] == name and rule['status'] == 'active']
+            self.counts['fires'] += 1
+        if trigger is None:
+            return 404, {'error': 'The requested resource does not exist.'}
+        activation_id = uuid.uuid4().hex
+        args = dict((p['key'], p['value']) for p in trigger['parameters'])
+        args.update(payload or {})
+        logs = []
+        for rule in rules:
+            status, body = self.invoke(rule['action'], args, False, False,
+                                       activation_id)
+            logs.append(json.dumps({'statusCode': 0 if status == 202 else 1,
+                                    'success': status == 202,
+                                    'activationId': body.get('activationId'),
+                                    'rule': '{}/{}'.format(NAMESPACE,
+                                                           rule['name']),
+                                    'action': rule['action']}))
+        stamp = now_ms()
+        self._record({'activationId': activation_id, 'namespace': NAMESPACE,
+                      'name': name, 'version': trigger['version'],
+                      'subject': NAMESPACE, 'publish': False,
+                      'start': stamp, 'end': stamp, 'duration': 0,
+                      'response': {'status': 'success', 'statusCode': 0,
+                                   'success': True, 'result': args},
+                      'logs': logs, 'annotations': []})
+        if not rules:
+            return 204, None
+        return 202, {'activationId': activation_id}
+
+    def list_activations(self, query):
+        skip, limit = int(query.get('skip', 0)), int(query.get('limit', 30))
+        limit = min(limit or 200, 200)
+        since = int(query.get('since', 0))
+        upto = int(query.get('upto', 2 ** 63))
+        name = query.get('name')
+        docs = flag(query, 'docs')
+        with self.lock:
+            records = list(reversed(self.activations.values()))
+        records.sort(key=lambda record: -record['start'])
+        matching = (record for record in records
+                    if since <= record['start'] <= upto and
+                    (name is None or record['name'] == name))
+        page = []
+        for index, record in enumerate(matching):
+            if index >= skip + limit:
+                break
+            if index >= skip:
+                page.append(record if docs else summary(record))
+        return 200, page
+
+    def get_activation(self, activation_id, part=None):
+        with self.lock:
+            record = self.activations.get(activation_id)
+        if record is None:
+            return 404, {'error': 'The requested resource does not exist.'}
+        if part == 'result':
+            return 200, record['response']
+        if part == 'logs':
+            return 200, {'logs': record['logs']}
+        return 200, record
+
+    # HTTP ====================================================================
+    def route(self, method, path, query, payload):
+        """Returns (status, body) for a request on /api/v1/namespaces/..."""
+        parts = [unquote_plus(p) for p in path.split('/') if p]
+        if parts[:3] != ['api', 'v1', 'namespaces'] or len(parts) < 5:
+            return 404, {'error': 'The requested resource does not exist.'}
+        parts = parts[4:]
+        if parts[:3] == ['whisk.system', 'actions', 'utils']:
+            return 200, payload  # just echo
+        prefix = ''
+        if parts[0] == 'packages' and len(parts) > 2:
+            prefix, parts = parts[1] + '/', parts[2:]  # package scoped URLs
+            if parts[0] != 'actions':
+                prefix = ''
+        kind, name = parts[0], prefix + '/'.join(parts[1:])
+        if kind == 'activations':
+            if method != 'GET':
+                return 405, {'error': 'Method not allowed.'}
+            if len(parts) == 1:
+                return self.list_activations(query)
+            return self.get_activation(parts[1], (parts[2:] or [None])[0])
+        if kind not in KINDS:
+            return 404, {'error': 'The requested resource does not exist.'}
+        if len(parts) == 1 or name == prefix:
+            if method != 'GET':
+                return 405, {'error': 'Method not allowed.'}
+            return self.list_entities(kind, prefix, query)
+        if method == 'GET':
+            return self.get_entity(kind, name, flag(query, 'code', True))
+        if method == 'PUT':
+            return self.put_entity(kind, name, payload or {},
+                                   flag(query, 'overwrite'))
+        if method == 'DELETE':
+            return self.delete_entity(kind, name)
+        if method == 'POST' and kind == 'actions':
+            return self.invoke(name, payload, flag(query, 'blocking'),
+                               flag(query, 'result'))
+        if method == 'POST' and kind == 'triggers':
+            return self.fire(name, payload)
+        if method == 'POST' and kind == 'rules':
+            with self.lock:
+                rule = self.entities['rules'].get(name)
+                if rule is not None:
+                    rule['status'] = (payload or {}).get('status', 'active')
+            if rule is None:
+                return 404, {'error': 'The requested resource does not '
+                                      'exist.'}
+            return 200, public(rule)
+        return 405, {'error': 'Method not allowed.'}
+
+    def _handler(self):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1  # one write per response
+
+            def handle_any(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if emulator.auth and not self._authorized():
+                    return self.reply(401, {'error': 'The supplied '
+                                            'authentication is invalid'})
+                if (self.command == 'POST' and length > emulator.max_payload
+                        and ('/actions/' in self.path or
+                             '/triggers/' in self.path)):
+                    return self.reply(413, {'error': 'The request content '
+                                            'was too large.'})
+                try:
+                    payload = json.loads(body.decode('utf-8')) if body else None
+                except ValueError:
+                    return self.reply(400, {'error': 'The request content '
+                                            'was malformed.'})
+                url = urlparse(self.path)
+                query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+                try:
+                    status, obj = emulator.route(self.command, url.path, query,
+                                                 payload)
+                except Exception as e:
+                    status, obj = 500, {'error': repr(e)}
+                delay = emulator.latency + random.uniform(0, emulator.jitter)
+                if delay:
+                    time.sleep(delay)
+                self.reply(status, obj)
+
+            do_GET = do_PUT = do_POST = do_DELETE = handle_any
+
+            def _authorized(self):
+                expected = 'Basic ' + base64.b64encode(
+                    emulator.auth.encode('utf-8')).decode('ascii')
+                return self.headers.get('Authorization') == expected
+
+            def reply(self, status, obj):
+                data = b'' if obj is None else json.dumps(obj).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _looks_binary(code):
+    """Zip actions arrive base64 encoded; source code doesn't decode to a zip
+       (zip files start with PK)."""
+    try:
+        return base64.b64decode(code[:8], validate=True).startswith(b'PK')
+    except (ValueError, TypeError):
+        return False
+
+
+def public(doc, summary=False):
+    """A copy of an entity without the emulator's private _keys; listings
+       (summary) leave out the code and parameters."""
+    doc = dict((k, copy.deepcopy(v)) for k, v in doc.items()
+               if not k.startswith('_'))
+    if summary:
+        if 'exec' in doc:
+            doc['exec'] = dict((k, v) for k, v in doc['exec'].items()
+                               if k in ('kind', 'binary'))
+        doc.pop('parameters', None)
+    return doc
+
+
+def summary(record):
+    """A listing entry: no response or logs, but their statusCode."""
+    doc = dict((k, v) for k, v in record.items()
+               if k not in ('response', 'logs'))
+    doc['statusCode'] = record['response']['statusCode']
+    return doc
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--container']:
+        container_main()
+        exit(0)
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3233)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='up to this many more seconds, at random')
+    parser.add_argument('--cold-start', type=float, default=0.0,
+                        help='seconds added to every container start')
+    parser.add_argument('--concurrency-limit', type=int, default=100)
+    parser.add_argument('--per-minute-limit', type=int, default=None)
+    parser.add_argument('--max-containers', type=int, default=None)
+    parser.add_argument('--idle-timeout', type=float, default=600.0)
+    parser.add_argument('--max-payload', type=int, default=1048576,
+                        help='bytes of JSON per invocation payload or result')
+    parser.add_argument('--auth', default=None,
+                        help='require this user:password, default: any')
+    args = parser.parse_args()
+    emulator = WhiskEmulator(args.host, args.port, args.latency, args.jitter,
+                             args.cold_start, args.concurrency_limit,
+                             args.per_minute_limit, args.idle_timeout,
+                             auth=args.auth,
+                             max_containers=args.max_containers,
+                             max_payload=args.max_payload)
+    print('OpenWhisk emulator listening on {}'.format(emulator.apihost))
+    emulator.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()